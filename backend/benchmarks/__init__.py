@@ -0,0 +1,12 @@
+"""
+Micro-benchmarks for the ML and AQI hot paths.
+
+    python -m benchmarks                         # run everything
+    python -m benchmarks -k forecast             # names containing "forecast"
+    python -m benchmarks -o after.json --compare before.json
+
+Run from backend/. Every case runs with fixed seeds and with the upstream
+APIs (CPCB, OpenWeatherMap) replaced by deterministic in-process data, so
+results depend only on the code and the machine. See harness for the
+statistics reported and the JSON layout.
+"""
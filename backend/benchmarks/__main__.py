@@ -0,0 +1,75 @@
+"""Command line entry point: python -m benchmarks --help"""
+
+import argparse
+import logging
+import os
+import sys
+import warnings
+
+# Imports below resolve like the app's (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness
+from benchmarks.cases import CASES
+from benchmarks.fixtures import stubbed_upstreams
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help="Run only cases whose name contains this (repeatable)")
+    parser.add_argument('-o', '--output', default='benchmark_results.json',
+                        help="Where to write the JSON results (default benchmark_results.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare p50s against")
+    parser.add_argument('--repeat', type=int, help="Override every case's timed call count")
+    parser.add_argument('--min-seconds', type=float, default=0.0,
+                        help="Keep timing each case for at least this long")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Show the app's INFO logs")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(CASES))
+        return 0
+
+    if not args.verbose:
+        # e.g. sklearn's version warnings when the pickled encoders load
+        warnings.simplefilter('ignore')
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    selected = {name: spec for name, spec in CASES.items()
+                if not args.filter or any(f in name for f in args.filter)}
+    if not selected:
+        print("No cases match", args.filter, file=sys.stderr)
+        return 1
+
+    results = {}
+    with stubbed_upstreams():
+        for name, spec in selected.items():
+            print(f"running {name} ...", file=sys.stderr, flush=True)
+            try:
+                harness.seed_everything()
+                func, items = spec['setup']()
+                results[name] = harness.measure(func, repeat=args.repeat or spec['repeat'],
+                                                warmup=spec['warmup'], items=items,
+                                                min_seconds=args.min_seconds)
+                if spec['extra'] is not None:
+                    results[name]['extra'] = spec['extra']()
+            except Exception as e:
+                logging.getLogger(__name__).exception("Benchmark %s failed", name)
+                results[name] = {'error': f"{type(e).__name__}: {e}"}
+
+    harness.save(args.output, results)
+    print(harness.format_table(results))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        baseline = harness.load(args.compare)
+        print(f"\nCompared with {args.compare} (commit {baseline['meta'].get('git_commit')}):")
+        print(harness.format_comparison(baseline['results'], results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
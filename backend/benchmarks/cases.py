@@ -0,0 +1,210 @@
+"""
+Benchmark Cases
+Each case is a setup function returning (func, items): func is the call that
+gets timed, items the rows/stations/hours it processes per call (or None).
+Setup work (loading models, reading data, building inputs) is not timed.
+A case may also name an `extra` callable whose result is stored with its
+stats (the startup case attaches the import-time profile).
+
+Cases run inside stubbed_upstreams(), so the live-data paths see fixed
+readings instead of calling CPCB/OWM.
+"""
+
+import asyncio
+
+import numpy as np
+
+from . import import_profile
+from .fixtures import city_readings, station_history
+
+CASES = {}
+
+
+def case(name, repeat=20, warmup=2, extra=None):
+    def register(setup):
+        CASES[name] = {'setup': setup, 'repeat': repeat, 'warmup': warmup, 'extra': extra}
+        return setup
+    return register
+
+
+def _run(loop, coro_func):
+    return lambda: loop.run_until_complete(coro_func())
+
+
+# --- Startup ----------------------------------------------------------------
+
+@case('startup.import_main', repeat=5, warmup=1, extra=import_profile.profile)
+def import_main():
+    """Wall time of `import main` in a fresh interpreter."""
+    return import_profile.import_main, None
+
+
+@case('startup.load_models', repeat=5, warmup=1)
+def load_models():
+    """All model artifacts loaded concurrently, as the startup warm-up does."""
+    from ml_engine.forecast_3day import load_model
+    from ml_engine.heatmap_prediction import HeatmapPredictor
+    from policymaker_backend.ml_engine.station_forecast import StationForecaster
+
+    async def load_all():
+        await asyncio.gather(asyncio.to_thread(load_model, 'Delhi'), asyncio.to_thread(load_model, 'Pune'),
+                             asyncio.to_thread(HeatmapPredictor().load), asyncio.to_thread(StationForecaster))
+    return (lambda: asyncio.run(load_all())), 4
+
+
+@case('models.load_registry', repeat=20, warmup=2)
+def load_registry_model():
+    """Delhi forecast model from its binary (UBJSON) registry version."""
+    from ml_engine import model_registry
+    return (lambda: model_registry.load('forecast-delhi')), None
+
+
+@case('models.load_legacy_json', repeat=20, warmup=2)
+def load_legacy_model():
+    """The same model from the loose JSON dump it was imported from."""
+    from ml_engine import model_registry
+    return (lambda: model_registry._load_legacy('forecast-delhi')), None
+
+
+@case('models.city_cold_load', repeat=10, warmup=1)
+def city_cold_load():
+    """A city's forecast model and dataset loaded after it was evicted."""
+    from ml_engine.router import city_models
+
+    def load():
+        city_models.evict('Delhi')
+        return city_models.get('Delhi')
+    return load, None
+
+
+# --- AQI ------------------------------------------------------------------
+
+@case('aqi.compute_aqi_for_dataframe', repeat=30)
+def compute_aqi_dataframe():
+    from ml_engine.aqi_calculator import compute_aqi_for_dataframe
+    df = city_readings(24 * 365)
+    return (lambda: compute_aqi_for_dataframe(df)), len(df)
+
+
+@case('aqi.calculate_sub_index', repeat=30)
+def calculate_sub_index():
+    from ml_engine.aqi_calculator import calculate_sub_index
+    from ml_engine.aqi_config import AQI_BREAKPOINTS
+    rng = np.random.default_rng(0)
+    pollutants = list(AQI_BREAKPOINTS)
+    pairs = [(pollutants[i % len(pollutants)], float(v))
+             for i, v in enumerate(rng.uniform(0, 600, 10_000))]
+
+    def run():
+        for pollutant, value in pairs:
+            calculate_sub_index(pollutant, value)
+    return run, len(pairs)
+
+
+# --- City forecast (ml_engine.forecast_3day) --------------------------------
+
+@case('forecast.prepare_historical_data', repeat=10)
+def prepare_historical_data():
+    from ml_engine.forecast_3day import prepare_historical_data
+    from ml_engine.router import city_models
+    store = city_models.get('Delhi')['dataset']
+    rows = len(prepare_historical_data(store, 'Delhi'))
+    return (lambda: prepare_historical_data(store, 'Delhi')), rows
+
+
+@case('forecast.forecast_next_hours', repeat=20)
+def forecast_next_hours():
+    from ml_engine.forecast_3day import feature_plan, forecast_next_hours, load_model, prepare_historical_data
+    from ml_engine.router import city_models
+    model, scaler, features = load_model('Delhi')
+    df = prepare_historical_data(city_models.get('Delhi')['dataset'], 'Delhi')
+    # The app compiles the plan once per model version
+    plan = feature_plan(features)
+    return (lambda: forecast_next_hours(model, scaler, features, df, hours=72, plan=plan)), 72
+
+
+# --- Policymaker station forecasts ------------------------------------------
+
+@case('stations.generate_all_forecasts', repeat=10)
+def generate_all_forecasts():
+    from policymaker_backend.ml_engine.station_forecast import StationForecaster
+    forecaster = StationForecaster()
+    if not forecaster.load_station_data():
+        forecaster.station_data = station_history()
+    stations = len(forecaster.generate_all_forecasts())
+    return forecaster.generate_all_forecasts, stations
+
+
+# --- Heatmap ----------------------------------------------------------------
+
+@case('heatmap.get_all_station_predictions', repeat=50)
+def heatmap_predictions():
+    from ml_engine.heatmap_prediction import HeatmapPredictor
+    predictor = HeatmapPredictor()
+    loop = asyncio.new_event_loop()
+    stations = len(loop.run_until_complete(predictor.get_all_station_predictions()))
+    return _run(loop, predictor.get_all_station_predictions), stations
+
+
+@case('heatmap.build_table', repeat=30)
+def heatmap_build_table():
+    """The uncached path: one batched predict for a day's (hour, station) table."""
+    from ml_engine.heatmap_prediction import HeatmapPredictor
+    predictor = HeatmapPredictor()
+    predictor.load()
+    weather = (25.0, 50.0, 10.0)
+    return (lambda: predictor._build_table(1, 2, weather)), 24 * len(predictor.stations)
+
+
+# --- Citizen ----------------------------------------------------------------
+
+@case('citizen.calculate_dynamic_wildlife', repeat=50)
+def dynamic_wildlife():
+    from citizen_backend.routes.citizen import calculate_dynamic_wildlife
+    from ml_engine.aqi_calculator import compute_aqi_for_dataframe
+    df = compute_aqi_for_dataframe(city_readings(24))
+    return (lambda: calculate_dynamic_wildlife(df, 'Delhi')), None
+
+
+# --- CPU executor -----------------------------------------------------------
+
+def _loop_lag(offload, requests=8):
+    """Max event-loop lag (ms) while `requests` Delhi forecasts run inline or on the CPU executor."""
+    from ml_engine import cpu_executor
+    from ml_engine.router import compute_forecast
+
+    async def measure():
+        lags = []
+
+        async def tick():
+            loop = asyncio.get_running_loop()
+            while True:
+                expected = loop.time() + 0.01
+                await asyncio.sleep(0.01)
+                lags.append(loop.time() - expected)
+
+        watcher = asyncio.create_task(tick())
+        await asyncio.sleep(0.05)
+        for _ in range(requests):
+            if offload:
+                await cpu_executor.run(compute_forecast, 'Delhi')
+            else:
+                compute_forecast('Delhi')
+            await asyncio.sleep(0)
+        watcher.cancel()
+        return round(max(lags) * 1000, 1)
+    return asyncio.run(measure())
+
+
+def _loop_lag_compare():
+    return {'max_lag_ms_inline': _loop_lag(False), 'max_lag_ms_executor': _loop_lag(True)}
+
+
+@case('cpu.forecast_on_executor', repeat=10, warmup=1, extra=_loop_lag_compare)
+def forecast_on_executor():
+    """One Delhi 72h forecast through the CPU executor (hand-off overhead included)."""
+    from ml_engine import cpu_executor
+    from ml_engine.router import compute_forecast, city_models
+    city_models.get('Delhi')
+    loop = asyncio.new_event_loop()
+    return _run(loop, lambda: cpu_executor.run(compute_forecast, 'Delhi')), 72
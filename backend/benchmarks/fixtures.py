@@ -0,0 +1,114 @@
+"""
+Benchmark Fixtures
+Seeded input data, and deterministic stand-ins for the upstream APIs.
+
+station_history() stands in for delhi_stations_combined.csv when that file
+is not present (it is not checked in), so the station forecaster always has
+the registry's Delhi stations to work on.
+
+While stubbed_upstreams() is active, MultiSourceAPIClient returns:
+    fetch_realtime_data / fetch_history_data   hourly city readings ending at
+                                               the current hour, from a seeded
+                                               generator
+    fetch_cpcb_current_stations                one reading per Delhi station in
+                                               the station registry
+
+Everything that reaches CPCB/OWM goes through these methods (the module
+helpers fetch_live_weather_data / fetch_cpcb_station_data included), so no
+network request is made and every run sees the same inputs.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ml_engine.api_client import MultiSourceAPIClient
+from ml_engine.station_registry import get_registry
+
+SEED = 7
+
+
+def city_readings(hours, seed=SEED):
+    """Hourly pollutant and weather readings for the `hours` before now."""
+    rng = np.random.default_rng(seed)
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    times = [end - timedelta(hours=h) for h in range(hours - 1, -1, -1)]
+    diurnal = np.array([1.2 if t.hour in (7, 8, 9, 18, 19, 20) else 0.8 if t.hour in (2, 3, 4, 5) else 1.0
+                        for t in times])
+    pm25 = np.maximum(10, 150 * diurnal + rng.normal(0, 15, hours))
+    return pd.DataFrame({
+        'Datetime': times,
+        'PM2_5_ugm3': pm25,
+        'PM10_ugm3': np.maximum(20, pm25 * 1.7 + rng.normal(0, 20, hours)),
+        'NO2_ugm3': np.maximum(10, 60 * diurnal + rng.normal(0, 10, hours)),
+        'CO_ugm3': np.maximum(200, 1500 * diurnal + rng.normal(0, 200, hours)),
+        'O3_ugm3': np.maximum(5, 40 + rng.normal(0, 5, hours)),
+        'SO2_ugm3': np.maximum(5, 25 + rng.normal(0, 8, hours)),
+        'Temp_2m_C': 22 + rng.normal(0, 3, hours),
+        'Humidity_Percent': np.clip(65 + rng.normal(0, 10, hours), 30, 100),
+        'Wind_Speed_10m_kmh': np.maximum(1, 10 + rng.normal(0, 4, hours)),
+    })
+
+
+def station_readings(city='Delhi', seed=SEED):
+    """{ station name: { pollutant: value } } in the shape CPCB responses are parsed into."""
+    rng = np.random.default_rng(seed)
+    readings = {}
+    for station in get_registry().stations(city):
+        pm25 = float(rng.uniform(40, 320))
+        readings[station.name] = {
+            'PM2.5': round(pm25, 1),
+            'PM10': round(pm25 * float(rng.uniform(1.4, 2.0)), 1),
+            'NO2': round(float(rng.uniform(20, 90)), 1),
+            'CO': round(float(rng.uniform(0.5, 3.0)), 2),
+            'OZONE': round(float(rng.uniform(10, 80)), 1),
+            'SO2': round(float(rng.uniform(5, 30)), 1),
+        }
+    return readings
+
+
+def station_history(city='Delhi', days=7, seed=SEED):
+    """Hourly per-station rows shaped like the columnar copy of delhi_stations_combined.csv."""
+    from ml_engine.aqi_kernels import pm25_to_aqi
+    frames = []
+    for i, station in enumerate(get_registry().stations(city)):
+        df = city_readings(days * 24, seed=seed + i)
+        df['StationName'] = station.name
+        df['Latitude'] = station.lat
+        df['Longitude'] = station.lng
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True).sort_values('Datetime', kind='stable').reset_index(drop=True)
+    df['AQI_computed'] = pm25_to_aqi(df['PM2_5_ugm3']).fillna(0)
+    return df
+
+
+async def _realtime(self, city='Delhi', hours=24):
+    return city_readings(hours)
+
+
+async def _history(self, city='Delhi', days=7):
+    return city_readings(days * 24)
+
+
+async def _stations(self, city='Delhi'):
+    return station_readings(city)
+
+
+@contextmanager
+def stubbed_upstreams():
+    """Swap the upstream fetches of MultiSourceAPIClient for the data above."""
+    replacements = {
+        'fetch_realtime_data': _realtime,
+        'fetch_history_data': _history,
+        'fetch_cpcb_current_stations': _stations,
+    }
+    originals = {name: getattr(MultiSourceAPIClient, name) for name in replacements}
+    for name, func in replacements.items():
+        setattr(MultiSourceAPIClient, name, func)
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(MultiSourceAPIClient, name, func)
@@ -0,0 +1,144 @@
+"""
+Benchmark Harness
+Times a callable repeatedly and summarises the samples.
+
+Each case gets a few untimed warmup calls (model and data caches fill,
+lazy imports happen), then `repeat` timed calls. Reported per case:
+
+    mean / min / max / p50 / p90 / p99   seconds per call
+    calls_per_second                     1 / mean
+    items_per_second                     items processed per second, where a
+                                         call handles many rows or stations
+
+Results are written as JSON:
+
+    {"meta": {...machine and library versions, git commit...},
+     "results": {case_name: {stats...}}}
+
+so two files from different commits can be compared with --compare.
+"""
+
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+
+SEED = 42
+
+
+def seed_everything(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def summarize(samples, items=None):
+    """Stats for a list of per-call durations in seconds."""
+    values = np.asarray(samples, dtype=np.float64)
+    mean = float(values.mean())
+    p50, p90, p99 = (float(v) for v in np.percentile(values, [50, 90, 99]))
+    stats = {
+        'calls': len(values),
+        'mean': mean,
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'p50': p50,
+        'p90': p90,
+        'p99': p99,
+        'calls_per_second': 1.0 / mean if mean > 0 else None,
+    }
+    if items:
+        stats['items_per_call'] = items
+        stats['items_per_second'] = items / mean if mean > 0 else None
+    return stats
+
+
+def measure(func, repeat=20, warmup=2, items=None, min_seconds=0.0):
+    """
+    Time func() `repeat` times (or until min_seconds have been spent, if longer).
+
+    The seeds are reset before every call so each one does the same work.
+    """
+    for _ in range(warmup):
+        seed_everything()
+        func()
+
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_seconds:
+        seed_everything()
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, items)
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                             text=True, timeout=5, cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    import pandas as pd
+    import xgboost as xgb
+    return {
+        'created_at': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'xgboost': xgb.__version__,
+        'seed': SEED,
+    }
+
+
+def save(path, results):
+    payload = {'meta': environment(), 'results': results}
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    return payload
+
+
+def load(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:10.3f}"
+
+
+def format_table(results):
+    lines = [f"{'case':<36} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'calls/s':>10} {'items/s':>12}"]
+    for name, stats in results.items():
+        if 'error' in stats:
+            lines.append(f"{name:<36} error: {stats['error']}")
+            continue
+        items = stats.get('items_per_second')
+        items = f"{items:12.0f}" if items else f"{'-':>12}"
+        lines.append(f"{name:<36} {_ms(stats['p50'])} {_ms(stats['p90'])} {_ms(stats['p99'])} "
+                     f"{stats['calls_per_second']:10.1f} {items}")
+    return '\n'.join(lines)
+
+
+def format_comparison(baseline, current):
+    """p50 of each case against a baseline results dict (ratio < 1 is faster)."""
+    lines = [f"{'case':<36} {'base p50 ms':>12} {'p50 ms':>10} {'ratio':>8}"]
+    for name, stats in current.items():
+        before = baseline.get(name)
+        if not before or 'p50' not in before or 'p50' not in stats:
+            lines.append(f"{name:<36} {'-':>12} {_ms(stats['p50']) if 'p50' in stats else '-':>10} {'-':>8}")
+            continue
+        ratio = stats['p50'] / before['p50'] if before['p50'] else float('nan')
+        lines.append(f"{name:<36} {before['p50'] * 1000:12.3f} {_ms(stats['p50'])} {ratio:8.2f}")
+    return '\n'.join(lines)
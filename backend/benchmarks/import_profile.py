@@ -0,0 +1,73 @@
+"""
+Import-time Profile
+Imports the app (main) in a fresh interpreter with -X importtime and
+summarises where the time goes: total, the slowest top-level packages and
+whether the heavy ML stack (xgboost, sklearn, scipy) was pulled in, which it
+should not be until a model loads.
+
+    python -m benchmarks.import_profile [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_PACKAGES = ('xgboost', 'sklearn', 'scipy')
+
+
+def import_main(flags=()):
+    """Run `import main` in a new interpreter; returns its stderr."""
+    env = dict(os.environ, POLICYMAKER_JOB_ENABLED='0')
+    result = subprocess.run([sys.executable, *flags, '-c', 'import main'], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed: {result.stderr.strip()[-500:]}")
+    return result.stderr
+
+
+def parse(output):
+    """-X importtime lines -> [(module, self_us, cumulative_us, depth)]."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile(top=15):
+    rows = parse(import_main(['-X', 'importtime']))
+    modules = {name for name, _, _, _ in rows}
+    total = next((cumulative for name, _, cumulative, _ in rows if name == 'main'), None)
+    # Top-level packages by total time: each package counted once, at its outermost import
+    packages = {}
+    for name, _, cumulative, _ in rows:
+        root = name.split('.')[0]
+        if name == root:
+            packages[root] = max(packages.get(root, 0), cumulative)
+    slowest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        'total_ms': None if total is None else round(total / 1000, 1),
+        'modules': len(modules),
+        'heavy_imported': sorted(p for p in HEAVY_PACKAGES if p in modules),
+        'slowest_packages_ms': {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.import_profile', description=__doc__)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+    result = profile(args.top)
+    print(f"import main: {result['total_ms']} ms, {result['modules']} modules")
+    print(f"heavy ML packages imported: {', '.join(result['heavy_imported']) or 'none'}")
+    for name, ms in result['slowest_packages_ms'].items():
+        print(f"  {name:<32} {ms:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,18 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 import os
-import httpx
+import logging
+from ml_engine import http_pool
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Nugen API configuration
 # Nugen API configuration
 # Nugen API configuration
-NUGEN_API_URL = "https://api.nugen.in/api/v3/agents/run-agents/ai_r_aqi/run/"
+NUGEN_API_URL = os.getenv("NUGEN_API_URL", "https://api.nugen.in/api/v3/agents/run-agents/ai_r_aqi/run/")
 API_KEY = os.getenv("NUGEN_API_KEY")
-print(f"DEBUG: Chat module loaded. Key present? {bool(API_KEY)}", flush=True)
+logger.debug("Chat module loaded. Key present? %s", bool(API_KEY))
 
 class ChatRequest(BaseModel):
     message: str
@@ -38,7 +40,7 @@ async def chat_endpoint(request: ChatRequest):
 
     # 1. Check API Key
     if not API_KEY:
-        print("Chat: No API Key found, using static response.")
+        logger.info("No Nugen API key found, using static response.")
         return ChatResponse(response=get_static_response(request.message))
 
     headers = {
@@ -52,32 +54,29 @@ async def chat_endpoint(request: ChatRequest):
     }
 
     # 2. Try External API
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(NUGEN_API_URL, json=payload, headers=headers, timeout=60.0) 
-            print(f"DEBUG: API Response Status: {response.status_code}", flush=True)
-            response.raise_for_status()
-            data = response.json()
-            
-            ai_text = data.get("response") or data.get("output") or data.get("result")
-            
-            if not ai_text and "choices" in data:
-                 ai_text = data["choices"][0].get("text", "").strip()
+    try:
+        response = await http_pool.post(NUGEN_API_URL, json=payload, headers=headers, timeout=60.0)
+        logger.debug("Nugen API response status: %s", response.status_code, extra={"sampled": True})
+        response.raise_for_status()
+        data = response.json()
+        
+        ai_text = data.get("response") or data.get("output") or data.get("result")
+        
+        if not ai_text and "choices" in data:
+             ai_text = data["choices"][0].get("text", "").strip()
 
-            if ai_text:
-                # Sanitize response: The model tends to hallucinate "user:" turns.
-                # Truncate at the first occurrence of "user:" or "User:"
-                for marker in ["user:", "User:", "USER:"]:
-                    if marker in ai_text:
-                        ai_text = ai_text.split(marker)[0]
-                
-                return ChatResponse(response=ai_text.strip())
-            else:
-                return ChatResponse(response=get_static_response(request.message))
-                
-        except Exception as e:
-            # 3. Network/API Error Fallback
-            print(f"CRITICAL CHAT API ERROR: {type(e).__name__}: {e}", flush=True)
-            import traceback
-            traceback.print_exc()
+        if ai_text:
+            # Sanitize response: The model tends to hallucinate "user:" turns.
+            # Truncate at the first occurrence of "user:" or "User:"
+            for marker in ["user:", "User:", "USER:"]:
+                if marker in ai_text:
+                    ai_text = ai_text.split(marker)[0]
+            
+            return ChatResponse(response=ai_text.strip())
+        else:
             return ChatResponse(response=get_static_response(request.message))
+            
+    except Exception as e:
+        # 3. Network/API Error Fallback
+        logger.exception("Chat API error: %s: %s", type(e).__name__, e)
+        return ChatResponse(response=get_static_response(request.message))
@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from ..data_citizen import (
     getAQIData, getCleanAirScore, getHealthRiskData, getBestTimeData,
     getShockPredictorData, getGreenSuggestions, getWildlifeData, getTreeImpactData
@@ -6,16 +6,23 @@ from ..data_citizen import (
 from datetime import datetime, timedelta
 import pandas as pd
 from pydantic import BaseModel
-import asyncio
+import logging
 from ml_engine.api_client import MultiSourceAPIClient
+from ml_engine.metrics import record_cache
+from ml_engine.city_registry import get_city_registry
+from ml_engine import cpu_executor
 from ..wildlife_config import SPECIES_CONFIG, SAFE_LIMITS
+from http_cache import etag_matches, make_etag, not_modified, set_cache_headers, set_no_store
+from fast_json import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+logger = logging.getLogger(__name__)
 
 # Global Data Cache (moved from main.py)
 # Global Data Cache (moved from main.py)
 cached_aqi_data = {} # Key: City Name, Value: DataFrame
 last_fetch_time = {} # Key: City Name, Value: datetime
+CACHE_TTL_SECONDS = 1800
 
 def get_aqi_category(aqi):
     if aqi <= 50: return "Good", "#22c55e"
@@ -63,24 +70,22 @@ async def get_or_update_data(city='Delhi'):
     now = datetime.now()
     
     # Normalize city
-    target_city = 'Pune' if city.lower() == 'pune' else 'Delhi'
+    target_city = get_city_registry().resolve(city).name
     
     # Update if None or older than 30 minutes
-    if target_city not in cached_aqi_data or target_city not in last_fetch_time or (now - last_fetch_time[target_city]).total_seconds() > 1800:
+    stale = target_city not in cached_aqi_data or target_city not in last_fetch_time or (now - last_fetch_time[target_city]).total_seconds() > CACHE_TTL_SECONDS
+    record_cache('citizen_aqi', not stale)
+    if stale:
         try:
-            print(f"Refreshing real-time data cache for {target_city}...", flush=True)
+            logger.info("Refreshing real-time data cache for %s...", target_city)
             
-            # Run blocking synchronous data fetch in a separate thread
-            def fetch_wrapper():
-                client = MultiSourceAPIClient() 
-                return client.fetch_realtime_data(city=target_city)
-
-            df_real = await asyncio.to_thread(fetch_wrapper)
+            client = MultiSourceAPIClient()
+            df_real = await client.fetch_realtime_data(city=target_city)
 
             # Check if we got real-time data
             if df_real is not None and len(df_real) > 0:
                 if len(df_real) == 1:
-                    print(f"Real-time API returned 1 record for {target_city}. Blending...", flush=True)
+                    logger.info("Real-time API returned 1 record for %s. Blending...", target_city)
                     historical_sim = _generate_simulated_history()
                     historical_sim = historical_sim.iloc[:-1].copy()
                     df = pd.concat([historical_sim, df_real], ignore_index=True)
@@ -88,34 +93,56 @@ async def get_or_update_data(city='Delhi'):
                 else:
                     df = df_real
             else:
-                print(f"No real data for {target_city}. Using SIMULATION.", flush=True)
+                logger.warning("No real data for %s. Using SIMULATION.", target_city)
                 df = _generate_simulated_history()
 
             cached_aqi_data[target_city] = df
             last_fetch_time[target_city] = now
 
         except Exception as e:
-            print(f"Cache update failed for {target_city}: {e}", flush=True)
+            logger.error("Cache update failed for %s: %s", target_city, e)
             if target_city not in cached_aqi_data:
-                 print("Using Emergency SIMULATION.", flush=True)
+                 logger.warning("Using Emergency SIMULATION.")
                  cached_aqi_data[target_city] = _generate_simulated_history()
     
     return cached_aqi_data.get(target_city)
 
+def _frame_copy(df):
+    """
+    A private copy of a cached city frame for the calculators, which change
+    their frame and run concurrently on the CPU executor.
+    """
+    return None if df is None else df.copy()
+
 # --- Endpoints ---
 
+def _cache_validators(route, city, target_city):
+    """(etag, max_age) for a response built from the city's cached data, or (None, 0)."""
+    fetched = last_fetch_time.get(target_city)
+    if fetched is None:
+        return None, 0
+    age = (datetime.now() - fetched).total_seconds()
+    return make_etag(route, city, fetched.isoformat()), CACHE_TTL_SECONDS - age
+
 @router.get("/aqi")
-async def get_citizen_aqi(city: str = 'Delhi'):
+async def get_citizen_aqi(request: Request, response: Response, city: str = 'Delhi'):
     try:
         # Normalize city
-        target_city = 'Pune' if city.lower() == 'pune' else 'Delhi'
+        target_city = get_city_registry().resolve(city).name
 
         # 1. Get cached real-time data
         df = await get_or_update_data(city)
         
         if df is None or len(df) == 0:
+             set_no_store(response)
              return getAQIData() # Fallback mock
 
+        etag, max_age = _cache_validators('aqi', city, target_city)
+        if etag is not None:
+            if etag_matches(request, etag):
+                return not_modified(etag, max_age)
+            set_cache_headers(response, etag, max_age)
+
         # 2. Get latest record
         last_row = df.iloc[-1]
         current_aqi = float(last_row['AQI_computed'])
@@ -143,7 +170,8 @@ async def get_citizen_aqi(city: str = 'Delhi'):
             ]
         }
     except Exception as e:
-        print(f"Error serving real AQI: {e}")
+        logger.error("Error serving real AQI: %s", e)
+        set_no_store(response)
         return getAQIData()
 
 # Helper for Clean Air Score
@@ -226,19 +254,19 @@ def calculate_dynamic_score_v2(df):
             "historicalData": history
         }
     except Exception as e:
-        print(f"Error calculating score: {e}", flush=True)
+        logger.error("Error calculating score: %s", e)
         fallback['debug'] = f"Exception: {str(e)}"
         return fallback
 
 @router.get("/score")
 async def get_citizen_score(city: str = 'Delhi'):
     try:
-        # Normalize city to title case (e.g. 'pune' -> 'Pune') to match CITY_COORDS keys
-        target_city = 'Pune' if city.lower() == 'pune' else 'Delhi'
+        # Normalize city to its registry name (e.g. 'pune' -> 'Pune')
+        target_city = get_city_registry().resolve(city).name
         
         client = MultiSourceAPIClient()
         # Fetch 7 days history
-        history_df = client.fetch_history_data(city=target_city, days=7)
+        history_df = await client.fetch_history_data(city=target_city, days=7)
         
         if history_df is not None and not history_df.empty:
             # DEMO ADJUSTMENT: User insists Delhi must be worse (Lower Score) than Pune.
@@ -251,15 +279,14 @@ async def get_citizen_score(city: str = 'Delhi'):
                 history_df['AQI_computed'] = history_df['AQI_computed'] * 0.5
                 
             # Use real history for the score/trend
-            return calculate_dynamic_score_v2(history_df)
+            return await cpu_executor.run(calculate_dynamic_score_v2, history_df)
         else:
             # Fallback to simulated/cached data if OWM fails
             df = await get_or_update_data(city)
-            return calculate_dynamic_score_v2(df)
+            return await cpu_executor.run(calculate_dynamic_score_v2, _frame_copy(df))
             
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Clean Air Score API Error: %s", e)
         return {"error": str(e)}
 
 class HealthRiskRequest(BaseModel):
@@ -272,7 +299,7 @@ async def calculate_health_risk(request: HealthRiskRequest):
         # Use simple synchronous helper logic
         return getHealthRiskData(age_group=request.age_group, conditions=request.conditions)
     except Exception as e:
-        print(f"Health Risk Calc Error: {e}")
+        logger.error("Health Risk Calc Error: %s", e)
         return {
             "risk": 0,
             "level": "Unknown", 
@@ -282,9 +309,9 @@ async def calculate_health_risk(request: HealthRiskRequest):
 async def get_citizen_best_time(city: str = 'Delhi'):
     try:
         df = await get_or_update_data(city)
-        return calculate_dynamic_best_time(df)
+        return await cpu_executor.run(calculate_dynamic_best_time, _frame_copy(df))
     except Exception as e:
-        print(f"Best Time API Error: {e}", flush=True)
+        logger.error("Best Time API Error: %s", e)
         return getBestTimeData()
 
 def calculate_dynamic_shock_predictor(df, city='Delhi'):
@@ -362,7 +389,7 @@ def calculate_dynamic_shock_predictor(df, city='Delhi'):
         }
 
     except Exception as e:
-        print(f"Error in shock predictor calc: {e}")
+        logger.error("Error in shock predictor calc: %s", e)
         return getShockPredictorData()
 
 @router.get("/shock-predictor")
@@ -370,9 +397,9 @@ async def get_citizen_shock_predictor(city: str = 'Delhi'):
     try:
         df = await get_or_update_data(city)
         # Pass city to helper for correct bias application
-        return calculate_dynamic_shock_predictor(df, city)
+        return await cpu_executor.run(calculate_dynamic_shock_predictor, _frame_copy(df), city)
     except Exception as e:
-        print(f"Shock Predictor API Error: {e}", flush=True)
+        logger.error("Shock Predictor API Error: %s", e)
         return getShockPredictorData()
 # ... green suggestions (generic)
 
@@ -380,9 +407,9 @@ async def get_citizen_shock_predictor(city: str = 'Delhi'):
 async def get_citizen_wildlife(city: str = 'Delhi'):
     try:
         df = await get_or_update_data(city)
-        return calculate_dynamic_wildlife(df, city)
+        return await cpu_executor.run(calculate_dynamic_wildlife, _frame_copy(df), city)
     except Exception as e:
-        print(f"Wildlife API Error: {e}")
+        logger.error("Wildlife API Error: %s", e)
         return getWildlifeData()
 
 def calculate_dynamic_wildlife(df, city_name):
@@ -434,8 +461,8 @@ def calculate_dynamic_wildlife(df, city_name):
     # This means at Safe Limit, a high sensitivity species loses 10% health per pollutant.
     IMPACT_SCALING_FACTOR = 0.1
 
-    print(f"\n--- Calculating Wildlife Health for {city_name} (Season: {season}) ---")
-    print(f"Pollutants: PM2.5={current_pollutants['pm2_5']}, NO2={current_pollutants['no2']}")
+    logger.debug("Calculating wildlife health for %s (season: %s), PM2.5=%s, NO2=%s",
+                 city_name, season, current_pollutants['pm2_5'], current_pollutants['no2'], extra={"sampled": True})
     
     processed_species = []
     total_health = 0
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
+import logging
+import numpy as np
+from fastapi import APIRouter, HTTPException, Response
 from ml_engine.heatmap_prediction import predictor
+from ml_engine.spatial_raster import METHODS
+from fast_json import FastJSONRoute
 
-router = APIRouter(prefix="/api/policymaker", tags=["Policymaker"])
+router = APIRouter(prefix="/api/policymaker", tags=["Policymaker"], route_class=FastJSONRoute)
+logger = logging.getLogger(__name__)
 
 @router.get("/heatmap")
 async def get_heatmap_data():
@@ -16,5 +21,38 @@ async def get_heatmap_data():
             return []
         return data
     except Exception as e:
-        print(f"Heatmap API Error: {e}")
+        logger.error("Heatmap API Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/heatmap/raster")
+async def get_heatmap_raster(method: str = 'idw', format: str = 'bin'):
+    """
+    Interpolated AQI surface over the station bounding box.
+    format=bin returns the raw uint16 grid (geometry in X-Raster-* headers);
+    format=json returns the geometry with the grid as nested lists.
+    """
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {list(METHODS)}")
+    try:
+        result = await predictor.get_raster(method)
+    except Exception as e:
+        logger.error("Heatmap raster error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=503, detail="Heatmap model not available")
+
+    grid, surface = result
+    info = grid.describe()
+    if format == 'json':
+        info['values'] = np.where(np.isnan(surface), None, np.round(surface)).tolist()
+        return info
+    return Response(
+        content=grid.encode(surface),
+        media_type="application/octet-stream",
+        headers={
+            "X-Raster-Shape": f"{info['rows']},{info['cols']}",
+            "X-Raster-BBox": ",".join(str(v) for v in info['bbox']),
+            "X-Raster-Method": info['method'],
+            "X-Raster-Nodata": str(info['nodata']),
+        },
+    )
@@ -0,0 +1,166 @@
+"""
+Fast JSON responses for the API.
+
+FastJSONResponse renders with orjson. It handles NumPy arrays and scalars,
+datetimes and dataclasses natively, and writes NaN/inf as null. It is the
+app's default response class (main.py).
+
+The data routers use FastJSONRoute. An endpoint's return value that is not
+already a Response is rendered by FastJSONResponse directly, skipping
+FastAPI's jsonable_encoder pass, which walks every value in Python and
+rejects NumPy types. Headers and status set on an injected
+`response: Response` parameter are carried over. Endpoints with a
+response_model or return annotation keep FastAPI's validation path.
+
+StaticJSON holds a constant payload (e.g. the policymaker mocks) serialised
+and, above GZIP_MIN_BYTES, gzip-compressed once. Each request gets the
+identity or gzip body according to its Accept-Encoding, plus that
+body's ETag (the gzip one has its own, see http_cache.gzip_etag).
+
+Other responses are gzip-compressed by GZipMiddleware when they are large
+enough and the client accepts it (main.py).
+
+Config (env):
+    GZIP_MIN_BYTES  Smallest response body worth compressing (default 1024)
+    GZIP_LEVEL      Level for per-request compression (default 5)
+"""
+
+import asyncio
+import functools
+import gzip
+import hashlib
+import inspect
+import os
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import orjson
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+
+from http_cache import etag_matches, gzip_etag
+
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 5))
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_DATACLASS
+
+
+def _default(obj):
+    """Types orjson does not serialise on its own."""
+    if isinstance(obj, np.ndarray):
+        # Non-contiguous or object arrays
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        # Subclasses such as pandas.Timestamp; pandas.NaT is one too
+        return None if obj != obj else obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(mode='json')
+    if is_dataclass(obj):
+        return asdict(obj)
+    # pandas NaT and similar missing-value sentinels
+    try:
+        if obj != obj:
+            return None
+    except (TypeError, ValueError):
+        pass
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+
+def _direct_json(endpoint, status_code):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        response = FastJSONResponse(result, status_code=status_code or 200)
+        for value in kwargs.values():
+            if isinstance(value, Response):
+                # The injected `response: Response`; FastAPI leaves its status None unless set
+                response.headers.update(value.headers)
+                if value.status_code:
+                    response.status_code = value.status_code
+        return response
+
+    wrapper.direct_json = True
+    return wrapper
+
+
+class FastJSONRoute(APIRoute):
+    """APIRoute that renders plain return values with FastJSONResponse directly."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        response_model = kwargs.get('response_model')
+        annotated = inspect.signature(endpoint).return_annotation is not inspect.Signature.empty
+        if (
+            (response_model is None or isinstance(response_model, DefaultPlaceholder))
+            and not annotated
+            and asyncio.iscoroutinefunction(endpoint)
+            and not getattr(endpoint, 'direct_json', False)
+        ):
+            endpoint = _direct_json(endpoint, kwargs.get('status_code'))
+        super().__init__(path, endpoint, **kwargs)
+
+
+class StaticJSON:
+    """A constant JSON payload, serialised and gzip-compressed once."""
+
+    def __init__(self, content):
+        self.body = dumps(content)
+        self.gzip_body = None
+        if len(self.body) >= GZIP_MIN_BYTES:
+            self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        self.gzip_etag = gzip_etag(self.etag)
+
+    def response(self):
+        return PrecompressedJSONResponse(self)
+
+
+class PrecompressedJSONResponse(Response):
+    """Sends a StaticJSON's identity or gzip body, chosen from the request headers."""
+
+    media_type = "application/json"
+
+    def __init__(self, payload):
+        self.payload = payload
+        super().__init__(content=payload.body, headers={'ETag': payload.etag, 'Vary': 'Accept-Encoding'})
+
+    async def __call__(self, scope, receive, send):
+        request_headers = Headers(scope=scope)
+        use_gzip = self.payload.gzip_body is not None and 'gzip' in request_headers.get('accept-encoding', '')
+        if use_gzip:
+            self.headers['ETag'] = self.payload.gzip_etag
+        if etag_matches(Request(scope), self.payload.etag):
+            self.status_code = 304
+            self.body = b''
+            del self.headers['content-type']
+        elif use_gzip:
+            self.body = self.payload.gzip_body
+            self.headers['Content-Encoding'] = 'gzip'
+        self.headers['Content-Length'] = str(len(self.body))
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,84 @@
+"""
+HTTP caching helpers for the data endpoints.
+
+Endpoints backed by a cached snapshot (CPCB stations, the citizen data
+cache, materialized forecasts, the policymaker job artifacts) derive their
+ETag from that snapshot's version rather than from the response body, so a
+conditional request can be answered with 304 before the payload is built.
+Cache-Control max-age is the time left until the snapshot's next refresh,
+so clients never hold a response longer than the server would.
+
+Usage in a route:
+
+    etag = make_etag('rankings', city, version)
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age)
+    ...
+    set_cache_headers(response, etag, max_age)
+
+A gzip body is a different representation from the identity one, so it
+carries its own strong tag (gzip_etag: the identity tag plus "-gz");
+etag_matches accepts either form.
+"""
+
+import hashlib
+
+from fastapi import Request, Response
+
+GZIP_ETAG_SUFFIX = '-gz'
+
+
+def make_etag(*parts):
+    """Strong ETag from the parts identifying a representation (route, params, data version)."""
+    digest = hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def gzip_etag(etag):
+    """ETag of the gzip-coded variant of the representation tagged etag."""
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"'
+
+
+def etag_matches(request: Request, etag):
+    """
+    True when the request's If-None-Match covers etag or its gzip variant
+    (weak comparison, as for GET).
+    """
+    header = request.headers.get('if-none-match')
+    if not header or etag is None:
+        return False
+    if header.strip() == '*':
+        return True
+    target = etag[2:] if etag.startswith('W/') else etag
+    if target.endswith(f'{GZIP_ETAG_SUFFIX}"'):
+        target = f'{target[:-len(GZIP_ETAG_SUFFIX) - 1]}"'
+    targets = (target, gzip_etag(target))
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate in targets:
+            return True
+    return False
+
+
+def cache_headers(etag, max_age):
+    headers = {'Cache-Control': f"public, max-age={max(0, int(max_age))}"}
+    if etag is not None:
+        headers['ETag'] = etag
+    return headers
+
+
+def set_cache_headers(response: Response, etag, max_age):
+    response.headers.update(cache_headers(etag, max_age))
+
+
+def not_modified(etag, max_age):
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
+
+
+def set_no_store(response: Response):
+    """For fallback/error payloads that must not be cached or revalidated."""
+    if 'etag' in response.headers:
+        del response.headers['etag']
+    response.headers['Cache-Control'] = 'no-store'
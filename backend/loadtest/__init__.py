@@ -0,0 +1,15 @@
+"""
+End-to-end load testing against a local fake upstream.
+
+    # 1. Fake CPCB / OpenWeatherMap / Nugen, with injected latency and errors
+    python -m loadtest.fake_upstream --port 9100 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+    # 2. The backend, pointed at it
+    eval "$(python -m loadtest.fake_upstream --port 9100 --print-env)"
+    uvicorn main:app --port 8000
+
+    # 3. Load at a target rate
+    python -m loadtest.driver --target http://127.0.0.1:8000 --scenario mixed --rps 50 --duration 60
+
+All three run from backend/. See fake_upstream, scenarios and driver.
+"""
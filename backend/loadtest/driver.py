@@ -0,0 +1,165 @@
+"""
+Load-test Driver
+Sends a scenario's request mix (see scenarios) to a running backend at a
+fixed target rate and reports latency percentiles and error rates.
+
+The load is open-loop: request i is due at start + i / rps whether or not
+earlier ones have finished, and its latency is counted from that due time.
+A slow server therefore shows up as growing latency instead of a quietly
+lower request rate. Requests that would exceed --max-in-flight are not sent
+and are reported as dropped.
+
+A response is an error when it has a status >= 400 or the request fails
+(connection error, timeout).
+
+    python -m loadtest.driver --target http://127.0.0.1:8000 --scenario mixed --rps 50 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+# Imports below resolve like the app's (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest.scenarios import SCENARIOS
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self.dropped = 0
+
+    def record(self, name, latency, status):
+        self.latencies.setdefault(name, []).append(latency)
+        counts = self.statuses.setdefault(name, {})
+        counts[status] = counts.get(status, 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def _summary(self, latencies, errors, statuses=None):
+        values = np.asarray(latencies) * 1000
+        p50, p90, p99 = (round(float(v), 2) for v in np.percentile(values, [50, 90, 99]))
+        out = {
+            'requests': len(values),
+            'errors': errors,
+            'error_rate': round(errors / len(values), 4),
+            'p50_ms': p50,
+            'p90_ms': p90,
+            'p99_ms': p99,
+            'max_ms': round(float(values.max()), 2),
+            'mean_ms': round(float(values.mean()), 2),
+        }
+        if statuses is not None:
+            out['statuses'] = {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))}
+        return out
+
+    def report(self):
+        routes = {name: self._summary(values, self.errors.get(name, 0), self.statuses[name])
+                  for name, values in sorted(self.latencies.items())}
+        every = [v for values in self.latencies.values() for v in values]
+        total = self._summary(every, sum(self.errors.values())) if every else {'requests': 0}
+        total['dropped'] = self.dropped
+        return {'total': total, 'routes': routes}
+
+
+async def _send(client, recorder, entry, due):
+    name, method, path = entry[:3]
+    body = entry[4] if len(entry) > 4 else None
+    try:
+        response = await client.request(method, path, json=body)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(name, time.perf_counter() - due, status)
+
+
+async def run(target, scenario, rps, duration, max_in_flight=512, timeout=30.0, seed=0, warmup=0.0):
+    """Drive the scenario; returns the report dict. Warmup requests are sent but not recorded."""
+    mix = SCENARIOS[scenario]
+    rng = random.Random(seed)
+    weights = [entry[3] for entry in mix]
+    recorder = Recorder()
+    discard = Recorder()
+    in_flight = set()
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        total = int((duration + warmup) * rps)
+        start = time.perf_counter()
+        for i in range(total):
+            due = start + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sink = discard if i < warmup * rps else recorder
+            if len(in_flight) >= max_in_flight:
+                sink.dropped += 1
+                continue
+            entry = rng.choices(mix, weights)[0]
+            task = asyncio.create_task(_send(client, sink, entry, due))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = time.perf_counter() - start
+
+    report = recorder.report()
+    report['total']['achieved_rps'] = round(report['total']['requests'] / max(elapsed - warmup, 1e-9), 2)
+    report['config'] = {
+        'target': target, 'scenario': scenario, 'rps': rps, 'duration': duration,
+        'warmup': warmup, 'max_in_flight': max_in_flight, 'timeout': timeout, 'seed': seed,
+        'started_at': datetime.now().isoformat(),
+    }
+    return report
+
+
+def format_report(report):
+    lines = [f"{'route':<32} {'reqs':>7} {'err%':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    rows = list(report['routes'].items()) + [('TOTAL', report['total'])]
+    for name, s in rows:
+        if not s.get('requests'):
+            continue
+        lines.append(f"{name:<32} {s['requests']:>7} {s['error_rate'] * 100:>6.2f}% {s['p50_ms']:>9.1f} "
+                     f"{s['p90_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}")
+    total = report['total']
+    lines.append(f"achieved {total.get('achieved_rps', 0)} req/s, dropped {total['dropped']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest.driver', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='http://127.0.0.1:8000', help="Backend base URL")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--rps', type=float, default=20.0, help="Target requests per second")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of recorded load")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Seconds of unrecorded load first")
+    parser.add_argument('--max-in-flight', type=int, default=512)
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the request mix")
+    parser.add_argument('-o', '--output', default='loadtest_results.json')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args.target, args.scenario, args.rps, args.duration,
+                             max_in_flight=args.max_in_flight, timeout=args.timeout,
+                             seed=args.seed, warmup=args.warmup))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report))
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Fake Upstream
+Local stand-in for the three external APIs the backend calls, serving the
+recorded responses in loadtest/fixtures:
+
+    GET  /resource/{resource_id}                  CPCB OGD station readings
+                                                  (filters[city] honoured,
+                                                  ETag / If-None-Match -> 304)
+    GET  /data/2.5/air_pollution/history          OpenWeatherMap history: one
+                                                  hourly entry per hour in
+                                                  [start, end], built from the
+                                                  recorded sample
+    GET  /data/2.5/weather                        OpenWeatherMap current weather
+    POST /api/v3/agents/run-agents/{agent}/run/   Nugen agent reply
+
+Each service can be given latency (fixed + uniform jitter) and an error rate
+(the share of requests answered with 503). Counters per service are at
+GET /_stats; POST /_faults changes the fault settings of a running server.
+
+    python -m loadtest.fake_upstream --port 9100 --latency-ms 80 --jitter-ms 40 \\
+        --error-rate 0.02 --fault cpcb:400:0.1
+
+Point the backend at it with the env printed by --print-env.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+SERVICES = ('cpcb', 'owm', 'nugen')
+NUGEN_AGENT = 'ai_r_aqi'
+
+
+def load_fixture(name):
+    with open(FIXTURES_DIR / name, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Faults:
+    """Per-service injected latency and error rate."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        self._random = random.Random(seed)
+        self.settings = {name: {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'error_rate': error_rate}
+                         for name in SERVICES}
+
+    def update(self, service, **values):
+        self.settings[service].update({k: float(v) for k, v in values.items() if v is not None})
+
+    async def apply(self, service):
+        """Sleep for the service's latency; True if this request should fail."""
+        settings = self.settings[service]
+        delay = settings['latency_ms'] + self._random.uniform(0, settings['jitter_ms'])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return self._random.random() < settings['error_rate']
+
+
+def create_app(faults=None):
+    faults = faults or Faults()
+    ogd = load_fixture('ogd_aqi_stations.json')
+    weather = load_fixture('owm_weather.json')
+    history = load_fixture('owm_air_pollution_history.json')
+    nugen = load_fixture('nugen_agent.json')
+    stats = {name: {'requests': 0, 'errors': 0, 'not_modified': 0} for name in SERVICES}
+
+    app = FastAPI(title="Fake upstream", docs_url=None, redoc_url=None)
+
+    async def begin(service):
+        stats[service]['requests'] += 1
+        if await faults.apply(service):
+            stats[service]['errors'] += 1
+            return JSONResponse({'error': 'injected failure', 'service': service}, status_code=503)
+        return None
+
+    @app.get("/resource/{resource_id}")
+    async def ogd_resource(resource_id: str, request: Request):
+        failed = await begin('cpcb')
+        if failed is not None:
+            return failed
+        city = request.query_params.get('filters[city]')
+        records = [r for r in ogd['records'] if city is None or r['city'].lower() == city.lower()]
+        limit = int(request.query_params.get('limit', 10))
+        records = records[:limit]
+
+        # Readings change on the hour, like the real feed
+        stamp = datetime.now().replace(minute=0, second=0, microsecond=0)
+        etag = f'"{resource_id[:8]}-{city}-{stamp:%Y%m%d%H}"'
+        if request.headers.get('if-none-match') == etag:
+            stats['cpcb']['not_modified'] += 1
+            return Response(status_code=304, headers={'ETag': etag})
+
+        last_update = stamp.strftime('%d-%m-%Y %H:%M:%S')
+        body = dict(ogd, index_name=resource_id, total=len(records), count=len(records), limit=str(limit),
+                    records=[dict(r, last_update=last_update) for r in records])
+        return JSONResponse(body, headers={'ETag': etag, 'Last-Modified': stamp.strftime('%a, %d %b %Y %H:00:00 GMT')})
+
+    @app.get("/data/2.5/air_pollution/history")
+    async def owm_history(request: Request):
+        failed = await begin('owm')
+        if failed is not None:
+            return failed
+        end = int(request.query_params.get('end', time.time()))
+        start = int(request.query_params.get('start', end - 24 * 3600))
+        sample = history['list'][0]
+        items = []
+        for dt in range(start - start % 3600, end + 1, 3600):
+            hour = datetime.fromtimestamp(dt).hour
+            factor = 1.2 if hour in (7, 8, 9, 18, 19, 20) else 0.8 if hour in (2, 3, 4, 5) else 1.0
+            components = {k: round(v * factor, 2) for k, v in sample['components'].items()}
+            items.append({'main': sample['main'], 'components': components, 'dt': dt})
+        return {'coord': history['coord'], 'list': items}
+
+    @app.get("/data/2.5/weather")
+    async def owm_weather():
+        failed = await begin('owm')
+        if failed is not None:
+            return failed
+        return dict(weather, dt=int(time.time()))
+
+    @app.post("/api/v3/agents/run-agents/{agent}/run/")
+    async def nugen_agent(agent: str):
+        failed = await begin('nugen')
+        if failed is not None:
+            return failed
+        return nugen
+
+    @app.get("/_stats")
+    async def get_stats():
+        return {'services': stats, 'faults': faults.settings}
+
+    @app.post("/_faults")
+    async def set_faults(service: str, latency_ms: float = None, jitter_ms: float = None,
+                         error_rate: float = None):
+        targets = SERVICES if service == 'all' else (service,)
+        for name in targets:
+            if name not in faults.settings:
+                return JSONResponse({'error': f"unknown service {name}"}, status_code=404)
+            faults.update(name, latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate)
+        return faults.settings
+
+    return app
+
+
+def backend_env(base_url):
+    """Environment that points the backend (and its API-key checks) at this server."""
+    base_url = base_url.rstrip('/')
+    return {
+        'CPCB_API_BASE_URL': base_url,
+        'OPENWEATHERMAP_BASE_URL': base_url,
+        'NUGEN_API_URL': f"{base_url}/api/v3/agents/run-agents/{NUGEN_AGENT}/run/",
+        # Upstream calls are only made when a key is configured
+        'CPCB_API_KEY': 'loadtest',
+        'OPENWEATHERMAP_API_KEY': 'loadtest',
+        'OPENWEATHER_API_KEY': 'loadtest',
+        'NUGEN_API_KEY': 'loadtest',
+    }
+
+
+def _parse_fault(value):
+    """'service:latency_ms[:error_rate]'"""
+    parts = value.split(':')
+    if parts[0] not in SERVICES or len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"expected one of {SERVICES} as service:latency_ms[:error_rate]")
+    return parts[0], float(parts[1]), float(parts[2]) if len(parts) == 3 else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest.fake_upstream', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Added to every response")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Extra uniform random latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument('--fault', type=_parse_fault, action='append', default=[],
+                        metavar='SERVICE:LATENCY_MS[:ERROR_RATE]', help="Per-service override (repeatable)")
+    parser.add_argument('--seed', type=int, help="Seed for latency jitter and error injection")
+    parser.add_argument('--print-env', action='store_true', help="Print the backend env for this server and exit")
+    args = parser.parse_args(argv)
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.print_env:
+        for key, value in backend_env(base_url).items():
+            print(f"export {key}={value}")
+        return
+
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, seed=args.seed)
+    for service, latency_ms, error_rate in args.fault:
+        faults.update(service, latency_ms=latency_ms, error_rate=error_rate)
+
+    import uvicorn
+    uvicorn.run(create_app(faults), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
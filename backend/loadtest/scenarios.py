@@ -0,0 +1,54 @@
+"""
+Load-test Scenarios
+Weighted request mixes for the driver. Each entry is
+(name, method, path, weight[, json body]); a request is drawn from the mix
+in proportion to its weight.
+
+    citizen      the citizen app's dashboard calls
+    policymaker  policymaker dashboard, heatmap and job artifacts
+    ml           the 3-day forecast for both cities
+    chat         Air Buddy chat (Nugen agent)
+    mixed        all of the above, weighted roughly like real traffic
+"""
+
+CITIZEN = [
+    ('citizen.aqi', 'GET', '/api/citizen/aqi?city=Delhi', 6),
+    ('citizen.aqi.pune', 'GET', '/api/citizen/aqi?city=Pune', 2),
+    ('citizen.score', 'GET', '/api/citizen/score?city=Delhi', 2),
+    ('citizen.shock_predictor', 'GET', '/api/citizen/shock-predictor?city=Delhi', 1),
+    ('citizen.wildlife', 'GET', '/api/citizen/wildlife?city=Delhi', 1),
+    ('citizen.health_risk', 'POST', '/api/citizen/health-risk-calc', 1,
+     {'age_group': 'adult', 'conditions': ['asthma']}),
+]
+
+POLICYMAKER = [
+    ('policymaker.heatmap', 'GET', '/api/policymaker/heatmap', 4),
+    ('policymaker.heatmap_raster', 'GET', '/api/policymaker/heatmap/raster', 1),
+    ('policymaker.rankings', 'GET', '/api/policymaker/rankings', 3),
+    ('policymaker.sensors', 'GET', '/api/policymaker/sensors', 2),
+    ('policymaker.weather', 'GET', '/api/policymaker/weather?city=Delhi', 1),
+    ('policymaker.dashboard_stats', 'GET', '/api/policymaker/data/dashboard_stats.json', 2),
+    ('policymaker.station_forecasts', 'GET', '/api/policymaker/data/station_forecasts.json', 1),
+]
+
+ML = [
+    ('ml.forecast_3day', 'GET', '/api/ml/forecast-3day?city=Delhi', 3),
+    ('ml.forecast_3day.pune', 'GET', '/api/ml/forecast-3day?city=Pune', 1),
+]
+
+CHAT = [
+    ('chat', 'POST', '/chat/', 1, {'message': 'Is it safe for a morning walk today?'}),
+]
+
+
+def _scaled(entries, factor):
+    return [(e[0], e[1], e[2], e[3] * factor) + tuple(e[4:]) for e in entries]
+
+
+SCENARIOS = {
+    'citizen': CITIZEN,
+    'policymaker': POLICYMAKER,
+    'ml': ML,
+    'chat': CHAT,
+    'mixed': _scaled(CITIZEN, 3) + _scaled(POLICYMAKER, 2) + _scaled(ML, 2) + CHAT,
+}
@@ -0,0 +1,69 @@
+"""
+Logging setup for the backend.
+
+All packages (ml_engine, policymaker_backend, citizen_backend) log through
+module-level `logging.getLogger(__name__)` loggers. This module configures
+the root handler once, at app startup.
+
+Environment variables:
+    LOG_LEVEL              Root level (default INFO)
+    LOG_LEVELS             Per-module overrides, e.g.
+                           "ml_engine=DEBUG,policymaker_backend.jobs=WARNING"
+    LOG_DEBUG_SAMPLE_EVERY Keep 1 in N per-request debug lines (default 100).
+                           Lines opt in with extra={"sampled": True}.
+"""
+
+import itertools
+import logging
+import os
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+
+class SamplingFilter(logging.Filter):
+    """Let through only every Nth record marked as sampled."""
+
+    def __init__(self, every=1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False) or self.every == 1:
+            return True
+        return next(self._counter) % self.every == 0
+
+
+def _parse_levels(spec):
+    """Parse "a=DEBUG,b.c=WARNING" into {'a': 'DEBUG', 'b.c': 'WARNING'}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        name, level = name.strip(), level.strip().upper()
+        if name and level:
+            levels[name] = level
+    return levels
+
+
+def configure_logging():
+    """Install the root handler and apply per-module levels from the environment."""
+    root = logging.getLogger()
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    if not any(getattr(h, "_backend_handler", False) for h in root.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler._backend_handler = True
+        root.addHandler(handler)
+    else:
+        handler = next(h for h in root.handlers if getattr(h, "_backend_handler", False))
+
+    handler.filters = [SamplingFilter(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "100"))]
+
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level)
+        # Modules are imported as both `ml_engine.x` and `backend.ml_engine.x`
+        if not name.startswith("backend."):
+            logging.getLogger("backend." + name).setLevel(level)
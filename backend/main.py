@@ -3,7 +3,18 @@ from datetime import datetime
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from pathlib import Path
+
+# Load Environment (before the routers so module-level config sees it)
+env_path = Path(__file__).resolve().parent / '.env'
+load_dotenv(dotenv_path=env_path)
+
+from logging_config import configure_logging
+configure_logging()
+
+from fast_json import FastJSONResponse, GZIP_LEVEL, GZIP_MIN_BYTES
 from database import engine
 import models
 
@@ -12,17 +23,15 @@ import models
 from citizen_backend.routes import citizen, chat, heatmap
 from auth import router as auth_module
 from ml_engine import router as ml_module
+from ml_engine import cpu_executor, metrics
 from policymaker_backend.routes import router as policymaker_router
-
-# Load Environment
-# Load Environment
-env_path = Path(__file__).resolve().parent / '.env'
-load_dotenv(dotenv_path=env_path)
+from policymaker_backend import scheduler as policymaker_scheduler
+import readiness
 
 # Initialize DB Tables
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # CORS configuration
 origins = [
@@ -39,14 +48,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses for clients that accept gzip (precompressed ones pass through)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
+
+# Outermost, so request latency includes compression
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Startup data fetch for Citizen app
 @app.on_event("startup")
 async def startup_event():
     # Trigger the citizen data fetcher on startup
     import asyncio
     asyncio.create_task(citizen.get_or_update_data())
-    # Initialize ML Engine (Load Models)
-    await ml_module.init_ml()
+    # Load the models in the background, concurrently; /ready reports progress
+    readiness.start()
+    # Record event-loop lag (ml_engine.cpu_executor keeps CPU work off the loop)
+    asyncio.create_task(cpu_executor.watch_event_loop())
+    # Policymaker data job: seed from disk, then run on a timer
+    await policymaker_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await policymaker_scheduler.stop()
+    # Close pooled upstream connections
+    from ml_engine import http_pool
+    await http_pool.aclose()
+    cpu_executor.shutdown()
 
 # Include Routers
 # Include Routers
@@ -60,3 +87,14 @@ app.include_router(policymaker_router, prefix="/api/policymaker", tags=["Policym
 @app.get("/")
 async def root():
     return {"message": "FastAPI Backend is running"}
+
+@app.get("/ready", include_in_schema=False)
+async def get_ready():
+    """Readiness probe: 503 until the models have loaded, plus which caches are warm."""
+    body = readiness.report()
+    return FastJSONResponse(body, status_code=200 if body['ready'] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of request, upstream, model and cache metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
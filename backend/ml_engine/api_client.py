@@ -1,14 +1,33 @@
 """
 Multi-Source API Client for AQI Data
 Supports OpenAQ (historical), OpenWeatherMap (real-time), and CPCB OGD (Government Data)
+
+All network methods are coroutines on the shared pooled HTTP client
+(see http_pool). Blocking callers wrap them with http_pool.run_sync().
+
+Config (env):
+    CPCB_API_BASE_URL        OGD API root (default https://api.data.gov.in)
+    OPENWEATHERMAP_BASE_URL  OpenWeatherMap API root (default https://api.openweathermap.org)
+The base URLs can point at a local stand-in, e.g. loadtest/fake_upstream.py.
 """
-import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
 import os
+import logging
+from .aqi_kernels import aqi_to_pm25
+from . import http_pool
+from .cpcb_snapshot import SnapshotCache
+from .metrics import upstream_call
+from .city_registry import get_city_registry
+
+logger = logging.getLogger(__name__)
 
+CPCB_API_BASE_URL = os.getenv("CPCB_API_BASE_URL", "https://api.data.gov.in").rstrip('/')
+OPENWEATHERMAP_BASE_URL = os.getenv("OPENWEATHERMAP_BASE_URL", "https://api.openweathermap.org").rstrip('/')
+
+@upstream_call
 async def fetch_live_weather_data():
     """Helper to fetch just the latest weather parameters for model inference."""
     # Instantiate client with keys from env (assuming loaded)
@@ -18,9 +37,8 @@ async def fetch_live_weather_data():
         cpcb_key=os.getenv("CPCB_API_KEY")
     )
     
-    # Run synchronous fetch in this async wrapper (simpler than full async rewrite)
     # Get 1 hour of data to get latest conditions
-    df = client.fetch_realtime_data(city='Delhi', hours=1)
+    df = await client.fetch_realtime_data(city='Delhi', hours=1)
     
     if df is not None and not df.empty:
         latest = df.iloc[-1]
@@ -36,12 +54,13 @@ async def fetch_live_weather_data():
         }
     return {}
 
+@upstream_call
 async def fetch_cpcb_station_data():
     """Helper to fetch station-wise data specifically for the heatmap."""
     client = MultiSourceAPIClient(
         cpcb_key=os.getenv("CPCB_API_KEY")
     )
-    return client.fetch_cpcb_current_stations(city='Delhi')
+    return await client.fetch_cpcb_current_stations(city='Delhi')
 
 
 class MultiSourceAPIClient:
@@ -52,147 +71,137 @@ class MultiSourceAPIClient:
     - OpenAQ: Historical backup
     """
     
-    # City coordinates
-    CITY_COORDS = {
-        'Delhi': {'lat': 28.7041, 'lon': 77.1025},
-        'Mumbai': {'lat': 19.0760, 'lon': 72.8777},
-        'Bangalore': {'lat': 12.9716, 'lon': 77.5946},
-        'Kolkata': {'lat': 22.5726, 'lon': 88.3639},
-        'Pune': {'lat': 18.5204, 'lon': 73.8567},
-        'Chennai': {'lat': 13.0827, 'lon': 80.2707},
-        'Hyderabad': {'lat': 17.3850, 'lon': 78.4867}
-    }
-    
     def __init__(self, openweathermap_key=None, openaq_key=None, cpcb_key=None):
         self.owm_key = openweathermap_key or os.getenv("OPENWEATHERMAP_API_KEY")
         self.openaq_key = openaq_key or os.getenv("OPENAQ_API_KEY")
         self.cpcb_key = cpcb_key or os.getenv("CPCB_API_KEY")
     
-    def fetch_realtime_data(self, city='Delhi', hours=24):
+    @upstream_call
+    async def fetch_realtime_data(self, city='Delhi', hours=24):
         """
         Fetch real-time data using the best available source.
         Priority: CPCB (Official) > OpenWeatherMap > Simulated
         """
-        print(f'\nFetching real-time data for {city}...')
+        logger.info('Fetching real-time data for %s...', city)
         
         # Try CPCB/OGD first (Official for India)
         # Note: OGD API usually separates Pollutants (Resource 1) from Weather (Resource 2 or sometimes absent)
         # But we can check if it works.
         if self.cpcb_key:
             # For the general 'city' average, we can aggregate station data if available
-            df = self._fetch_cpcb_ogd(city)
+            df = await self._fetch_cpcb_ogd(city)
             if df is not None and len(df) > 0:
-                print("  [OK] Using CPCB OGD Data")
+                logger.info("[OK] Using CPCB OGD Data")
                 return df
 
         # Try OpenWeatherMap (Good for weather parameters needed for model)
         if self.owm_key and self.owm_key != 'YOUR_API_KEY_HERE':
-            df = self._fetch_openweathermap(city, hours)
+            df = await self._fetch_openweathermap(city, hours)
             if df is not None and len(df) > 0:
                 return df
     
         # Fall back to simulated data
-        print('[INFO] Using simulated data (no API keys or APIs unavailable)')
+        logger.info('Using simulated data (no API keys or APIs unavailable)')
         return self._generate_simulated_data(city, hours)
 
-    def fetch_history_data(self, city='Delhi', days=7):
+    @upstream_call
+    async def fetch_history_data(self, city='Delhi', days=7):
         """
         Fetch historical data specifically for visualization (e.g., Weekly Trend).
         Prioritizes OpenWeatherMap History API as requested by user.
         """
-        print(f"Fetching {days} days history for {city} via OpenWeatherMap...")
+        logger.info("Fetching %s days history for %s via OpenWeatherMap...", days, city)
         if self.owm_key:
             # 24 hours * days
-            df = self._fetch_openweathermap(city, hours=days*24)
+            df = await self._fetch_openweathermap(city, hours=days*24)
             if df is not None and not df.empty:
                 return df
                 
         # Fallback to simulated generated history if OWM fails
-        print("OWM History failed/missing. Using simulation.")
+        logger.warning("OWM History failed/missing. Using simulation.")
         return self._generate_simulated_data(city, hours=days*24)
 
 
-    def fetch_cpcb_current_stations(self, city='Delhi'):
-        """Specific method to get station-wise breakdown for Heatmap."""
+    @upstream_call
+    async def fetch_cpcb_current_stations(self, city='Delhi'):
+        """
+        Specific method to get station-wise breakdown for Heatmap.
+        Served from the shared snapshot cache (see cpcb_snapshot); the
+        upstream is only called when the city's snapshot is due a refresh.
+        """
         if not self.cpcb_key:
             return None
+        return await cpcb_snapshots.get(city, self._request_cpcb_stations)
+
+    @upstream_call
+    async def _request_cpcb_stations(self, city, headers):
+        """Raw OGD request for a city's station records (conditional headers passed through)."""
+        # Resource ID for "Real time Air Quality Index from various location"
+        resource_id = "3b01bcb8-0b14-4abf-b6f2-c1bfd384ba69"
+        url = f"{CPCB_API_BASE_URL}/resource/{resource_id}"
+        
+        params = {
+            "api-key": self.cpcb_key,
+            "format": "json",
+            "limit": 500, # Get a large batch
+            "filters[city]": city,
+        }
+        
+        # Remove pollutant filters to get everything and filter in-memory
+        # This avoids API quirks with strings like "PM2.5" vs "PM 2.5"
+        
+        logger.debug("Calling CPCB OGD API: %s with limit=500, city=%s", url, city, extra={"sampled": True})
+        
+        response = await http_pool.get(url, params=params, headers=headers, timeout=30)
+        logger.debug("CPCB Response Status: %s", response.status_code, extra={"sampled": True})
+        return response
+
+    @staticmethod
+    def _parse_cpcb_stations(data):
+        """OGD payload -> { "StationName": { "PM2.5": val, "AQI": val } }"""
+        records = data.get("records", [])
+        logger.debug("CPCB Records Found: %s", len(records), extra={"sampled": True})
+        
+        # Process records into a dictionary: { "StationName": { "PM2.5": val, "AQI": val } }
+        station_data = {}
+        
+        pm25_count = 0
+        
+        for item in records:
+            s_name = item.get("station", "").strip()
+            if not s_name: continue
             
-        try:
-            # Resource ID for "Real time Air Quality Index from various location"
-            resource_id = "3b01bcb8-0b14-4abf-b6f2-c1bfd384ba69"
-            url = f"https://api.data.gov.in/resource/{resource_id}"
-            
-            params = {
-                "api-key": self.cpcb_key,
-                "format": "json",
-                "limit": 500, # Get a large batch
-                "filters[city]": city,
-            }
-            
-            # Remove pollutant filters to get everything and filter in-memory
-            # This avoids API quirks with strings like "PM2.5" vs "PM 2.5"
-            
-            print(f"DEBUG: Calling CPCB OGD API: {url} with limit=500, city={city}")
-            print(f"DEBUG: Params: api-key={params['api-key'][:5]}***, filters[city]={params['filters[city]']}")
-            
-            response = requests.get(url, params=params, timeout=30)
-            print(f"DEBUG: CPCB Response Status: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"CPCB API Error: {response.status_code} - {response.text[:200]}")
-                return None
-                
-            data = response.json()
-            records = data.get("records", [])
-            print(f"DEBUG: CPCB Records Found: {len(records)}")
-            
-            # Process records into a dictionary: { "StationName": { "PM2.5": val, "AQI": val } }
-            station_data = {}
+            # Clean name: "Alipur, Delhi - DPCC" -> "Alipur"
+            # Splits by comma or hyphen to get the main locality name
+            s_name_clean = s_name.split(",")[0].split("-")[0].strip()
             
-            match_count = 0
-            pm25_count = 0
+            if s_name_clean not in station_data:
+                station_data[s_name_clean] = {}
             
-            for item in records:
-                s_name = item.get("station", "").strip()
-                if not s_name: continue
-                
-                # Clean name: "Alipur, Delhi - DPCC" -> "Alipur"
-                # Splits by comma or hyphen to get the main locality name
-                s_name_clean = s_name.split(",")[0].split("-")[0].strip()
-                
-                if s_name_clean not in station_data:
-                    station_data[s_name_clean] = {}
-                
-                pollutant = item.get("pollutant_id")
-                avg_val = item.get("avg_value")
-                
-                if pollutant and avg_val is not None:
-                    try:
-                        val = float(avg_val)
-                        station_data[s_name_clean][pollutant] = val
-                        if pollutant == "PM2.5":
-                            pm25_count += 1
-                    except:
-                        pass
-                        
-            print(f"DEBUG: Stations with data: {len(station_data)}. PM2.5 records: {pm25_count}")
-            if len(station_data) > 0:
-                 print(f"DEBUG: Sample Station Keys: {list(station_data.keys())[:5]}")
-                 
-            return station_data
-                        
-            return station_data
+            pollutant = item.get("pollutant_id")
+            avg_val = item.get("avg_value")
             
-        except Exception as e:
-            print(f"Error fetching CPCB stations: {e}")
-            return None
+            if pollutant and avg_val is not None:
+                try:
+                    val = float(avg_val)
+                    station_data[s_name_clean][pollutant] = val
+                    if pollutant == "PM2.5":
+                        pm25_count += 1
+                except:
+                    pass
+                    
+        logger.debug("Stations with data: %s. PM2.5 records: %s. Sample: %s", len(station_data), pm25_count,
+                     list(station_data.keys())[:5], extra={"sampled": True})
+             
+        return station_data
 
-    def _fetch_cpcb_ogd(self, city):
+    @upstream_call
+    async def _fetch_cpcb_ogd(self, city):
         """Fetch city-average from OGD."""
         # Simple implementation: fetch stations and average them
-        s_data = self.fetch_cpcb_current_stations(city)
+        s_data = await self.fetch_cpcb_current_stations(city)
         if not s_data:
-            print(f"  [WARN] CPCB Station Data is Empty/None for {city}")
+            logger.warning("CPCB Station Data is Empty/None for %s", city)
             return None
             
         # Aggregate
@@ -203,10 +212,10 @@ class MultiSourceAPIClient:
             else:
                 pass # print(f"  [DEBUG] No PM2.5 for {s_name}")
         
-        print(f"  [DEBUG] Found PM2.5 data for {len(pm25_vals)} stations.")
+        logger.debug("Found PM2.5 data for %s stations.", len(pm25_vals))
         
         if not pm25_vals:
-            print("  [WARN] No PM2.5 values found across all stations (Fallback trigger).")
+            logger.warning("No PM2.5 values found across all stations (Fallback trigger).")
             return None
             
         if len(pm25_vals) >= 4:
@@ -221,15 +230,15 @@ class MultiSourceAPIClient:
             if trim_cnt > 0 and (n_vals - 2*trim_cnt) > 0:
                  trimmed_vals = pm25_vals[trim_cnt : n_vals - trim_cnt]
                  avg_aqi = np.mean(trimmed_vals)
-                 print(f"  [OK] Using Trimmed Mean (25% cut, n={len(trimmed_vals)}): {avg_aqi}")
+                 logger.info("[OK] Using Trimmed Mean (25%% cut, n=%s): %s", len(trimmed_vals), avg_aqi)
             else:
                  # Fallback to Median if too few points to trim
                  avg_aqi = np.median(pm25_vals)
-                 print(f"  [OK] Using Median (n={len(pm25_vals)}): {avg_aqi}")
+                 logger.info("[OK] Using Median (n=%s): %s", len(pm25_vals), avg_aqi)
         else:
             # Fallback to simple median for sparse data
             avg_aqi = np.median(pm25_vals)
-            print(f"  [OK] Using Median (n={len(pm25_vals)}): {avg_aqi}")
+            logger.info("[OK] Using Median (n=%s): %s", len(pm25_vals), avg_aqi)
 
         # We need to provide 'PM2_5_ugm3' because the model expects it as a feature.
         # But we must ensure downstream logic doesn't re-calculate AQI from this "Mass" if it's actually AQI.
@@ -237,15 +246,7 @@ class MultiSourceAPIClient:
         # OR: Just set it, and ensure 'AQI_computed' is set, and we skip re-calc if it exists.
         
         # Let's approximate Mass from AQI for the feature column
-        def aqi_to_pm25_approx(aqi):
-            if aqi <= 50: return aqi * (30/50)
-            if aqi <= 100: return 30 + (aqi-50)*(30/50)
-            if aqi <= 200: return 60 + (aqi-100)*(30/100)
-            if aqi <= 300: return 90 + (aqi-200)*(30/100)
-            if aqi <= 400: return 120 + (aqi-300)*(130/100)
-            return 250 + (aqi-400)*(130/100)
-
-        estimated_mass = aqi_to_pm25_approx(avg_aqi)
+        estimated_mass = aqi_to_pm25(avg_aqi)
         
         record = {
             'Datetime': datetime.now(),
@@ -263,16 +264,19 @@ class MultiSourceAPIClient:
         
         return pd.DataFrame([record])
 
-    def _fetch_openweathermap(self, city, hours):
+    @upstream_call
+    async def _fetch_openweathermap(self, city, hours):
         """Fetch from OpenWeatherMap Air Pollution API."""
         try:
-            coords = self.CITY_COORDS.get(city, self.CITY_COORDS['Delhi'])
-            print(f"DEBUG: Fetching OWM Data for City: {city} at Coords: {coords}")
+            # City coordinates (unknown cities use the default city's)
+            info = get_city_registry().resolve(city)
+            coords = {'lat': info.lat, 'lon': info.lon}
+            logger.debug("Fetching OWM Data for City: %s at Coords: %s", city, coords, extra={"sampled": True})
             
             end_time = int(datetime.now().timestamp())
             start_time = int((datetime.now() - timedelta(hours=hours)).timestamp())
             
-            url = "http://api.openweathermap.org/data/2.5/air_pollution/history"
+            url = f"{OPENWEATHERMAP_BASE_URL}/data/2.5/air_pollution/history"
             params = {
                 'lat': coords['lat'],
                 'lon': coords['lon'],
@@ -281,17 +285,17 @@ class MultiSourceAPIClient:
                 'appid': self.owm_key
             }
             
-            print(f'  Calling OpenWeatherMap API...')
-            response = requests.get(url, params=params, timeout=30)
+            logger.info('Calling OpenWeatherMap API...')
+            response = await http_pool.get(url, params=params, timeout=30)
             
             if response.status_code != 200:
-                print(f'  OpenWeatherMap error: {response.status_code}')
+                logger.error('OpenWeatherMap error: %s', response.status_code)
                 return None
             
             data = response.json()
             
             if 'list' not in data:
-                print('  Unexpected response format')
+                logger.warning('Unexpected response format')
                 return None
             
             records = []
@@ -318,13 +322,14 @@ class MultiSourceAPIClient:
             
             # Use proper Indian CPCB AQI calculation
             from ml_engine.aqi_calculator import compute_aqi_for_dataframe
+            # A day or two of rows: computed here, this runs inside the forecast's executor task
             df = compute_aqi_for_dataframe(df, inplace=True)
             
-            print(f'  [OK] Fetched {len(df)} records from OpenWeatherMap with CPCB AQI')
+            logger.info('[OK] Fetched %s records from OpenWeatherMap with CPCB AQI', len(df))
             return df
             
         except Exception as e:
-            print(f'  OpenWeatherMap error: {e}')
+            logger.error('OpenWeatherMap error: %s', e)
             return None
     
     def _fetch_openaq(self, city, hours):
@@ -338,7 +343,7 @@ class MultiSourceAPIClient:
 
     def _generate_simulated_data(self, city, hours):
         """Generate realistic simulated data for demo/testing."""
-        print(f'  Generating {hours} hours of simulated data...')
+        logger.info('Generating %s hours of simulated data...', hours)
         
         # Base patterns by month
         current_month = datetime.now().month
@@ -393,6 +398,9 @@ class MultiSourceAPIClient:
         df = pd.DataFrame(records)
         return df
 
+# One CPCB station snapshot per city, shared by every client instance
+cpcb_snapshots = SnapshotCache(MultiSourceAPIClient._parse_cpcb_stations)
+
 def test_client():
     # ... test logic
     pass
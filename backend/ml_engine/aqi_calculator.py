@@ -3,9 +3,13 @@ AQI Calculator Module
 Implements CPCB (Central Pollution Control Board) methodology for AQI calculation.
 """
 
+import logging
 import pandas as pd
 import numpy as np
 from .aqi_config import AQI_BREAKPOINTS, AQI_CATEGORIES
+from .aqi_kernels import UNKNOWN_STATUS, aqi_status_codes, pm25_to_aqi, pm10_to_aqi, sub_index
+
+logger = logging.getLogger(__name__)
 
 
 def calculate_sub_index(pollutant, concentration):
@@ -22,28 +26,9 @@ def calculate_sub_index(pollutant, concentration):
     Returns:
     --------
     float
-        Sub-index value (0-500)
+        Sub-index value (0-500), NaN when unavailable (see aqi_kernels.sub_index)
     """
-    if pd.isna(concentration) or concentration < 0:
-        return np.nan
-    
-    if pollutant not in AQI_BREAKPOINTS:
-        return np.nan
-    
-    breakpoints = AQI_BREAKPOINTS[pollutant]
-    
-    # Find the appropriate breakpoint range
-    for bp_low, bp_high, aqi_low, aqi_high in breakpoints:
-        if bp_low <= concentration <= bp_high:
-            # Linear interpolation formula
-            sub_index = ((aqi_high - aqi_low) / (bp_high - bp_low)) * (concentration - bp_low) + aqi_low
-            return round(sub_index, 2)
-    
-    # If concentration exceeds all breakpoints, cap at 500
-    if concentration > breakpoints[-1][1]:
-        return 500.0
-    
-    return np.nan
+    return sub_index(pollutant, concentration)
 
 
 def calculate_aqi(row):
@@ -76,6 +61,25 @@ def calculate_aqi(row):
         return np.nan
 
 
+def calculate_aqi_from_pollutants(pollutants):
+    """
+    Calculate AQI from a CPCB OGD style pollutant dict.
+    
+    Parameters:
+    -----------
+    pollutants : dict
+        Keys like 'PM2.5' and 'PM10' (missing or None treated as 0)
+    
+    Returns:
+    --------
+    int
+        AQI driven by the particulate matter sub-indices
+    """
+    pm25 = pollutants.get('PM2.5') or 0
+    pm10 = pollutants.get('PM10') or 0
+    return int(max(pm25_to_aqi(pm25), pm10_to_aqi(pm10)))
+
+
 def get_aqi_category(aqi):
     """
     Get AQI category and color based on AQI value.
@@ -88,17 +92,103 @@ def get_aqi_category(aqi):
     Returns:
     --------
     tuple
-        (category_name, color_code)
+        (category_name, color_code), ('Unknown', '#CCCCCC') for NaN
     """
-    if pd.isna(aqi):
-        return ('Unknown', '#CCCCCC')
-    
-    for min_aqi, max_aqi, category, color in AQI_CATEGORIES:
-        if min_aqi <= aqi <= max_aqi:
-            return (category, color)
+    code = aqi_status_codes(aqi)
+    return (CATEGORY_LABELS[code], CATEGORY_COLORS[code])
+
+
+# Pollutant order used for the columns of the sub-index matrix
+POLLUTANTS = list(AQI_BREAKPOINTS.keys())
+
+# Category labels/colors indexed by aqi_kernels status code; the last code is 'Unknown'
+CATEGORY_LABELS = np.array([c[2] for c in AQI_CATEGORIES] + ['Unknown'], dtype=object)
+CATEGORY_COLORS = np.array([c[3] for c in AQI_CATEGORIES] + ['#CCCCCC'], dtype=object)
+UNKNOWN_CATEGORY = UNKNOWN_STATUS
+
+
+def calculate_sub_index_array(pollutant, concentrations):
+    """
+    Vectorized version of calculate_sub_index.
+
+    Parameters:
+    -----------
+    pollutant : str
+        Pollutant name (e.g., 'PM2_5_ugm3')
+    concentrations : array-like
+        Pollutant concentrations
+
+    Returns:
+    --------
+    np.ndarray
+        Sub-index values (0-500), NaN where the scalar path returns NaN
+    """
+    return np.asarray(sub_index(pollutant, np.asarray(concentrations, dtype=np.float64)))
+
+
+def get_aqi_category_codes(aqi):
+    """
+    Vectorized version of get_aqi_category returning integer codes.
+
+    Codes index CATEGORY_LABELS / CATEGORY_COLORS.
+    """
+    return aqi_status_codes(aqi)
+
+
+def compute_aqi_arrays(data):
+    """
+    Array-based CPCB AQI engine.
+
+    Parameters:
+    -----------
+    data : pd.DataFrame or dict
+        Pollutant concentrations keyed by AQI_BREAKPOINTS column names.
+        Missing pollutants are treated as unavailable.
+
+    Returns:
+    --------
+    dict
+        'sub_indices': (n_rows, len(POLLUTANTS)) float array
+        'aqi': final AQI per row (NaN when no sub-index is available)
+        'dominant': column index into POLLUTANTS of the max sub-index (-1 if none)
+        'category': category codes (see get_aqi_category_codes)
+    """
+    if not isinstance(data, pd.DataFrame):
+        data = pd.DataFrame(data)
+
+    sub_indices = np.full((len(data), len(POLLUTANTS)), np.nan)
+    for j, pollutant in enumerate(POLLUTANTS):
+        if pollutant in data.columns:
+            values = pd.to_numeric(data[pollutant], errors='coerce').to_numpy(dtype=np.float64)
+            sub_indices[:, j] = sub_index(pollutant, values)
+
+    has_value = ~np.isnan(sub_indices).all(axis=1)
+    filled = np.where(np.isnan(sub_indices), -np.inf, sub_indices)
+    dominant = np.where(has_value, filled.argmax(axis=1), -1)
+    aqi = np.where(has_value, filled.max(axis=1), np.nan)
+
+    return {
+        'sub_indices': sub_indices,
+        'aqi': aqi,
+        'dominant': dominant,
+        'category': get_aqi_category_codes(aqi),
+    }
+
+
+def _log_aqi_statistics(df):
+    """Log AQI coverage, range and category distribution at DEBUG level."""
+    valid_aqi = df['AQI_computed'].notna().sum()
+    total = len(df)
+    logger.debug("Computed AQI for %d / %d rows (%.1f%%)", valid_aqi, total, valid_aqi / total * 100 if total else 0)
     
-    # If AQI exceeds 500 (shouldn't happen, but just in case)
-    return ('Severe', '#7E0023')
+    if valid_aqi > 0:
+        logger.debug("AQI range: %.1f - %.1f, mean %.1f, median %.1f",
+                     df['AQI_computed'].min(), df['AQI_computed'].max(),
+                     df['AQI_computed'].mean(), df['AQI_computed'].median())
+        
+        # Category distribution
+        for category, count in df['AQI_category'].value_counts().items():
+            logger.debug("  %-15s: %6d (%5.1f%%)", category, count, (count / valid_aqi) * 100)
 
 
 def compute_aqi_for_dataframe(df, inplace=False):
@@ -120,7 +210,7 @@ def compute_aqi_for_dataframe(df, inplace=False):
     if not inplace:
         df = df.copy()
     
-    print("Computing CPCB-compliant AQI...")
+    logger.debug("Computing CPCB-compliant AQI for %d rows", len(df))
     
     # Calculate AQI for each row
     
@@ -132,35 +222,20 @@ def compute_aqi_for_dataframe(df, inplace=False):
     mask_missing = (df['AQI_computed'].isna()) | (df['AQI_computed'] == 0)
     
     if mask_missing.any():
-        # Only apply calculation on missing rows
-        computed_vals = df.loc[mask_missing].apply(calculate_aqi, axis=1)
-        df.loc[mask_missing, 'AQI_computed'] = computed_vals
+        # Only compute on missing rows, in a single array pass
+        computed = compute_aqi_arrays(df.loc[mask_missing])
+        df.loc[mask_missing, 'AQI_computed'] = computed['aqi']
     
     # Fill remaining NaNs with 0 if any
     df['AQI_computed'] = df['AQI_computed'].fillna(0)
     
     # Get category and color
-    aqi_info = df['AQI_computed'].apply(get_aqi_category)
-    df['AQI_category'] = aqi_info.apply(lambda x: x[0])
-    df['AQI_color'] = aqi_info.apply(lambda x: x[1])
-    
-    # Statistics
-    valid_aqi = df['AQI_computed'].notna().sum()
-    total = len(df)
-    print(f"✓ Computed AQI for {valid_aqi:,} / {total:,} rows ({valid_aqi/total*100:.1f}%)")
+    codes = get_aqi_category_codes(df['AQI_computed'].to_numpy(dtype=np.float64))
+    df['AQI_category'] = CATEGORY_LABELS[codes]
+    df['AQI_color'] = CATEGORY_COLORS[codes]
     
-    if valid_aqi > 0:
-        # Check if min/max/mean calls raise errors on empty sets or NaN
-        if df['AQI_computed'].count() > 0:
-            print(f"  AQI range: {df['AQI_computed'].min():.1f} - {df['AQI_computed'].max():.1f}")
-            print(f"  Mean AQI: {df['AQI_computed'].mean():.1f}")
-            print(f"  Median AQI: {df['AQI_computed'].median():.1f}")
-        
-        # Category distribution
-        print("\n  Category distribution:")
-        category_counts = df['AQI_category'].value_counts()
-        for category, count in category_counts.items():
-            pct = (count / valid_aqi) * 100
-            print(f"    {category:15s}: {count:6,} ({pct:5.1f}%)")
+    # Statistics (only computed when someone is listening)
+    if logger.isEnabledFor(logging.DEBUG):
+        _log_aqi_statistics(df)
     
     return df
@@ -0,0 +1,183 @@
+"""
+AQI Kernels
+Table-driven concentration <-> AQI transforms shared by every hot path.
+
+The CPCB breakpoints in aqi_config are compiled once per pollutant into
+two views of the same bands:
+
+    knots   continuous piecewise-linear tables (each range starts where the
+            previous one ends, the last segment is extrapolated), for the
+            forward/inverse transforms of model output and upstream readings
+    bands   the published ranges as they are, for the reported CPCB
+            sub-index (sub_index: rounded, capped at 500, NaN between bands)
+
+Every kernel accepts a scalar, a NumPy array or a pandas Series and returns
+the same kind of object, with no per-element Python branching.
+"""
+
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+from .aqi_config import AQI_BREAKPOINTS, AQI_CATEGORIES
+
+
+def _compile_tables():
+    """Build the knot and band tables for every pollutant."""
+    tables = {}
+    for pollutant, breakpoints in AQI_BREAKPOINTS.items():
+        bp_low, bp_high, aqi_low, aqi_high = np.array(breakpoints, dtype=np.float64).T
+        # Same expression as the CPCB formula, so sub-indices match it bit for bit
+        band_slope = (aqi_high - aqi_low) / (bp_high - bp_low)
+        conc = np.concatenate((bp_low[:1], bp_high))
+        aqi = np.concatenate((aqi_low[:1], aqi_high))
+        tables[pollutant] = {
+            'conc': conc,
+            'aqi': aqi,
+            'forward_slope': np.diff(aqi) / np.diff(conc),
+            'inverse_slope': np.diff(conc) / np.diff(aqi),
+            'bp_low': bp_low,
+            'bp_high': bp_high,
+            'aqi_low': aqi_low,
+            'band_slope': band_slope,
+            # Plain floats for the scalar path, where NumPy's per-call overhead dominates
+            'bands': list(zip(bp_low.tolist(), bp_high.tolist(), aqi_low.tolist(), band_slope.tolist())),
+            'bp_high_list': bp_high.tolist(),
+        }
+    return tables
+
+
+KERNEL_TABLES = _compile_tables()
+
+# Upper bounds of each category; status = number of bounds strictly below the AQI
+_STATUS_BOUNDS = np.array([c[1] for c in AQI_CATEGORIES[:-1]], dtype=np.float64)
+# Status code for NaN (no AQI); its label is None
+UNKNOWN_STATUS = len(AQI_CATEGORIES)
+_STATUS_LABELS = np.array([c[2] for c in AQI_CATEGORIES] + [None], dtype=object)
+
+
+def _wrap(values, result):
+    """Return result in the same container type as the input values."""
+    if isinstance(values, pd.Series):
+        return pd.Series(result, index=values.index, name=values.name)
+    if np.ndim(values) == 0:
+        return result.item()
+    return result
+
+
+def _interpolate(x, knots_x, knots_y, slopes):
+    """Piecewise-linear lookup with the last segment extrapolated."""
+    x = np.maximum(x, knots_x[0])
+    seg = np.clip(np.searchsorted(knots_x, x, side='right') - 1, 0, len(slopes) - 1)
+    return knots_y[seg] + slopes[seg] * (x - knots_x[seg])
+
+
+def concentration_to_aqi(pollutant, values):
+    """
+    Forward transform: pollutant concentration -> sub-index AQI.
+
+    Negative concentrations are clamped to 0 and NaN stays NaN. Values above
+    the last breakpoint keep rising along the 'Severe' slope (not capped).
+    """
+    t = KERNEL_TABLES[pollutant]
+    x = np.asarray(values, dtype=np.float64)
+    return _wrap(values, _interpolate(x, t['conc'], t['aqi'], t['forward_slope']))
+
+
+def aqi_to_concentration(pollutant, values):
+    """Inverse transform: sub-index AQI -> pollutant concentration."""
+    t = KERNEL_TABLES[pollutant]
+    x = np.asarray(values, dtype=np.float64)
+    return _wrap(values, _interpolate(x, t['aqi'], t['conc'], t['inverse_slope']))
+
+
+def _round2(values):
+    """
+    Round to 2 decimals exactly like Python's built-in round() on a float.
+
+    np.round scales by 100 first, which can land on the other side of a tie
+    than round() does; those rare near-tie values are redone in Python.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100.0
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        idx = np.flatnonzero(near_tie)
+        rounded[idx] = [round(float(v), 2) for v in values[idx]]
+    return rounded
+
+
+def _scalar_sub_index(t, c):
+    """sub_index for one float: the same lookup over the plain-float bands."""
+    if t is None or c != c or c < 0:
+        return np.nan
+    seg = bisect_left(t['bp_high_list'], c)
+    if seg == len(t['bands']):
+        return 500.0
+    bp_low, _, aqi_low, slope = t['bands'][seg]
+    if c < bp_low:
+        return np.nan
+    return round(slope * (c - bp_low) + aqi_low, 2)
+
+
+def sub_index(pollutant, values):
+    """
+    CPCB sub-index as reported: the band formula rounded to 2 decimals and
+    500 above the last band. NaN for missing or negative concentrations,
+    unknown pollutants and values between two bands (e.g. PM2.5 30.5).
+    """
+    t = KERNEL_TABLES.get(pollutant)
+    if isinstance(values, (float, int, np.floating, np.integer)):
+        return _scalar_sub_index(t, float(values))
+    c = np.atleast_1d(np.asarray(values, dtype=np.float64))
+    result = np.full(c.shape, np.nan)
+    if t is not None:
+        bp_low, bp_high = t['bp_low'], t['bp_high']
+        valid = ~np.isnan(c) & (c >= 0)
+        # First band whose upper bound is >= the concentration
+        seg = np.searchsorted(bp_high, c, side='left')
+        above = valid & (seg == len(bp_high))
+        seg = np.minimum(seg, len(bp_high) - 1)
+        in_band = valid & ~above & (c >= bp_low[seg])
+        value = t['band_slope'][seg] * (c - bp_low[seg]) + t['aqi_low'][seg]
+        result[in_band] = _round2(value[in_band])
+        result[above] = 500.0
+    if np.ndim(values) == 0:
+        return result[0].item()
+    return _wrap(values, result)
+
+
+def pm25_to_aqi(values):
+    """PM2.5 (µg/m³) -> AQI."""
+    return concentration_to_aqi('PM2_5_ugm3', values)
+
+
+def aqi_to_pm25(values):
+    """AQI -> PM2.5 (µg/m³)."""
+    return aqi_to_concentration('PM2_5_ugm3', values)
+
+
+def pm10_to_aqi(values):
+    """PM10 (µg/m³) -> AQI."""
+    return concentration_to_aqi('PM10_ugm3', values)
+
+
+def aqi_status_codes(values):
+    """
+    Category index into AQI_CATEGORIES for each AQI value (see aqi_status),
+    UNKNOWN_STATUS for NaN. Always an integer array.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(x), UNKNOWN_STATUS, np.searchsorted(_STATUS_BOUNDS, x, side='left'))
+
+
+def aqi_status(values):
+    """
+    Category label for each AQI value ('Good' up to and including 50,
+    'Satisfactory' above 50 up to 100, ... 'Severe' above 400; None for NaN).
+    """
+    labels = _STATUS_LABELS[aqi_status_codes(values)]
+    if isinstance(values, pd.Series):
+        return pd.Series(labels, index=values.index, name=values.name)
+    # A 0-d lookup already yields the label itself
+    return labels
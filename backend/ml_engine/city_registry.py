@@ -0,0 +1,226 @@
+"""
+City Registry
+Served cities (ml_engine/data/cities.json) with their coordinates, models,
+datasets, station set and calibration factors, plus a memory-bounded cache
+for the per-city resources loaded from them.
+
+Each entry lists:
+    models        registry names by kind (forecast, heatmap); see model_registry
+    datasets      CSV files in ml_engine/data by use (forecast, stations)
+    aggregate_stations
+                  the forecast dataset is station-wise and is averaged per hour
+    calibration   multipliers applied to model / upstream AQI by use
+                  (forecast, history, sensors); missing ones are 1.0
+
+Stations belong to a city through their "city" field in stations.json.
+City names are matched case-insensitively, including listed aliases.
+Unknown names resolve to the default city, and so does a known city that
+lacks what the caller needs (resolve(name, require='forecast')), which is
+what the routes did with their Delhi/Pune special cases.
+
+A city's models and data are loaded on first use, not at startup, and
+CityResources keeps them under a memory budget: once the loaded cities'
+combined size passes it, the least recently used ones are released.
+
+Config (env):
+    CITY_MEMORY_BUDGET_MB  Budget for per-city models and datasets (default 512)
+    DEFAULT_CITY           City for unknown names (default Delhi)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+CITIES_PATH = Path(__file__).parent / 'data' / 'cities.json'
+MEMORY_BUDGET_BYTES = int(float(os.getenv("CITY_MEMORY_BUDGET_MB", 512)) * 1024 * 1024)
+DEFAULT_CITY = os.getenv("DEFAULT_CITY", "Delhi")
+
+City = namedtuple('City', ['name', 'lat', 'lon', 'models', 'datasets', 'aggregate_stations', 'calibration'])
+
+_registry = None
+
+
+class CityRegistry:
+    """
+    City name/alias index.
+
+    Parameters
+    ----------
+    cities : list of dict
+        Entries as in cities.json.
+    default : str
+        City returned for names that do not resolve.
+    """
+
+    def __init__(self, cities, default=DEFAULT_CITY):
+        self._by_name = {}
+        self._index = {}
+        for entry in cities:
+            city = City(entry['name'], float(entry['lat']), float(entry['lon']),
+                        dict(entry.get('models', {})), dict(entry.get('datasets', {})),
+                        bool(entry.get('aggregate_stations', False)), dict(entry.get('calibration', {})))
+            self._by_name[city.name] = city
+            for alias in [city.name] + list(entry.get('aliases', [])):
+                self._index[alias.strip().lower()] = city.name
+        if default not in self._by_name:
+            raise ValueError(f"Default city {default} is not in the registry")
+        self.default = self._by_name[default]
+
+    @classmethod
+    def load(cls, path=CITIES_PATH, default=DEFAULT_CITY):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), default=default)
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def get(self, name):
+        """City for a name or alias, or None."""
+        key = self._index.get(str(name or '').strip().lower())
+        return None if key is None else self._by_name[key]
+
+    def resolve(self, name, require=None):
+        """
+        City for a name, falling back to the default city when the name is
+        unknown or the city has no `require` model.
+        """
+        city = self.get(name)
+        if city is None or (require is not None and require not in city.models):
+            return self.default
+        return city
+
+    def cities(self, require=None):
+        """Cities in file order, optionally only those with a `require` model."""
+        return [c for c in self._by_name.values() if require is None or require in c.models]
+
+    @staticmethod
+    def calibration(city, use):
+        return city.calibration.get(use, 1.0)
+
+
+def get_city_registry():
+    """The process-wide registry, loaded on first use."""
+    global _registry
+    if _registry is None:
+        _registry = CityRegistry.load()
+        logger.info("Loaded %s cities from %s", len(_registry), CITIES_PATH.name)
+    return _registry
+
+
+class CityResources:
+    """
+    Per-city resources loaded on first use and kept least-recently-used
+    under a memory budget.
+
+    The most recently used city always stays, even if it alone is over the
+    budget. A load that returns None is not cached.
+
+    Parameters
+    ----------
+    name : str
+        Label for logs and cache metrics.
+    load : callable
+        Blocking load(city) -> (value, nbytes) or (None, 0).
+    budget_bytes : int
+    release : callable, optional
+        release(city, value), called after a city is evicted.
+    """
+
+    def __init__(self, name, load, budget_bytes=MEMORY_BUDGET_BYTES, release=None):
+        self.name = name
+        self._load = load
+        self.budget_bytes = budget_bytes
+        self._release = release
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._counters = {'hits': 0, 'loads': 0, 'evictions': 0}
+
+    def _lookup(self, city):
+        with self._lock:
+            entry = self._entries.get(city)
+            if entry is not None:
+                self._entries.move_to_end(city)
+                self._counters['hits'] += 1
+                return entry[0]
+        return None
+
+    def get(self, city):
+        """The city's value, loading it if needed (blocking; one load per city at a time)."""
+        value = self._lookup(city)
+        record_cache(self.name, value is not None)
+        if value is not None:
+            return value
+        with self._lock:
+            city_lock = self._loading.setdefault(city, threading.Lock())
+        with city_lock:
+            # Loaded by another thread while this one waited
+            value = self._lookup(city)
+            if value is not None:
+                return value
+            value, nbytes = self._load(city)
+            with self._lock:
+                self._counters['loads'] += 1
+            if value is not None:
+                self.put(city, value, nbytes)
+            return value
+
+    async def get_async(self, city):
+        """get() for the event loop: resident cities are returned without a thread hop."""
+        value = self._lookup(city)
+        if value is not None:
+            record_cache(self.name, True)
+            return value
+        return await asyncio.to_thread(self.get, city)
+
+    def peek(self, city):
+        """The city's value if it is loaded (no load, no LRU update)."""
+        with self._lock:
+            entry = self._entries.get(city)
+        return None if entry is None else entry[0]
+
+    def put(self, city, value, nbytes):
+        """Store (or replace) a city's value and evict past the budget."""
+        with self._lock:
+            self._entries[city] = (value, nbytes)
+            self._entries.move_to_end(city)
+            evicted = []
+            total = sum(size for _, size in self._entries.values())
+            while total > self.budget_bytes and len(self._entries) > 1:
+                old_city, (old_value, old_size) = self._entries.popitem(last=False)
+                total -= old_size
+                evicted.append((old_city, old_value, old_size))
+            self._counters['evictions'] += len(evicted)
+        for old_city, old_value, old_size in evicted:
+            logger.info("Evicted %s %s (%.1f MB) to stay under %.0f MB", self.name, old_city,
+                        old_size / 2**20, self.budget_bytes / 2**20)
+            if self._release is not None:
+                self._release(old_city, old_value)
+
+    def evict(self, city):
+        with self._lock:
+            entry = self._entries.pop(city, None)
+        if entry is not None and self._release is not None:
+            self._release(city, entry[0])
+        return entry is not None
+
+    def resident(self):
+        """{city: bytes} in LRU order (least recent first)."""
+        with self._lock:
+            return {city: size for city, (_, size) in self._entries.items()}
+
+    def stats(self):
+        resident = self.resident()
+        with self._lock:
+            counters = dict(self._counters)
+        return dict(counters, resident_mb={c: round(b / 2**20, 2) for c, b in resident.items()},
+                    total_mb=round(sum(resident.values()) / 2**20, 2),
+                    budget_mb=round(self.budget_bytes / 2**20, 2))
@@ -0,0 +1,277 @@
+"""
+Columnar Historical Store
+Typed, memory-mapped copies of the CSV datasets in ml_engine/data.
+
+Each CSV is converted once into a directory of .npy columns:
+    - numeric columns as float32 (coordinates stay float64)
+    - 'Datetime' as datetime64[ns], rows sorted by time
+    - text columns (e.g. StationName) as categorical int32 codes + labels
+plus a meta.json that records the source file's size/mtime. Loading maps the
+.npy files read-only (no parsing, no copy), and the store is rebuilt
+automatically when the CSV changes. New hourly observations can be appended
+in memory without touching the files.
+
+Generated files live in ml_engine/data/columnar/ and are not versioned.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / 'data'
+STORE_ROOT = DATA_DIR / 'columnar'
+FORMAT_VERSION = 1
+DATETIME_COL = 'Datetime'
+# Station coordinates are identifiers rather than measurements; keep them exact
+FLOAT64_COLUMNS = {'Latitude', 'Longitude'}
+
+# Opened stores, shared by every caller in the process
+_open_stores = {}
+# Serialises opens, so concurrent first opens do not convert the same CSV at once
+_open_lock = threading.Lock()
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _columns_from_csv(csv_path, derive=None):
+    """Parse a CSV into typed column arrays + categorical labels."""
+    df = pd.read_csv(csv_path)
+    df[DATETIME_COL] = pd.to_datetime(df[DATETIME_COL], errors='coerce')
+    df = df.dropna(subset=[DATETIME_COL]).sort_values(DATETIME_COL, kind='stable').reset_index(drop=True)
+    if derive is not None:
+        for name, values in derive(df).items():
+            df[name] = values
+
+    columns, categories = {}, {}
+    for name in df.columns:
+        series = df[name]
+        if name == DATETIME_COL:
+            columns[name] = series.to_numpy(dtype='datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            dtype = np.float64 if name in FLOAT64_COLUMNS else np.float32
+            columns[name] = series.to_numpy(dtype=dtype, na_value=np.nan)
+        else:
+            cat = pd.Categorical(series.astype('string'))
+            columns[name] = cat.codes.astype(np.int32)
+            categories[name] = [str(c) for c in cat.categories]
+    return columns, categories
+
+
+class ColumnarStore:
+    """
+    A dataset held as typed column arrays (memory-mapped when loaded from
+    disk) plus an in-memory tail of appended rows.
+    """
+
+    def __init__(self, columns, categories=None, name=None, derive=None):
+        self.name = name
+        self.derive = derive
+        self.columns = dict(columns)
+        self.categories = {k: list(v) for k, v in (categories or {}).items()}
+        self._tail = []
+        self._lock = threading.Lock()
+
+    # --- Build / load -----------------------------------------------------
+
+    @classmethod
+    def from_csv(cls, csv_path, derive=None, name=None):
+        columns, categories = _columns_from_csv(csv_path, derive=derive)
+        return cls(columns, categories, name=name, derive=derive)
+
+    def save(self, store_dir, source=None):
+        """Write the base columns to store_dir atomically."""
+        store_dir = Path(store_dir)
+        store_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=store_dir.name + '.', dir=store_dir.parent))
+        try:
+            os.chmod(tmp, 0o755)
+            for i, values in enumerate(self.columns.values()):
+                np.save(tmp / f'{i:03d}.npy', values)
+            meta = {
+                'version': FORMAT_VERSION,
+                'columns': list(self.columns),
+                'categories': self.categories,
+                'rows': self.base_rows,
+                'source': source,
+            }
+            (tmp / 'meta.json').write_text(json.dumps(meta))
+            if store_dir.exists():
+                shutil.rmtree(store_dir)
+            os.replace(tmp, store_dir)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, store_dir, name=None, derive=None):
+        """Map a saved store read-only; returns (store, meta)."""
+        store_dir = Path(store_dir)
+        meta = json.loads((store_dir / 'meta.json').read_text())
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar store version in {store_dir}")
+        columns = {
+            col: np.load(store_dir / f'{i:03d}.npy', mmap_mode='r')
+            for i, col in enumerate(meta['columns'])
+        }
+        return cls(columns, meta['categories'], name=name, derive=derive), meta
+
+    # --- Access -----------------------------------------------------------
+
+    @property
+    def base_rows(self):
+        return len(self.columns[DATETIME_COL])
+
+    def __len__(self):
+        return self.base_rows + sum(len(chunk[DATETIME_COL]) for chunk in self._tail)
+
+    @property
+    def nbytes(self):
+        """Size of the column data, base and appended."""
+        return (sum(values.nbytes for values in self.columns.values())
+                + sum(values.nbytes for chunk in self._tail for values in chunk.values()))
+
+    @property
+    def end(self):
+        """Timestamp of the latest row (base or appended), or None if empty."""
+        if self._tail:
+            return pd.Timestamp(self._tail[-1][DATETIME_COL][-1])
+        if self.base_rows:
+            return pd.Timestamp(self.columns[DATETIME_COL][-1])
+        return None
+
+    def to_frame(self, columns=None, since=None):
+        """
+        DataFrame view of the store. Base columns are not copied; categorical
+        columns come back as pandas Categoricals over the stored codes.
+        `since` keeps rows with Datetime >= since (binary search on the
+        sorted time column).
+        """
+        names = list(columns) if columns is not None else list(self.columns)
+        if DATETIME_COL not in names:
+            names.insert(0, DATETIME_COL)
+
+        start = 0
+        if since is not None:
+            start = int(np.searchsorted(self.columns[DATETIME_COL], np.datetime64(pd.Timestamp(since)), side='left'))
+
+        with self._lock:
+            tail = list(self._tail)
+        data = {}
+        for name in names:
+            parts = [self.columns[name][start:]] + [chunk[name] for chunk in tail]
+            values = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            if name in self.categories:
+                values = pd.Categorical.from_codes(values, self.categories[name])
+            data[name] = values
+        frame = pd.DataFrame(data, copy=False)
+
+        if since is not None and tail:
+            frame = frame[frame[DATETIME_COL] >= pd.Timestamp(since)].reset_index(drop=True)
+        return frame
+
+    # --- Append -----------------------------------------------------------
+
+    def append(self, frame):
+        """
+        Append new hourly observations in memory. Only rows strictly newer
+        than the current end are kept, so re-sending an overlapping window is
+        harmless. Derived columns are computed the same way as at conversion;
+        other missing columns are stored as NaN (or an empty label).
+        Returns the number of rows appended.
+        """
+        if frame is None or len(frame) == 0:
+            return 0
+        with self._lock:
+            return self._append(frame)
+
+    def _append(self, frame):
+        times = pd.to_datetime(frame[DATETIME_COL]).dt.tz_localize(None)
+        end = self.end
+        keep = np.ones(len(frame), dtype=bool) if end is None else (times > end).to_numpy()
+        if not keep.any():
+            return 0
+
+        frame = frame.loc[keep].copy()
+        if self.derive is not None:
+            for name, values in self.derive(frame).items():
+                frame[name] = values
+        order = np.argsort(times[keep].to_numpy(), kind='stable')
+        chunk = {}
+        for name, base in self.columns.items():
+            if name == DATETIME_COL:
+                chunk[name] = times[keep].to_numpy(dtype='datetime64[ns]')[order]
+            elif name in self.categories:
+                labels = self.categories[name]
+                raw = frame[name].astype(str).to_numpy() if name in frame else np.full(len(frame), '')
+                for label in dict.fromkeys(raw):
+                    if label not in labels:
+                        labels.append(label)
+                lookup = {label: i for i, label in enumerate(labels)}
+                chunk[name] = np.array([lookup[v] for v in raw], dtype=np.int32)[order]
+            elif name in frame:
+                chunk[name] = pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=base.dtype, na_value=np.nan)[order]
+            else:
+                chunk[name] = np.full(len(frame), np.nan, dtype=base.dtype)
+        self._tail.append(chunk)
+        return len(frame)
+
+
+def open_dataset(filename, derive=None, store_root=STORE_ROOT):
+    """
+    Open the columnar copy of ml_engine/data/<filename>, converting (or
+    re-converting, if the CSV changed) on first use. Returns None if the CSV
+    does not exist. Stores are cached per process.
+    """
+    store = _open_stores.get(filename)
+    if store is not None:
+        return store
+    with _open_lock:
+        return _open(filename, derive, store_root)
+
+
+def _open(filename, derive, store_root):
+    if filename in _open_stores:
+        return _open_stores[filename]
+    csv_path = DATA_DIR / filename
+    if not csv_path.exists():
+        return None
+
+    store_dir = Path(store_root) / Path(filename).stem
+    source = _source_signature(csv_path)
+    store = None
+    try:
+        loaded, meta = ColumnarStore.load(store_dir, name=filename, derive=derive)
+        if meta.get('source') == source:
+            store = loaded
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if store is None:
+        logger.info("Converting %s to columnar store...", filename)
+        store = ColumnarStore.from_csv(csv_path, derive=derive, name=filename)
+        try:
+            store.save(store_dir, source=source)
+            store, _ = ColumnarStore.load(store_dir, name=filename, derive=derive)
+        except OSError as e:
+            # Read-only deployments keep the in-memory arrays
+            logger.warning("Could not write columnar store for %s: %s", filename, e)
+
+    _open_stores[filename] = store
+    return store
+
+
+def close_dataset(filename):
+    """Drop an opened store from the process cache (it is reopened on next use)."""
+    return _open_stores.pop(filename, None) is not None
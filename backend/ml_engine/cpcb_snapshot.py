@@ -0,0 +1,242 @@
+"""
+CPCB Station Snapshot Cache
+Process-wide cache of the CPCB OGD station payload behind
+MultiSourceAPIClient.fetch_cpcb_current_stations.
+
+The heatmap, sensors, rankings and citizen endpoints all read the same
+per-city station snapshot, which CPCB only updates about once an hour. Each
+city keeps one parsed snapshot; it is served from memory until its TTL runs
+out, then a single refresh (shared by concurrent callers) re-requests it with
+If-None-Match / If-Modified-Since so an unchanged payload costs a 304. When
+the upstream fails, the last snapshot is served until it is too old, and
+the city is not retried for CPCB_SNAPSHOT_RETRY_SECONDS, so an outage does
+not turn every request after the TTL into another upstream attempt.
+
+Cities are keyed by their city_registry name, so '?city=delhi' and
+'?city=Delhi' share one snapshot and one upstream fetch.
+
+Optionally each snapshot is also written to disk, so a restarted process can
+serve (and conditionally revalidate) it without a cold fetch.
+
+Config (env):
+    CPCB_SNAPSHOT_TTL_SECONDS        Time a snapshot is served without
+                                     revalidation (default 900)
+    CPCB_SNAPSHOT_MAX_STALE_SECONDS  Age limit for serving the last snapshot
+                                     when a refresh fails (default 6h)
+    CPCB_SNAPSHOT_RETRY_SECONDS      Wait after a failed refresh before the
+                                     next attempt (default 60)
+    CPCB_SNAPSHOT_DIR                Directory for the on-disk copy (unset:
+                                     memory only)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from .city_registry import get_city_registry
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+TTL_SECONDS = float(os.getenv("CPCB_SNAPSHOT_TTL_SECONDS", 900))
+MAX_STALE_SECONDS = float(os.getenv("CPCB_SNAPSHOT_MAX_STALE_SECONDS", 6 * 3600))
+RETRY_SECONDS = float(os.getenv("CPCB_SNAPSHOT_RETRY_SECONDS", 60))
+SNAPSHOT_DIR = os.getenv("CPCB_SNAPSHOT_DIR") or None
+
+
+def stations_version(stations):
+    """Content hash of a parsed snapshot; identifies it in HTTP validators."""
+    payload = json.dumps(stations, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def city_key(city):
+    """Canonical name a city's snapshot is kept (and fetched) under."""
+    return get_city_registry().resolve(city).name
+
+
+def copy_stations(stations):
+    """Per-caller copy: { station: { pollutant: float } } is two levels deep."""
+    return None if stations is None else {name: dict(values) for name, values in stations.items()}
+
+
+class SnapshotCache:
+    """
+    TTL cache of conditionally fetched upstream payloads, keyed by city.
+
+    Parameters
+    ----------
+    parse : callable
+        parse(payload) -> stations dict from the decoded JSON body.
+    ttl_seconds : float
+        Age after which a snapshot is revalidated.
+    max_stale_seconds : float
+        Age limit for serving a snapshot when its refresh fails.
+    retry_seconds : float
+        Wait after a failed refresh before the next one.
+    snapshot_dir : str or Path, optional
+        Where to keep the on-disk copy; None keeps snapshots in memory only.
+    """
+
+    def __init__(self, parse, ttl_seconds=TTL_SECONDS, max_stale_seconds=MAX_STALE_SECONDS,
+                 retry_seconds=RETRY_SECONDS, snapshot_dir=SNAPSHOT_DIR):
+        self._parse = parse
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.retry_seconds = retry_seconds
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self._entries = {}
+        # Tasks are bound to their event loop (the app loop, or http_pool's
+        # background loop for blocking callers), so single-flight is per loop
+        self._inflight = {}
+        # city -> time of the last failed refresh (cleared by a successful one)
+        self._failed_at = {}
+        self._counters = {'hits': 0, 'refreshes': 0, 'not_modified': 0, 'errors': 0, 'stale_served': 0}
+
+    async def get(self, city, fetch):
+        """
+        Copy of the city's station snapshot, or None if none is available.
+        fetch(city, headers) -> httpx.Response performs the upstream request
+        when a refresh is due; headers carry the conditional validators.
+        """
+        city = city_key(city)
+        entry = self._entry(city)
+        now = time.time()
+        if entry is not None and now - entry['fetched_at'] < self.ttl_seconds:
+            self._counters['hits'] += 1
+            record_cache('cpcb_snapshot', True)
+            return copy_stations(entry['stations'])
+
+        if self._backing_off(city, now):
+            # The last refresh failed recently: no new attempt yet
+            if entry is not None and now - entry['fetched_at'] <= self.max_stale_seconds:
+                self._counters['stale_served'] += 1
+                record_cache('cpcb_snapshot', True)
+                return copy_stations(entry['stations'])
+            record_cache('cpcb_snapshot', False)
+            return None
+
+        record_cache('cpcb_snapshot', False)
+
+        key = (asyncio.get_running_loop(), city)
+        task = self._inflight.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._refresh(city, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+        return copy_stations(await asyncio.shield(task))
+
+    def _backing_off(self, city, now):
+        failed_at = self._failed_at.get(city)
+        return failed_at is not None and now - failed_at < self.retry_seconds
+
+    def _entry(self, city):
+        entry = self._entries.get(city)
+        if entry is None and self.snapshot_dir is not None:
+            entry = self._load(city)
+            if entry is not None:
+                entry.setdefault('version', stations_version(entry['stations']))
+                self._entries[city] = entry
+        return entry
+
+    async def _refresh(self, city, fetch):
+        self._counters['refreshes'] += 1
+        previous = self._entries.get(city)
+        headers = {}
+        if previous is not None:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+
+        try:
+            response = await fetch(city, headers)
+            if response.status_code == 304 and previous is not None:
+                self._counters['not_modified'] += 1
+                entry = dict(previous, fetched_at=time.time())
+            elif response.status_code == 200:
+                stations = self._parse(response.json())
+                entry = {
+                    'stations': stations,
+                    'version': stations_version(stations),
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fetched_at': time.time(),
+                }
+            else:
+                raise RuntimeError(f"CPCB API Error: {response.status_code} - {response.text[:200]}")
+        except Exception as e:
+            self._counters['errors'] += 1
+            self._failed_at[city] = time.time()
+            if previous is not None and time.time() - previous['fetched_at'] <= self.max_stale_seconds:
+                self._counters['stale_served'] += 1
+                logger.warning("CPCB refresh failed for %s (%s); serving snapshot from %.0fs ago",
+                               city, e, time.time() - previous['fetched_at'])
+                return previous['stations']
+            logger.error("Error fetching CPCB stations: %s", e)
+            return None
+
+        self._entries[city] = entry
+        self._failed_at.pop(city, None)
+        if self.snapshot_dir is not None:
+            self._save(city, entry)
+        logger.debug("CPCB snapshot for %s: %s stations (%s)", city, len(entry['stations']),
+                     'not modified' if response.status_code == 304 else 'updated')
+        return entry['stations']
+
+    # --- On-disk copy -----------------------------------------------------
+
+    def _path(self, city):
+        return self.snapshot_dir / f"cpcb_{city.lower()}.json"
+
+    def _load(self, city):
+        try:
+            entry = json.loads(self._path(city).read_text())
+            return entry if isinstance(entry.get('stations'), dict) else None
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _save(self, city, entry):
+        try:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=f"cpcb_{city.lower()}.", dir=self.snapshot_dir)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(city))
+        except OSError as e:
+            logger.warning("Could not write CPCB snapshot for %s: %s", city, e)
+
+    def version(self, city):
+        """Version of the city's current snapshot, or None if there is none."""
+        entry = self._entries.get(city_key(city))
+        return None if entry is None else entry.get('version')
+
+    def max_age(self, city):
+        """Seconds until the city's snapshot is due for revalidation (or the next retry)."""
+        city = city_key(city)
+        entry = self._entries.get(city)
+        if entry is None:
+            return 0
+        now = time.time()
+        remaining = self.ttl_seconds - (now - entry['fetched_at'])
+        failed_at = self._failed_at.get(city)
+        if failed_at is not None:
+            remaining = max(remaining, self.retry_seconds - (now - failed_at))
+        return max(0.0, remaining)
+
+    def stats(self):
+        """Counters plus the age of each city's snapshot."""
+        now = time.time()
+        out = dict(self._counters)
+        out['cities'] = {
+            city: {'age_seconds': round(now - entry['fetched_at'], 1),
+                   'stations': len(entry['stations'])}
+            for city, entry in self._entries.items()
+        }
+        out['backing_off'] = sorted(city for city in self._failed_at if self._backing_off(city, now))
+        return out
@@ -0,0 +1,185 @@
+"""
+CPU Executor
+One shared executor for the CPU-bound work requests trigger (forecast
+recursion, heatmap table predicts, pandas and AQI over frames), so async
+handlers await it instead of running it on the event loop.
+
+    result = await cpu_executor.run(func, *args)
+
+The executor is a process pool (spawned workers) by default: the work it
+takes never holds the event loop's GIL, which keeps event-loop lag flat under
+load. Each worker loads the models it needs itself (the forecast and heatmap
+table functions run here take the model version to load for that), metrics
+recorded inside workers stay there, and submitted functions and their
+arguments must be picklable: module-level functions, plain data and frames.
+With CPU_EXECUTOR=thread it is a thread pool instead, which uses the models
+already in memory; XGBoost and most pandas/numpy kernels release the GIL,
+but the Python between them still competes with the event loop.
+
+Calls made from code already running on the executor (a forecast task
+whose data loader awaits run() through http_pool.run_sync, say) run the
+function directly: submitting them would have the task hold its worker
+while the nested call waits for one, which deadlocks once every worker
+does it.
+
+Queue depth is bounded: at most CPU_QUEUE_DEPTH tasks are submitted or
+running at once. Further callers wait for a slot, and give up with
+ExecutorBusy after CPU_QUEUE_TIMEOUT seconds, so a burst of heavy requests
+queues in the event loop (cheaply) rather than piling up in the pool.
+
+Config (env):
+    CPU_EXECUTOR         'process' (default) or 'thread'
+    CPU_WORKERS          Worker count (default min(4, CPU count))
+    CPU_QUEUE_DEPTH      Tasks submitted or running at once (default 4 per worker)
+    CPU_QUEUE_TIMEOUT    Seconds to wait for a queue slot (default 30)
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .metrics import REGISTRY, Histogram
+
+logger = logging.getLogger(__name__)
+
+KIND = os.getenv("CPU_EXECUTOR", "process").lower()
+WORKERS = int(os.getenv("CPU_WORKERS", min(4, os.cpu_count() or 1)))
+QUEUE_DEPTH = int(os.getenv("CPU_QUEUE_DEPTH", 4 * WORKERS))
+QUEUE_TIMEOUT = float(os.getenv("CPU_QUEUE_TIMEOUT", 30))
+
+cpu_task_seconds = REGISTRY.register(Histogram(
+    'cpu_task_seconds', 'CPU executor tasks (stage="wait": waiting for a queue slot, "run": in the pool)',
+    ('task', 'stage')))
+event_loop_lag = REGISTRY.register(Histogram(
+    'event_loop_lag_seconds', 'How late a periodic event-loop tick ran',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+_executor = None
+_lock = threading.Lock()
+# event loop -> Semaphore bounding the queue depth
+_slots = weakref.WeakKeyDictionary()
+_in_flight = 0
+# True inside process-pool workers
+_worker = False
+# True on executor threads and in process-pool workers; context variables
+# follow run_sync's coroutines onto its loop, so nested run() calls see it
+_on_executor = contextvars.ContextVar('cpu_executor_worker', default=False)
+
+
+class ExecutorBusy(RuntimeError):
+    """No queue slot became free within CPU_QUEUE_TIMEOUT."""
+
+
+def _init_thread():
+    _on_executor.set(True)
+
+
+def _init_worker():
+    global _worker
+    _worker = True
+    _on_executor.set(True)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+
+def in_worker():
+    """True inside a process-pool worker (models are loaded per worker there)."""
+    return _worker
+
+
+def uses_processes():
+    return KIND == 'process'
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            if KIND == 'process':
+                _executor = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_init_worker)
+            else:
+                _executor = ThreadPoolExecutor(WORKERS, thread_name_prefix='cpu', initializer=_init_thread)
+            logger.info("CPU executor: %s pool, %s workers, queue depth %s", KIND, WORKERS, QUEUE_DEPTH)
+        return _executor
+
+
+def _slot():
+    loop = asyncio.get_running_loop()
+    slot = _slots.get(loop)
+    if slot is None:
+        slot = _slots[loop] = asyncio.Semaphore(QUEUE_DEPTH)
+    return slot
+
+
+async def run(func, *args, task=None):
+    """Run func(*args) on the CPU executor and return its result."""
+    global _in_flight
+    if _on_executor.get():
+        # Nested call from an executor task: run it here rather than wait on a worker
+        return func(*args)
+    task = task or getattr(func, '__qualname__', 'task')
+    slot = _slot()
+    waited = time.perf_counter()
+    try:
+        await asyncio.wait_for(slot.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ExecutorBusy(f"CPU executor queue full ({QUEUE_DEPTH} tasks) for {QUEUE_TIMEOUT}s") from None
+    started = time.perf_counter()
+    cpu_task_seconds.observe(started - waited, task=task, stage='wait')
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args))
+    finally:
+        _in_flight -= 1
+        slot.release()
+        cpu_task_seconds.observe(time.perf_counter() - started, task=task, stage='run')
+
+
+def _noop():
+    return os.getpid()
+
+
+async def warm_up():
+    """Start the pool's workers now rather than on the first request (spawned workers take ~1s)."""
+    if KIND != 'process':
+        return
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    pids = await asyncio.gather(*(loop.run_in_executor(executor, _noop) for _ in range(WORKERS)))
+    logger.info("CPU executor workers started: %s", sorted(set(pids)))
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stats():
+    return {'kind': KIND, 'workers': WORKERS, 'queue_depth': QUEUE_DEPTH, 'in_flight': _in_flight}
+
+
+def _collect():
+    yield 'cpu_executor_in_flight', 'gauge', 'CPU executor tasks submitted or running', [({}, _in_flight)]
+
+
+REGISTRY.add_collector(_collect)
+
+
+async def watch_event_loop(interval=0.1):
+    """Record how late each tick of a fixed-interval sleep wakes up (event-loop blocking)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - expected))
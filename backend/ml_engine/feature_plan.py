@@ -0,0 +1,112 @@
+"""
+Compiled Feature Layout
+Column plan for the recursive AQI forecasters.
+
+The model's feature order comes with its registry version (model_registry).
+FeaturePlan compiles that list once into column indices for every feature
+family the forecasters produce (pollutants/weather, temporal, lags, rolling
+stats), so each step writes straight into a preallocated matrix instead of
+building a dict of named features and re-ordering it. Features listed in
+the model but never produced stay 0, the same as the old `features.get(f, 0)`
+lookup.
+
+Temporal encodings only take 24 (hour), 7 (weekday) and 12 (month) distinct
+values and are read from lookup tables.
+"""
+
+import numpy as np
+
+# Lookup tables, indexed by hour (0-23) and month (1-12; index 0 unused)
+_HOURS = np.arange(24)
+_MONTHS = np.arange(13)
+HOUR_SIN = np.array([np.sin(2 * np.pi * h / 24) for h in _HOURS])
+HOUR_COS = np.array([np.cos(2 * np.pi * h / 24) for h in _HOURS])
+MONTH_SIN = np.array([np.sin(2 * np.pi * m / 12) for m in _MONTHS])
+MONTH_COS = np.array([np.cos(2 * np.pi * m / 12) for m in _MONTHS])
+IS_WEEKEND = np.array([0, 0, 0, 0, 0, 1, 1], dtype=np.float64)
+
+
+class FeaturePlan:
+    """
+    Feature name -> column index mapping compiled from the model's feature list.
+
+    Parameters
+    ----------
+    feature_names : list of str
+        Model input columns, in order.
+    lags : list of int
+        Lag hours (AQI_computed_lag_{lag}h).
+    windows : list of int
+        Rolling windows (AQI_computed_rolling_{stat}_{window}h).
+    dtype : numpy dtype
+        Dtype of matrices returned by allocate(). Defaults to float64: the
+        scaler runs before XGBoost's own float32 conversion, and rounding
+        the raw features to float32 first shifts the predictions.
+    """
+
+    # Calendar feature -> (input: 0 hour, 1 day_of_week, 2 month; lookup table or None)
+    TEMPORAL = {
+        'hour': (0, None),
+        'day_of_week': (1, None),
+        'month': (2, None),
+        'is_weekend': (1, IS_WEEKEND),
+        'hour_sin': (0, HOUR_SIN),
+        'hour_cos': (0, HOUR_COS),
+        'month_sin': (2, MONTH_SIN),
+        'month_cos': (2, MONTH_COS),
+    }
+    ROLLING_STATS = ['mean', 'std', 'max', 'min']
+
+    def __init__(self, feature_names, lags, windows, dtype=np.float64):
+        self.feature_names = list(feature_names)
+        self.index = {name: j for j, name in enumerate(self.feature_names)}
+        self.n_features = len(self.feature_names)
+        self.dtype = dtype
+
+        self.lags, self.lag_cols = self._compile([f'AQI_computed_lag_{lag}h' for lag in lags], lags)
+        self.temporal = [(self.index[name], source, table)
+                         for name, (source, table) in self.TEMPORAL.items() if name in self.index]
+        self.rolling = []
+        for window in windows:
+            cols = [self.index.get(f'AQI_computed_rolling_{stat}_{window}h', -1)
+                    for stat in self.ROLLING_STATS]
+            if any(c >= 0 for c in cols):
+                self.rolling.append((window, cols))
+
+    def _compile(self, names, keys=None):
+        """Keep only the names present in the model: (kept keys, column indices)."""
+        keys = names if keys is None else keys
+        pairs = [(key, self.index[name]) for key, name in zip(keys, names) if name in self.index]
+        return [k for k, _ in pairs], np.array([c for _, c in pairs], dtype=np.intp)
+
+    def columns(self, names):
+        """
+        Compile a group of input columns. Returns (positions, cols): positions
+        into `names` of the ones the model uses, and their column indices.
+        """
+        return self._compile(names, list(range(len(names))))
+
+    def allocate(self, n_rows=1):
+        """Zeroed (n_rows, n_features) matrix to be reused across steps."""
+        return np.zeros((n_rows, self.n_features), dtype=self.dtype)
+
+    def write_group(self, X, compiled, values):
+        """Write values[:, positions] (or a 1-D row of them) into their columns."""
+        positions, cols = compiled
+        if len(cols):
+            X[:, cols] = np.asarray(values)[..., positions]
+
+    def write_temporal(self, X, hour, day_of_week, month):
+        """Calendar features from integer hour/dow/month (scalars or per-row arrays)."""
+        inputs = (hour, day_of_week, month)
+        for col, source, table in self.temporal:
+            X[:, col] = inputs[source] if table is None else table[inputs[source]]
+
+    def write_history(self, X, state):
+        """Lag and rolling features from a feature_state.RollingFeatureState."""
+        for lag, col in zip(self.lags, self.lag_cols):
+            X[:, col] = state.lag(lag)
+        for window, cols in self.rolling:
+            for col, values in zip(cols, state.rolling(window)):
+                if col >= 0:
+                    X[:, col] = values
@@ -0,0 +1,175 @@
+"""
+Incremental Lag / Rolling Feature State
+Constant-time AQI lag and rolling-window features for recursive forecasting.
+
+The recursive forecasters append one predicted AQI per step and need the
+lag_{k}h and rolling mean/std/max/min_{w}h features of the updated series.
+Instead of keeping a growing Python list and recomputing every window from
+scratch, RollingFeatureState keeps:
+
+- a fixed NumPy ring buffer of the last max(lags, windows) values,
+- a sliding Welford mean / M2 per window (std is the population std, like np.std),
+- a monotonic deque per window for the running max and min.
+
+Every array is shaped (n_series, ...) so a single object tracks a whole vector
+of stations, and push() advances all of them at once.
+"""
+
+import numpy as np
+
+
+class _MonotonicDeques:
+    """
+    Sliding-window max and min for every window and every series at once.
+
+    Each (window, max|min, series) lane is a deque of absolute time indices
+    whose signed values are kept strictly decreasing, so the front is the
+    window's extreme (min lanes store negated values). Lanes are stacked so
+    one push updates all of them with a handful of array operations.
+    """
+
+    def __init__(self, n, windows):
+        self.n = n
+        self.windows = list(windows)
+        lanes = 2 * len(self.windows) * n
+        # Lane order: window-major, then [max, min], then series
+        self.window = np.repeat(np.array(self.windows, dtype=np.int64), 2 * n)
+        self.sign = np.tile(np.repeat([1.0, -1.0], n), len(self.windows))
+        self.series = np.tile(np.arange(n), 2 * len(self.windows))
+        self.width = max(self.windows)
+        self.idx = np.zeros((lanes, self.width), dtype=np.int64)
+        self.val = np.zeros((lanes, self.width), dtype=np.float64)
+        self.head = np.zeros(lanes, dtype=np.int64)
+        self.size = np.zeros(lanes, dtype=np.int64)
+        self._lanes = np.arange(lanes)
+
+    def push(self, t, values):
+        """Add one value per series at absolute time t."""
+        x = values[self.series] * self.sign
+        lanes, width = self._lanes, self.width
+
+        # Drop the front if it has left the window (at most one per step)
+        expired = (self.size > 0) & (self.idx[lanes, self.head] <= t - self.window)
+        self.head[expired] = (self.head[expired] + 1) % width
+        self.size[expired] -= 1
+
+        # Pop dominated values from the back
+        active = lanes[self.size > 0]
+        while len(active):
+            back = (self.head[active] + self.size[active] - 1) % width
+            active = active[self.val[active, back] <= x[active]]
+            self.size[active] -= 1
+            active = active[self.size[active] > 0]
+
+        tail = (self.head + self.size) % width
+        self.idx[lanes, tail] = t
+        self.val[lanes, tail] = x
+        self.size += 1
+
+    def extremes(self, window):
+        """(max, min) of the last `window` values of every series."""
+        start = self.windows.index(window) * 2 * self.n
+        fronts = self.val[self._lanes[start:start + 2 * self.n], self.head[start:start + 2 * self.n]]
+        return fronts[:self.n], -fronts[self.n:]
+
+
+class RollingFeatureState:
+    """
+    Lag and rolling-window statistics of one or more AQI series.
+
+    Parameters
+    ----------
+    history : array-like
+        Initial values, oldest first. Shape (n_series, n_hours), or 1-D for a
+        single series. Values are assumed finite.
+    lags : list of int
+        Lag hours that will be queried (lag 1 is the latest value).
+    windows : list of int
+        Rolling window lengths in hours.
+
+    While fewer values than a lag/window have been seen, lags fall back to the
+    oldest value and windows cover everything seen so far, matching the
+    list-based recursion this replaces.
+    """
+
+    def __init__(self, history, lags, windows):
+        history = np.asarray(history, dtype=np.float64)
+        if history.ndim == 1:
+            history = history[None, :]
+        n, length = history.shape
+        if length == 0:
+            raise ValueError("RollingFeatureState needs at least one initial value")
+
+        self.lags = list(lags)
+        self.windows = list(windows)
+        self.capacity = max(self.lags + self.windows)
+        self.n_series = n
+        self._buffer = np.zeros((n, self.capacity), dtype=np.float64)
+        self._t = 0  # absolute index of the next value
+
+        # Welford moments, one row per window
+        self._window = np.array(self.windows, dtype=np.int64)
+        self._count = np.zeros(len(self.windows), dtype=np.int64)
+        self._mean = np.zeros((len(self.windows), n))
+        self._m2 = np.zeros((len(self.windows), n))
+        self._extremes = _MonotonicDeques(n, self.windows)
+
+        # Only the last `capacity` values can ever be observed
+        start = max(0, length - self.capacity)
+        for j in range(start, length):
+            self.push(history[:, j])
+        self._init_exact(history[:, start:])
+
+    def _init_exact(self, history):
+        """Reset window moments from the seed history in one pass (exact for constant seeds)."""
+        for k, w in enumerate(self.windows):
+            recent = history[:, -w:]
+            self._mean[k] = recent.mean(axis=1)
+            self._m2[k] = ((recent - self._mean[k][:, None]) ** 2).sum(axis=1)
+
+    @property
+    def filled(self):
+        return min(self._t, self.capacity)
+
+    def push(self, values):
+        """Append one value per series (scalar or array of n_series)."""
+        x = np.broadcast_to(np.asarray(values, dtype=np.float64), (self.n_series,))
+        t = self._t
+
+        mean, m2 = self._mean, self._m2
+        growing = (self._count < self._window)[:, None]
+        self._count = np.minimum(self._count + 1, self._window)
+
+        # Windows still filling up: plain Welford add
+        delta = x - mean
+        grown_mean = mean + delta / self._count[:, None]
+        grown_m2 = m2 + delta * (x - grown_mean)
+
+        # Full windows: add x and drop the value leaving the window (read it
+        # before the ring buffer slot is overwritten)
+        old = self._buffer[:, (t - self._window) % self.capacity].T
+        slid_mean = mean + (x - old) / self._window[:, None]
+        slid_m2 = m2 + (x - old) * (x - slid_mean + old - mean)
+
+        self._mean = np.where(growing, grown_mean, slid_mean)
+        self._m2 = np.where(growing, grown_m2, slid_m2)
+
+        self._buffer[:, t % self.capacity] = x
+        self._extremes.push(t, x)
+        self._t = t + 1
+
+    def lag(self, hours):
+        """Value `hours` steps back (1 = latest), or the oldest value if not that long yet."""
+        hours = min(hours, self.filled)
+        return self._buffer[:, (self._t - hours) % self.capacity]
+
+    def rolling(self, window):
+        """(mean, std, max, min) arrays over the last `window` values."""
+        k = self.windows.index(window)
+        high, low = self._extremes.extremes(window)
+        # A flat window is exactly flat; don't let accumulated rounding in M2
+        # turn into a spurious std of ~sqrt(eps)
+        flat = high == low
+        mean = np.where(flat, high, self._mean[k])
+        std = np.where(flat, 0.0, np.sqrt(np.maximum(self._m2[k], 0.0) / self._count[k]))
+        return mean, std, high, low
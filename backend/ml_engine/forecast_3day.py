@@ -6,128 +6,108 @@ import sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
-import joblib
-import xgboost as xgb
 from datetime import datetime, timedelta
 
 import os
+import time
+import logging
 from .aqi_calculator import compute_aqi_for_dataframe, get_aqi_category
+from .feature_state import RollingFeatureState
+from .feature_plan import FeaturePlan
+from .columnar_store import open_dataset
+from .http_pool import run_sync
+from .metrics import model_inference
+from . import model_registry
+from .city_registry import get_city_registry
 # Import API Client
 try:
     from .api_client import MultiSourceAPIClient
 except ImportError:
     MultiSourceAPIClient = None
 
+logger = logging.getLogger(__name__)
+
 # Configuration - must match training
 LAG_HOURS = [1, 3, 6, 12, 24]
 ROLLING_WINDOWS = [3, 6, 12, 24]
+WEATHER_COLS = ['Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']
 
-def load_model(city='Delhi'):
-    """Load trained model and components for specific city."""
-    models_dir = Path(__file__).parent / 'models'
-    
-    prefix = ""
-    if city.lower() == 'pune':
-        prefix = "pune_"
-    
-    model_path = models_dir / f'{prefix}xgboost_aqi.json'
-    scaler_path = models_dir / f'{prefix}scaler.pkl'
-    # Pune uses feature_names.pkl (no prefix in some listings, but let's check)
-    # List dir showed: pune_feature_names.pkl
-    feature_path = models_dir / f'{prefix}feature_names.pkl'
-    
-    if not model_path.exists():
-        print(f"Model not found for {city}: {model_path}")
+def feature_plan(feature_names):
+    """Compiled FeaturePlan for a forecast model's features (build once per model version)."""
+    return FeaturePlan(feature_names, LAG_HOURS, ROLLING_WINDOWS)
+
+def load_model(city='Delhi', version=None):
+    """Load trained model and components for specific city (registry version, default CURRENT)."""
+    try:
+        info = get_city_registry().resolve(city, require='forecast')
+        loaded = model_registry.load(info.models['forecast'], version)
+    except model_registry.ModelNotFound as e:
+        logger.warning("Model not found for %s: %s", city, e)
         return None, None, None
 
-    model = xgb.XGBRegressor()
-    model.load_model(str(model_path))
-    scaler = joblib.load(scaler_path)
-    feature_names = joblib.load(feature_path)
-    
-    print(f'{city} Model loaded successfully! Path: {model_path}')
-    return model, scaler, feature_names
+    logger.info('%s Model loaded successfully! Version: %s', city, loaded.version)
+    return loaded.model, loaded.scaler, loaded.features
 
 
-def fetch_and_merge_live_data(df, city='Delhi'):
-    """Fetch real-time data and append/merge with historical DF."""
+def fetch_and_merge_live_data(store, city='Delhi'):
+    """
+    Fetch the last 24h of live data and append the hours newer than the
+    store's end to it (in memory, see ColumnarStore.append). Returns the
+    number of rows appended.
+    """
     if not MultiSourceAPIClient:
-        print("MultiSourceAPIClient not available.")
-        return df
+        logger.warning("MultiSourceAPIClient not available.")
+        return 0
         
     client = MultiSourceAPIClient()
-    # Fetch last 24h to ensure overlap/continuity
-    live_df = client.fetch_realtime_data(city=city, hours=24)
+    # Fetch last 24h to ensure overlap/continuity (called from a worker thread)
+    live_df = run_sync(client.fetch_realtime_data(city=city, hours=24))
     
     if live_df is None or live_df.empty:
-        print("No live data fetched.")
-        return df
+        logger.warning("No live data fetched.")
+        return 0
         
-    # Ensure consistent columns
-    # Historical DF has: Datetime, PM2.5, PM10, NO2, CO, O3, SO2, Temp, Hum, Wind, AQI_computed
-    # Live DF has similar. 
-    # Map column names if needed or ensure client returns matching names.
-    # The client returns: 'Datetime', 'PM2_5_ugm3', 'PM10_ugm3', etc.
-    # Historical might correspond. Let's assume standard names.
-    
-    # Concatenate and de-duplicate
-    # 1. Normalize datetime
-    df['Datetime'] = pd.to_datetime(df['Datetime']).dt.tz_localize(None)
-    live_df['Datetime'] = pd.to_datetime(live_df['Datetime']).dt.tz_localize(None)
-    
-    # 2. Concat
-    merged = pd.concat([df, live_df], ignore_index=True)
-    
-    # 3. Sort
-    merged = merged.sort_values('Datetime')
-    
-    # 4. Drop duplicates by Datetime (keep last/live)
-    merged = merged.drop_duplicates(subset=['Datetime'], keep='last')
-    
-    print(f"Merged live data. New end: {merged['Datetime'].iloc[-1]}")
-    return merged
+    # The client returns the dataset's column names ('Datetime', 'PM2_5_ugm3', ...);
+    # columns it lacks are stored as NaN.
+    # The series is hourly: live readings (simulated and CPCB ones are stamped
+    # "now") are keyed by their hour, the latest reading per hour winning.
+    live_df['Datetime'] = pd.to_datetime(live_df['Datetime']).dt.tz_localize(None).dt.floor('h')
+    live_df = live_df.sort_values('Datetime', kind='stable').drop_duplicates(subset=['Datetime'], keep='last')
+    
+    appended = store.append(live_df)
+    if appended:
+        logger.info("Merged %s live rows for %s. New end: %s", appended, city, store.end)
+    return appended
 
 
-def prepare_historical_data(city='Delhi'):
-    """Load and prepare historical and live data."""
-    # Data is now in ml_engine/data
-    data_dir = Path(__file__).parent / 'data'
-    
-    filename = 'delhi_model_data.csv'
-    if city.lower() == 'pune':
-        filename = 'pune_stations_combined.csv' 
-        # Note: 'pune_stations_combined.csv' is station-wise. 
-        # Ideally we need a standard training file (like delhi_model_data.csv). 
-        # If unavailable, we might fail or need to aggregate.
-        # Assuming for now it works or we use what we have.
-        # Actually, let's look at file size. 8MB. Might be raw station data.
-        # If we fail here, we fallback.
-        
-    csv_path = data_dir / filename
-    
-    if not csv_path.exists():
-        print(f"Data file not found for {city}: {csv_path}")
-        # Fallback to Delhi if Pune missing to prevent crash, or return empty?
-        if city == 'Pune': return None 
+def prepare_historical_data(store, city='Delhi', until=None):
+    """
+    Load and prepare historical and live data from the city's columnar store
+    (the forecast dataset listed in data/cities.json). Live data is not
+    fetched again if the store already reaches `until`.
+    """
+    if store is None:
+        logger.warning("Data file not found for %s", city)
         return None
+    info = get_city_registry().resolve(city, require='forecast')
 
-    df = pd.read_csv(csv_path)
-    df['Datetime'] = pd.to_datetime(df['Datetime'], errors='coerce') # Handle potential format errors
-    df = df.dropna(subset=['Datetime'])
-    df = df.sort_values('Datetime')
+    # --- Live Data Integration ---
+    if until is None or store.end is None or store.end < until:
+        try:
+            fetch_and_merge_live_data(store, city=info.name)
+        except Exception as e:
+            logger.error("Error merging live data: %s", e)
+    # -----------------------------
+
+    # Already parsed, de-NaT'd and sorted by Datetime at conversion time
+    df = store.to_frame()
     
-    if city.lower() == 'pune':
-        # Pune data might be station-wise. Aggregate if needed.
+    if info.aggregate_stations:
+        # Note: Pune's 'pune_stations_combined.csv' is station-wise, not a
+        # standard training file (like delhi_model_data.csv): aggregate it
         if 'station' in df.columns or 'StationId' in df.columns:
              # Simple mean aggregation by date
              df = df.groupby('Datetime').mean(numeric_only=True).reset_index()
-
-    # --- Live Data Integration ---
-    try:
-        df = fetch_and_merge_live_data(df, city=city)
-    except Exception as e:
-        print(f"Error merging live data: {e}")
-    # -----------------------------
     
     # Compute AQI (re-compute for new data)
     df = compute_aqi_for_dataframe(df)
@@ -145,23 +125,13 @@ def prepare_historical_data(city='Delhi'):
     return df
 
 
-def get_rolling_stats(aqi_history, window):
-    """Calculate rolling statistics from history."""
-    if len(aqi_history) < window:
-        arr = aqi_history
-    else:
-        arr = aqi_history[-window:]
-    
-    return {
-        'mean': np.mean(arr),
-        'std': np.std(arr) if len(arr) > 1 else 0,
-        'max': np.max(arr),
-        'min': np.min(arr)
-    }
-
-
-def forecast_next_hours(model, scaler, feature_names, df, hours=72):
-    """Forecast AQI for next N hours using recursive prediction."""
+def forecast_next_hours(model, scaler, feature_names, df, hours=72, plan=None):
+    """
+    Forecast AQI for next N hours using recursive prediction.
+    `plan` is the model's feature_plan(feature_names), compiled here if not given.
+    """
+    started = time.perf_counter()
+    predict_seconds = 0.0
     
     # Get the last known data point
     last_row = df.iloc[-1].copy()
@@ -174,18 +144,28 @@ def forecast_next_hours(model, scaler, feature_names, df, hours=72):
     start_time_limit = datetime.now()
     
     # Build AQI history (last 24 hours)
-    aqi_history = df['AQI_computed'].tail(24).tolist()
+    aqi_history = RollingFeatureState(df['AQI_computed'].tail(24).to_numpy(dtype=np.float64),
+                                      LAG_HOURS, ROLLING_WINDOWS)
     
     # Get last known pollutant values
     pollutant_cols = ['PM2_5_ugm3', 'PM10_ugm3', 'NO2_ugm3', 'CO_ugm3', 'O3_ugm3', 'SO2_ugm3',
                       'Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']
-    last_pollutants = {col: last_row[col] for col in pollutant_cols if col in df.columns}
+    pollutant_names = [col for col in pollutant_cols if col in df.columns and col not in WEATHER_COLS]
+    weather_names = [col for col in WEATHER_COLS if col in df.columns]
+    last_pollutants = np.array([last_row[col] for col in pollutant_names], dtype=np.float64)
+    
+    # Feature matrix reused across steps; weather is kept the same throughout
+    if plan is None:
+        plan = feature_plan(feature_names)
+    pollutant_group = plan.columns(pollutant_names)
+    X = plan.allocate(1)
+    plan.write_group(X, plan.columns(weather_names),
+                     np.array([last_row[col] for col in weather_names], dtype=np.float64))
     
     forecasts = []
     
-    print(f'\nForecasting from data end: {last_datetime}')
-    print(f'Target start time: {start_time_limit}')
-    print('-' * 60)
+    logger.debug('Forecasting from data end: %s, target start time: %s',
+                 last_datetime, start_time_limit, extra={'sampled': True})
     
     # We loop indefinitely until we generate enough "future" hours
     # We use 'h' to track simulation steps from last_datetime
@@ -200,9 +180,6 @@ def forecast_next_hours(model, scaler, feature_names, df, hours=72):
         # Calculate simulation datetime
         sim_dt = last_datetime + timedelta(hours=h)
         
-        # Create feature row
-        features = {}
-        
         # Pollutant features
         hour_of_day = sim_dt.hour
         
@@ -213,49 +190,23 @@ def forecast_next_hours(model, scaler, feature_names, df, hours=72):
         else:
             pollution_factor = 1.0
         
-        for col, val in last_pollutants.items():
-            if col in ['Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']:
-                features[col] = val  # Keep weather same
-            else:
-                features[col] = val * pollution_factor
-        
-        # Temporal features
-        features['hour'] = hour_of_day
-        features['day_of_week'] = sim_dt.weekday()
-        features['month'] = sim_dt.month
-        features['is_weekend'] = 1 if sim_dt.weekday() >= 5 else 0
-        features['hour_sin'] = np.sin(2 * np.pi * hour_of_day / 24)
-        features['hour_cos'] = np.cos(2 * np.pi * hour_of_day / 24)
-        features['month_sin'] = np.sin(2 * np.pi * sim_dt.month / 12)
-        features['month_cos'] = np.cos(2 * np.pi * sim_dt.month / 12)
+        plan.write_group(X, pollutant_group, last_pollutants * pollution_factor)
         
-        # Lag features
-        for lag in LAG_HOURS:
-            if lag <= len(aqi_history):
-                features[f'AQI_computed_lag_{lag}h'] = aqi_history[-lag]
-            else:
-                features[f'AQI_computed_lag_{lag}h'] = aqi_history[0]
-        
-        # Rolling features
-        for window in ROLLING_WINDOWS:
-            stats = get_rolling_stats(aqi_history, window)
-            features[f'AQI_computed_rolling_mean_{window}h'] = stats['mean']
-            features[f'AQI_computed_rolling_std_{window}h'] = stats['std']
-            features[f'AQI_computed_rolling_max_{window}h'] = stats['max']
-            features[f'AQI_computed_rolling_min_{window}h'] = stats['min']
+        # Temporal, lag and rolling features
+        plan.write_temporal(X, hour_of_day, sim_dt.weekday(), sim_dt.month)
+        plan.write_history(X, aqi_history)
         
         # Predict
-        X = np.array([[features.get(f, 0) for f in feature_names]])
+        step_started = time.perf_counter()
         X_scaled = scaler.transform(X)
         predicted_aqi = model.predict(X_scaled)[0]
+        predict_seconds += time.perf_counter() - step_started
         
         predicted_aqi = predicted_aqi * pollution_factor * (1.0 + np.random.uniform(-0.02, 0.02))
         predicted_aqi = np.clip(predicted_aqi, 0, 500)
         
         # Update history
-        aqi_history.append(predicted_aqi)
-        if len(aqi_history) > 48:
-            aqi_history.pop(0)
+        aqi_history.push(predicted_aqi)
             
         # Only add to output if this time is in the future relative to NOW
         # (or at least close to now, e.g. within last hour)
@@ -269,7 +220,10 @@ def forecast_next_hours(model, scaler, feature_names, df, hours=72):
                 'category': str(category)
             })
             generated_count += 1
-            
+    
+    # One observation per forecast: model time summed over the recursive steps
+    model_inference.observe(predict_seconds, model='forecast_3day', stage='predict')
+    model_inference.observe(time.perf_counter() - started, model='forecast_3day', stage='total')
     return forecasts
 
 
@@ -376,7 +330,8 @@ def main():
     
     # Prepare historical data
     print('\nLoading historical data...')
-    df = prepare_historical_data()
+    store = open_dataset(get_city_registry().resolve('Delhi').datasets['forecast'])
+    df = prepare_historical_data(store)
     print(f'Data loaded: {len(df)} records')
     print(f'Date range: {df["Datetime"].min()} to {df["Datetime"].max()}')
     
@@ -0,0 +1,192 @@
+"""
+Forecast Cache
+Per-city materialized 72h forecasts for /api/ml/forecast-3day.
+
+A forecast only changes when a new hour of observations arrives, so each
+city keeps one computed result keyed by the last observation it was built
+from (its watermark). Observations are hourly, so until an hour after that
+observation the entry is simply served. After that, requests still get it
+while one background refresh checks the source: it pulls live data and
+reads the newest observation, and the forecast is recomputed only if that
+moved. Otherwise the entry is confirmed as is and checked again after
+FORECAST_CACHE_CHECK_SECONDS. An entry not confirmed for the staleness
+limit is not served; the request waits for the refresh. Concurrent misses
+for the same city share one refresh.
+
+Config (env):
+    FORECAST_CACHE_CHECK_SECONDS      How often a due entry re-checks the source
+                                      for a new observation (default 300)
+    FORECAST_CACHE_MAX_STALE_SECONDS  How long an unconfirmed forecast may still
+                                      be served while refreshing (default 3h)
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import pandas as pd
+
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+CHECK_SECONDS = float(os.getenv("FORECAST_CACHE_CHECK_SECONDS", 300))
+MAX_STALE_SECONDS = float(os.getenv("FORECAST_CACHE_MAX_STALE_SECONDS", 3 * 3600))
+# Observations arrive hourly
+OBSERVATION_PERIOD_SECONDS = 3600
+
+
+class ForecastCache:
+    """
+    Single-flight, stale-while-revalidate cache of per-city forecasts keyed
+    by their last observation.
+
+    Parameters
+    ----------
+    compute : coroutine function
+        compute(city, latest) -> (forecasts, last_observation) or None when
+        there is no data; `latest` is the observation the source reported.
+        It should hand the work to the CPU executor, not run it on the event
+        loop.
+    latest_observation : coroutine function
+        latest_observation(city) -> timestamp of the newest observation
+        (after pulling live data), or None without data.
+    check_seconds : float
+        Minimum time between two checks of the source for an entry.
+    max_stale_seconds : float
+        Age limit, since it was last confirmed, for serving an entry while
+        it refreshes.
+    period_seconds : float
+        Interval between observations.
+    """
+
+    def __init__(self, compute, latest_observation, check_seconds=CHECK_SECONDS,
+                 max_stale_seconds=MAX_STALE_SECONDS, period_seconds=OBSERVATION_PERIOD_SECONDS):
+        self._compute = compute
+        self._latest_observation = latest_observation
+        self.check_seconds = check_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.period_seconds = period_seconds
+        self._entries = {}
+        self._inflight = {}
+        self._counters = {}
+
+    def _count(self, city, key):
+        counters = self._counters.setdefault(
+            city, {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'unchanged': 0, 'errors': 0})
+        counters[key] += 1
+
+    @staticmethod
+    def _copy(forecasts):
+        # Entries hold only immutable scalars, so a shallow copy per row is enough
+        return None if forecasts is None else [dict(f) for f in forecasts]
+
+    def _seconds_until_due(self, entry):
+        """Seconds until the entry should be checked against the source (0 once due)."""
+        wait = entry['checked_at'] + self.check_seconds - time.time()
+        if entry['last_observation'] is not None:
+            # The next observation cannot exist before its hour (timestamps are naive local time)
+            next_observation = pd.Timestamp(entry['last_observation']) + pd.Timedelta(seconds=self.period_seconds)
+            wait = max(wait, (next_observation - pd.Timestamp.now()).total_seconds())
+        return max(0.0, wait)
+
+    async def get(self, city):
+        """Forecast list for a city, or None if it has no data."""
+        entry = self._entries.get(city)
+
+        if entry is not None and self._seconds_until_due(entry) > 0:
+            self._count(city, 'hits')
+            record_cache('forecast', True)
+            return self._copy(entry['forecasts'])
+
+        if entry is not None and time.time() - entry['checked_at'] <= self.max_stale_seconds:
+            self._count(city, 'stale_hits')
+            record_cache('forecast', True)
+            self.refresh(city)
+            return self._copy(entry['forecasts'])
+
+        self._count(city, 'misses')
+        record_cache('forecast', False)
+        return self._copy(await asyncio.shield(self.refresh(city)))
+
+    def refresh(self, city, force=False):
+        """Start (or join) the check/computation for a city; returns its task."""
+        task = self._inflight.get(city)
+        if task is None or task.done():
+            task = asyncio.create_task(self._run(city, force))
+            # Background refreshes may have nobody awaiting them
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[city] = task
+        return task
+
+    async def recompute(self, city):
+        """
+        Recompute a city's entry now, e.g. after its model changed. The old
+        entry is served until the new one is ready; a refresh already running
+        (on the old model) is waited out first.
+        """
+        task = self._inflight.get(city)
+        if task is not None:
+            await asyncio.wait([task])
+        return await self.refresh(city, force=True)
+
+    async def _run(self, city, force):
+        started = time.perf_counter()
+        try:
+            latest = await self._latest_observation(city)
+            entry = self._entries.get(city)
+            if not force and entry is not None and entry['last_observation'] == latest:
+                # No new observation: the entry is still current
+                entry['checked_at'] = time.time()
+                self._count(city, 'unchanged')
+                return entry['forecasts']
+            self._count(city, 'refreshes')
+            result = await self._compute(city, latest)
+        except Exception:
+            self._count(city, 'errors')
+            logger.exception("Forecast refresh failed for %s", city)
+            raise
+        finally:
+            self._inflight.pop(city, None)
+
+        # "No data" is cached too, so it is not recomputed on every request. The
+        # entry is keyed by what the source reported, which the next check compares.
+        forecasts, last_observation = result if result is not None else (None, None)
+        now = time.time()
+        self._entries[city] = {
+            'forecasts': forecasts,
+            'last_observation': latest,
+            'computed_at': now,
+            'checked_at': now,
+        }
+        logger.info("Forecast for %s refreshed in %.2fs (data up to %s)",
+                    city, time.perf_counter() - started, last_observation)
+        return forecasts
+
+    def version(self, city):
+        """Identifies the entry currently served for a city (None before the first compute)."""
+        entry = self._entries.get(city)
+        if entry is None:
+            return None
+        return f"{entry['last_observation']}@{entry['computed_at']:.3f}"
+
+    def max_age(self, city):
+        """Seconds until the city's entry is due for a check (0 while a due entry is served)."""
+        entry = self._entries.get(city)
+        return 0 if entry is None else self._seconds_until_due(entry)
+
+    def stats(self):
+        """Age, watermark (last observation) and hit/miss counters per city."""
+        now = time.time()
+        out = {}
+        for city in set(self._entries) | set(self._counters):
+            entry = self._entries.get(city)
+            out[city] = dict(self._counters.get(city, {}))
+            out[city]['refreshing'] = city in self._inflight
+            if entry is not None:
+                out[city]['age_seconds'] = round(now - entry['computed_at'], 1)
+                out[city]['checked_seconds_ago'] = round(now - entry['checked_at'], 1)
+                out[city]['last_observation'] = None if entry['last_observation'] is None else str(entry['last_observation'])
+                out[city]['due_in_seconds'] = round(self._seconds_until_due(entry), 1)
+        return out
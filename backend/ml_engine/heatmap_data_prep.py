@@ -2,51 +2,15 @@ import os
 import pandas as pd
 import re
 
+try:
+    from ml_engine.station_registry import get_registry
+except ImportError:
+    from station_registry import get_registry
+
 # Source directory containing the 78 station CSVs
 SOURCE_DIR = r"c:\Users\UDAY THAKARE\Documents\AI-R\delhi_all_stations_24-25\delhi_all_stations_24-25"
 OUTPUT_FILE = r"c:\Users\UDAY THAKARE\Documents\AI-R\vayumitra\backend\ml_engine\data\delhi_stations_combined.csv"
 
-# Known coordinates for Delhi stations (approximate)
-# In a real scenario, we would use an official metadata file.
-STATION_COORDS = {
-    "Alipur": {"lat": 28.8153, "lng": 77.1530},
-    "Anand Vihar": {"lat": 28.6476, "lng": 77.3160},
-    "Ashok Vihar": {"lat": 28.6954, "lng": 77.1817},
-    "Aya Nagar": {"lat": 28.4720, "lng": 77.1120},
-    "Bawana": {"lat": 28.7762, "lng": 77.0511},
-    "Burari Crossing": {"lat": 28.7256, "lng": 77.2012},
-    "Chandni Chowk": {"lat": 28.6568, "lng": 77.2272},
-    "CRRI Mathura Road": {"lat": 28.5512, "lng": 77.2736},
-    "Dr. Karni Singh Shooting Range": {"lat": 28.4986, "lng": 77.2648},
-    "DTU": {"lat": 28.7501, "lng": 77.1113},
-    "Dwarka-Sector 8": {"lat": 28.5710, "lng": 77.0719},
-    "IGI Airport (T3)": {"lat": 28.5567, "lng": 77.1000},
-    "IHBAS": {"lat": 28.6811, "lng": 77.3025}, # Dilshad Garden
-    "ITO": {"lat": 28.6286, "lng": 77.2410},
-    "Jahangirpuri": {"lat": 28.7328, "lng": 77.1706},
-    "Jawaharlal Nehru Stadium": {"lat": 28.5802, "lng": 77.2338},
-    "Lodhi Road": {"lat": 28.5883, "lng": 77.2217},
-    "Major Dhyan Chand National Stadium": {"lat": 28.6117, "lng": 77.2372},
-    "Mandir Marg": {"lat": 28.6364, "lng": 77.1997},
-    "Mundka": {"lat": 28.6847, "lng": 77.0766},
-    "Najafgarh": {"lat": 28.6138, "lng": 76.9830},
-    "Narela": {"lat": 28.8606, "lng": 77.0927},
-    "Nehru Nagar": {"lat": 28.5678, "lng": 77.2505},
-    "North Campus": {"lat": 28.6940, "lng": 77.2159}, # DU
-    "NSIT Dwarka": {"lat": 28.6090, "lng": 77.0326},
-    "Okhla Phase-2": {"lat": 28.5308, "lng": 77.2713},
-    "Patparganj": {"lat": 28.6238, "lng": 77.2872},
-    "Punjabi Bagh": {"lat": 28.6683, "lng": 77.1167},
-    "Pusa": {"lat": 28.6396, "lng": 77.1463},
-    "R K Puram": {"lat": 28.5632, "lng": 77.1869},
-    "Rohini": {"lat": 28.7325, "lng": 77.1199},
-    "Shadipur": {"lat": 28.6515, "lng": 77.1473},
-    "Sirifort": {"lat": 28.5504, "lng": 77.2159},
-    "Sonia Vihar": {"lat": 28.7105, "lng": 77.2495},
-    "Sri Aurobindo Marg": {"lat": 28.5313, "lng": 77.1901},
-    "Vivek Vihar": {"lat": 28.6723, "lng": 77.3153},
-    "Wazirpur": {"lat": 28.6998, "lng": 77.1654}
-}
 
 def clean_station_name(filename):
     # Example: Raw_data_1Hr_2024_site_113_Shadipur_Delhi_CPCB_1Hr.csv
@@ -70,6 +34,7 @@ def clean_station_name(filename):
     return name
 
 def main():
+    registry = get_registry()
     all_data = []
     
     if not os.path.exists(SOURCE_DIR):
@@ -90,19 +55,11 @@ def main():
             lat = 0
             lng = 0
             
-            # Find coordinates
-            # Try exact match first
-            if station_name in STATION_COORDS:
-                coords = STATION_COORDS[station_name]
-                lat, lng = coords["lat"], coords["lng"]
-            else:
-                # Fuzzy match or check partials
-                for key in STATION_COORDS:
-                    if key in station_name or station_name in key:
-                        coords = STATION_COORDS[key]
-                        lat, lng = coords["lat"], coords["lng"]
-                        station_name = key # Standardize name
-                        break
+            # Find coordinates (and the canonical name) in the station registry
+            station = registry.resolve(station_name, 'Delhi')
+            if station is not None:
+                lat, lng = station.lat, station.lng
+                station_name = station.name # Standardize name
             
             if lat == 0:
                 print(f"Warning: No coordinates found for {station_name} (File: {filename})")
@@ -1,182 +1,276 @@
 import pandas as pd
 import numpy as np
-import pickle
+import asyncio
 import os
+import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from ml_engine.api_client import fetch_live_weather_data, fetch_cpcb_station_data 
+from ml_engine.aqi_kernels import pm25_to_aqi, aqi_status
+from ml_engine.spatial_raster import SpatialRaster, bounding_box
+from ml_engine.station_registry import get_registry
+from ml_engine.metrics import model_inference, record_cache
+from ml_engine import model_registry
+from ml_engine import cpu_executor
+from ml_engine.city_registry import get_city_registry
+
+logger = logging.getLogger(__name__)
 
 # Config
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "models", "heatmap_model.pkl")
-STATION_ENCODER_PATH = os.path.join(os.path.dirname(__file__), "models", "station_encoder.pkl")
-
-# Station Coordinates (Should ideally be shared with prep script or loaded from file)
-STATION_COORDS = {
-    "Alipur": {"lat": 28.8153, "lng": 77.1530},
-    "Anand Vihar": {"lat": 28.6476, "lng": 77.3160},
-    "Ashok Vihar": {"lat": 28.6954, "lng": 77.1817},
-    "Aya Nagar": {"lat": 28.4720, "lng": 77.1120},
-    "Bawana": {"lat": 28.7762, "lng": 77.0511},
-    "Burari Crossing": {"lat": 28.7256, "lng": 77.2012},
-    "Chandni Chowk": {"lat": 28.6568, "lng": 77.2272},
-    "CRRI Mathura Road": {"lat": 28.5512, "lng": 77.2736},
-    "Dr. Karni Singh Shooting Range": {"lat": 28.4986, "lng": 77.2648},
-    "DTU": {"lat": 28.7501, "lng": 77.1113},
-    "Dwarka-Sector 8": {"lat": 28.5710, "lng": 77.0719},
-    "IGI Airport (T3)": {"lat": 28.5567, "lng": 77.1000},
-    "IHBAS": {"lat": 28.6811, "lng": 77.3025},
-    "ITO": {"lat": 28.6286, "lng": 77.2410},
-    "Jahangirpuri": {"lat": 28.7328, "lng": 77.1706},
-    "Jawaharlal Nehru Stadium": {"lat": 28.5802, "lng": 77.2338},
-    "Lodhi Road": {"lat": 28.5883, "lng": 77.2217},
-    "Major Dhyan Chand National Stadium": {"lat": 28.6117, "lng": 77.2372},
-    "Mandir Marg": {"lat": 28.6364, "lng": 77.1997},
-    "Mundka": {"lat": 28.6847, "lng": 77.0766},
-    "Najafgarh": {"lat": 28.6138, "lng": 76.9830},
-    "Narela": {"lat": 28.8606, "lng": 77.0927},
-    "Nehru Nagar": {"lat": 28.5678, "lng": 77.2505},
-    "North Campus": {"lat": 28.6940, "lng": 77.2159},
-    "NSIT Dwarka": {"lat": 28.6090, "lng": 77.0326},
-    "Okhla Phase-2": {"lat": 28.5308, "lng": 77.2713},
-    "Patparganj": {"lat": 28.6238, "lng": 77.2872},
-    "Punjabi Bagh": {"lat": 28.6683, "lng": 77.1167},
-    "Pusa": {"lat": 28.6396, "lng": 77.1463},
-    "R K Puram": {"lat": 28.5632, "lng": 77.1869},
-    "Rohini": {"lat": 28.7325, "lng": 77.1199},
-    "Shadipur": {"lat": 28.6515, "lng": 77.1473},
-    "Sirifort": {"lat": 28.5504, "lng": 77.2159},
-    "Sonia Vihar": {"lat": 28.7105, "lng": 77.2495},
-    "Sri Aurobindo Marg": {"lat": 28.5313, "lng": 77.1901},
-    "Vivek Vihar": {"lat": 28.6723, "lng": 77.3153},
-    "Wazirpur": {"lat": 28.6998, "lng": 77.1654}
-}
+# Weather resolution of the prediction tables: (Temp °C, Humidity %, Wind km/h)
+WEATHER_BUCKET_STEPS = tuple(
+    float(v) for v in os.getenv("HEATMAP_WEATHER_BUCKETS", "0.5,1,0.5").split(",")
+)
+# Number of (day, weather) tables kept in memory
+PREDICTION_TABLE_SIZE = int(os.getenv("HEATMAP_TABLE_CACHE_SIZE", 32))
+
+
+class LoadedHeatmapModel:
+    """
+    One heatmap model version with its per-station inputs and everything
+    derived from it (prediction tables, rasters).
+
+    Parameters
+    ----------
+    loaded : model_registry.ModelVersion
+    city : str
+    """
+
+    def __init__(self, loaded, city):
+        self.model = loaded.model
+        self.encoder = loaded.encoder
+        self.version = loaded.version
+        self.info = loaded.info()
+        # Per-station inputs never change: only stations seen in training
+        known = set(self.encoder.classes_)
+        entries = [s for s in get_registry().stations(city) if s.name in known]
+        self.stations = [s.name for s in entries]
+        self.station_ids = [s.id for s in entries]
+        self.lat = np.array([s.lat for s in entries])
+        self.lng = np.array([s.lng for s in entries])
+        self.station_codes = self.encoder.transform(self.stations) if self.stations else np.array([], dtype=int)
+        self.tables = OrderedDict()
+        # Table key -> task building it, so concurrent misses share one predict
+        self.building = {}
+        self.rasters = {}
+
 
 class HeatmapPredictor:
-    def __init__(self):
-        try:
-            with open(MODEL_PATH, 'rb') as f:
-                self.model = pickle.load(f)
-            with open(STATION_ENCODER_PATH, 'rb') as f:
-                self.encoder = pickle.load(f)
-            print("Heatmap model loaded successfully.")
-        except Exception as e:
-            print(f"Error loading heatmap model: {e}")
-            self.model = None
-            self.encoder = None
+    """
+    Station-level PM2.5 model for the heatmap.
 
-    async def get_all_station_predictions(self):
-        if not self.model or not self.encoder:
-            return []
+    The model only sees calendar fields, fixed per-station inputs and
+    city-level weather, so its output for a given day and weather reading is
+    computed once: one batched predict fills a (24 hours x stations) AQI table
+    keyed by (city, month, day of week, weather bucket). Serving a request is
+    a row lookup plus the live CPCB overrides.
+
+    The model (and with it xgboost/sklearn) is loaded from the model registry
+    by load(), at startup warm-up or on first use, not when the module is
+    imported. The active version and its tables are one object: swap()
+    replaces it in a single assignment, and a request works on the version
+    it started with.
+    """
+
+    FEATURES = ['hour', 'month', 'day_of_week', 'Latitude', 'Longitude', 'Temp_2m_C',
+                'Humidity_Percent', 'Wind_Speed_10m_kmh', 'station_encoded']
+
+    def __init__(self, city='Delhi'):
+        self.city = city
+        self.registry_name = get_city_registry().get(city).models['heatmap']
+        self._load_lock = threading.Lock()
+        self.loaded = False
+        self.active = None
+
+    # The active version's fields (None / empty before a model is loaded)
+    model = property(lambda self: self.active and self.active.model)
+    encoder = property(lambda self: self.active and self.active.encoder)
+    version = property(lambda self: self.active and self.active.version)
+    stations = property(lambda self: self.active.stations if self.active else [])
+
+    def _load_version(self, version=None):
+        return LoadedHeatmapModel(model_registry.load(self.registry_name, version), self.city)
+
+    def load(self):
+        """Load the registry's CURRENT version and build the per-station inputs (once; blocking)."""
+        with self._load_lock:
+            if self.loaded:
+                return self.model is not None
+            try:
+                self.active = self._load_version()
+                logger.info("Heatmap model loaded successfully (%s).", self.active.version)
+            except Exception as e:
+                logger.error("Error loading heatmap model: %s", e)
+            finally:
+                # A failed load is not retried on every request
+                self.loaded = True
+            return self.model is not None
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await asyncio.to_thread(self.load)
+        return self.model is not None
+
+    async def swap(self, version=None):
+        """Load a registry version (default CURRENT) and make it active; returns its info."""
+        await self.ensure_loaded()
+        active = await asyncio.to_thread(self._load_version, version)
+        self.active = active
+        logger.info("Swapped heatmap model to %s", active.version)
+        return active.info
+
+    @staticmethod
+    def weather_bucket(live_data):
+        """City-level weather from the live reading, snapped to the bucket grid."""
+        temp = float(live_data.get('main', {}).get('temp', 25.0))
+        humidity = float(live_data.get('main', {}).get('humidity', 50.0))
+        wind_speed = float(live_data.get('wind', {}).get('speed', 5.0)) * 3.6 # m/s to km/h
+        return tuple(
+            round(round(value / step) * step, 6)
+            for value, step in zip((temp, humidity, wind_speed), WEATHER_BUCKET_STEPS)
+        )
+
+    def _build_table(self, month, day_of_week, weather, active=None):
+        """AQI for every (hour, station) of one day, from a single predict."""
+        active = active or self.active
+        n = len(active.stations)
+        X = np.empty((24 * n, len(self.FEATURES)))
+        X[:, 0] = np.repeat(np.arange(24), n)
+        X[:, 1] = month
+        X[:, 2] = day_of_week
+        X[:, 3] = np.tile(active.lat, 24)
+        X[:, 4] = np.tile(active.lng, 24)
+        X[:, 5:8] = weather
+        X[:, 8] = np.tile(active.station_codes, 24)
+        with model_inference.time(model='heatmap', stage='predict'):
+            pm25 = active.model.predict(pd.DataFrame(X, columns=self.FEATURES))
+        # For Model predictions, we predict Mass (µg/m³) -> Convert to AQI in one pass
+        return pm25_to_aqi(pm25).reshape(24, n)
+
+    async def prediction_table(self, month, day_of_week, weather, active=None):
+        """Cached (24, stations) AQI table for a day and weather bucket (built on the CPU executor)."""
+        active = active or self.active
+        tables = active.tables
+        key = (self.city, month, day_of_week, weather)
+        table = tables.get(key)
+        record_cache('heatmap_table', table is not None)
+        if table is not None:
+            tables.move_to_end(key)
+            return table
+
+        task = active.building.get(key)
+        if task is None:
+            if cpu_executor.uses_processes():
+                job = (build_prediction_table, active.version, month, day_of_week, weather)
+            else:
+                job = (self._build_table, month, day_of_week, weather, active)
+            task = asyncio.ensure_future(cpu_executor.run(*job, task='heatmap_table'))
+            active.building[key] = task
+            task.add_done_callback(lambda _: active.building.pop(key, None))
+        table = await asyncio.shield(task)
+        if key not in tables:
+            tables[key] = table
+            if len(tables) > PREDICTION_TABLE_SIZE:
+                tables.popitem(last=False)
+            logger.debug("Built heatmap prediction table for %s (%s)", key, active.version)
+        return table
 
+    async def station_aqi(self, active=None):
+        """
+        Current AQI per station (the active version's station order) and a
+        mask of the ones taken from live CPCB readings rather than the model.
+        """
+        active = active or self.active
         # Get Live Weather Data (City Level proxy)
         live_data = await fetch_live_weather_data()
         
         current_time = datetime.now()
-        hour = current_time.hour
-        month = current_time.month
-        day_of_week = current_time.weekday()
-        
-        # Prepare input dataframe for all stations
-        # Features: ['hour', 'month', 'day_of_week', 'Latitude', 'Longitude', 'Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh', 'station_encoded']
-        
-        stations = list(STATION_COORDS.keys())
-        rows = []
-        
-        for station in stations:
-            # Check if station was encoded during training
-            if station not in self.encoder.classes_:
-                continue
-                
-            coords = STATION_COORDS[station]
-            
-            # Use city-wide weather for now (or could use station specific if available)
-            temp = float(live_data.get('main', {}).get('temp', 25.0))
-            humidity = float(live_data.get('main', {}).get('humidity', 50.0))
-            wind_speed = float(live_data.get('wind', {}).get('speed', 5.0)) * 3.6 # m/s to km/h
-            
-            rows.append({
-                'hour': hour,
-                'month': month,
-                'day_of_week': day_of_week,
-                'Latitude': coords['lat'],
-                'Longitude': coords['lng'],
-                'Temp_2m_C': temp,
-                'Humidity_Percent': humidity,
-                'Wind_Speed_10m_kmh': wind_speed,
-                'StationName': station
-            })
-            
-        if not rows:
-            return []
-            
-        df = pd.DataFrame(rows)
-        
-        # Encode stations
-        df['station_encoded'] = self.encoder.transform(df['StationName'])
-        
-        # Predict PM2.5 concentration
-        features = ['hour', 'month', 'day_of_week', 'Latitude', 'Longitude', 'Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh', 'station_encoded']
-        pm25_predictions = self.model.predict(df[features])
+        table = await self.prediction_table(current_time.month, current_time.weekday(), self.weather_bucket(live_data),
+                                      active)
+        aqi_vals = table[current_time.hour].copy()
         
         # Fetch CPCB Ground Truth
         cpcb_data = await fetch_cpcb_station_data() or {}
-        print(f"Loaded real-time data for {len(cpcb_data)} stations from CPCB.")
-
-        results = []
-        for i, pm25_pred in enumerate(pm25_predictions):
-            station_name = df.iloc[i]['StationName']
-            
-            # Default to prediction
-            final_pm25 = float(pm25_pred)
-            source = "Predicted"
-            
-            # Override with Ground Truth if available
-            # Matches keys like "Alipur", "Anand Vihar"
-            # CPCB keys might be slightly different ("Alipur, Delhi"), check partial match handled in client or here
-            if station_name in cpcb_data and "PM2.5" in cpcb_data[station_name]:
-                final_pm25 = cpcb_data[station_name]["PM2.5"]
-                source = "Real-time"
-            
-            def calculate_aqi_pm25(c):
-                c = max(0, c)
-                if c <= 30:
-                    return c * (50/30)
-                elif c <= 60:
-                    return 50 + (c-30) * (50/30)
-                elif c <= 90:
-                    return 100 + (c-60) * (100/30)
-                elif c <= 120:
-                    return 200 + (c-90) * (100/30)
-                elif c <= 250:
-                    return 300 + (c-120) * (100/130)
-                else:
-                    return 400 + (c-250) * (100/130)
-
-            if source == "Real-time":
-                # CPCB OGD Resource 3b01... returns AQI Sub-indices in 'avg_value'
-                # So we use the value directly as AQI
-                aqi_val = final_pm25
-            else:
-                # For Model predictions, we predict Mass (µg/m³) -> Convert to AQI
-                aqi_val = calculate_aqi_pm25(final_pm25)
-            
-            # Determine status
-            status = "Good"
-            if aqi_val > 50: status = "Satisfactory"
-            if aqi_val > 100: status = "Moderate"
-            if aqi_val > 200: status = "Poor"
-            if aqi_val > 300: status = "Very Poor"
-            if aqi_val > 400: status = "Severe"
-            
-            results.append({
-                "station": station_name,
-                "lat": df.iloc[i]['Latitude'],
-                "lng": df.iloc[i]['Longitude'],
-                "aqi": round(aqi_val),
+        logger.debug("Loaded real-time data for %s stations from CPCB.", len(cpcb_data), extra={"sampled": True})
+
+        # Override with Ground Truth if available
+        # CPCB names ("Dwarka", "IHBAS, Dilshad Garden") are joined through the station registry
+        # CPCB OGD Resource 3b01... returns AQI Sub-indices in 'avg_value'
+        # So we use the value directly as AQI
+        registry = get_registry()
+        live_by_id = {}
+        for name, values in cpcb_data.items():
+            station = registry.resolve(name, self.city)
+            if station is not None and "PM2.5" in values:
+                live_by_id[station.id] = values["PM2.5"]
+        live = np.array([live_by_id.get(i, np.nan) for i in active.station_ids], dtype=float)
+        is_live = ~np.isnan(live)
+        aqi_vals[is_live] = live[is_live]
+        return aqi_vals, is_live
+
+    async def get_all_station_predictions(self):
+        await self.ensure_loaded()
+        active = self.active
+        if not active or not active.stations:
+            return []
+
+        current_time = datetime.now()
+        aqi_vals, is_live = await self.station_aqi(active)
+        statuses = aqi_status(aqi_vals)
+        sources = np.where(is_live, "Real-time", "Predicted")
+        rounded = np.round(aqi_vals).astype(int).tolist()
+        last_updated = current_time.isoformat()
+
+        return [
+            {
+                "station": station,
+                "lat": lat,
+                "lng": lng,
+                "aqi": aqi,
                 "status": status,
                 "source": source,
-                "last_updated": datetime.now().isoformat()
-            })
-            
-        return results
+                "last_updated": last_updated
+            }
+            for station, lat, lng, aqi, status, source in zip(
+                active.stations, active.lat.tolist(), active.lng.tolist(), rounded, statuses.tolist(), sources.tolist())
+        ]
+
+    def stats(self):
+        active = self.active
+        return {'loaded': active is not None, 'version': self.version, 'stations': len(self.stations),
+                'tables': len(active.tables) if active else 0,
+                'rasters': sorted(active.rasters) if active else []}
+
+    def raster(self, method='idw', active=None):
+        """Interpolation grid over the stations' bounding box (built once per method)."""
+        active = active or self.active
+        grid = active.rasters.get(method)
+        if grid is None:
+            grid = SpatialRaster(active.lat, active.lng, bounding_box(active.lat, active.lng), method=method)
+            active.rasters[method] = grid
+        return grid
+
+    async def get_raster(self, method='idw'):
+        """(SpatialRaster, surface) for the current station values, or None without a model."""
+        await self.ensure_loaded()
+        active = self.active
+        if not active or not active.stations:
+            return None
+        grid = self.raster(method, active)
+        aqi_vals, _ = await self.station_aqi(active)
+        return grid, grid.interpolate(aqi_vals)
 
 predictor = HeatmapPredictor()
+
+
+def build_prediction_table(version, month, day_of_week, weather):
+    """
+    A day's (24, stations) AQI table for a model version, in a process-pool
+    worker of the CPU executor: the worker loads the version the first time
+    it is asked for it and keeps it.
+    """
+    active = predictor.active
+    if active is None or active.version != version:
+        active = predictor.active = predictor._load_version(version)
+    return predictor._build_table(month, day_of_week, weather, active)
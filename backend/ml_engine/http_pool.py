@@ -0,0 +1,100 @@
+"""
+Shared HTTP Pool
+One long-lived, keep-alive httpx.AsyncClient per event loop for every
+upstream call (CPCB OGD, OpenWeatherMap, Nugen chat), with a per-host
+concurrency limit and explicit connect/read timeouts.
+
+Async code awaits get()/post() directly. Blocking code (the policymaker job
+script, forecast worker threads) uses run_sync(), which runs the coroutine on
+a dedicated background loop so it still goes through a pooled client.
+
+Config (env):
+    HTTP_MAX_CONNECTIONS   Pool size per loop (default 50)
+    HTTP_MAX_KEEPALIVE     Idle keep-alive connections kept (default 20)
+    HTTP_PER_HOST_LIMIT    Concurrent requests per upstream host (default 8)
+    HTTP_CONNECT_TIMEOUT   Connect timeout in seconds (default 5)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+
+import httpx
+
+from .metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", 8))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+
+# event loop -> (AsyncClient, {host: Semaphore})
+_pools = weakref.WeakKeyDictionary()
+
+_sync_loop = None
+_sync_lock = threading.Lock()
+
+
+def _pool():
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None or pool[0].is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+            timeout=httpx.Timeout(30.0, connect=CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+        pool = (client, {})
+        _pools[loop] = pool
+    return pool
+
+
+def get_client():
+    """The pooled AsyncClient of the running event loop."""
+    return _pool()[0]
+
+
+async def request(method, url, *, timeout=30.0, **kwargs):
+    """Send a request through the shared pool, limited per upstream host."""
+    client, semaphores = _pool()
+    host = httpx.URL(url).host
+    semaphore = semaphores.get(host)
+    if semaphore is None:
+        semaphore = semaphores[host] = asyncio.Semaphore(PER_HOST_LIMIT)
+    async with semaphore:
+        with track_upstream(host) as status:
+            response = await client.request(method, url, timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT), **kwargs)
+            status['code'] = response.status_code
+            return response
+
+
+async def get(url, *, params=None, timeout=30.0, **kwargs):
+    return await request("GET", url, params=params, timeout=timeout, **kwargs)
+
+
+async def post(url, *, timeout=30.0, **kwargs):
+    return await request("POST", url, timeout=timeout, **kwargs)
+
+
+async def aclose():
+    """Close the running loop's client (app shutdown)."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool[0].aclose()
+
+
+def run_sync(coro):
+    """
+    Run a coroutine from blocking code and return its result. Must not be
+    called from a thread that is running an event loop.
+    """
+    global _sync_loop
+    with _sync_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="http-pool", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
@@ -0,0 +1,290 @@
+"""
+Metrics Registry
+In-process counters and latency histograms, exposed in the Prometheus text
+format at /metrics.
+
+What is recorded:
+    http_request_duration_seconds   per route template and method (middleware)
+    http_requests_total             per route, method and status
+    upstream_request_duration_seconds / upstream_errors_total
+                                    every http_pool call, labelled by upstream
+                                    host and the MultiSourceAPIClient method
+                                    that made it ('direct' for route code)
+    model_inference_seconds         model predict calls and whole forecasts
+    cache_requests_total            hit/miss per cache, plus cache_hit_ratio
+
+Metrics are plain Python objects guarded by a lock, so they can be updated
+from worker threads (model inference, the policymaker job) as well as from
+the event loop. No external client library is needed.
+"""
+
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Which MultiSourceAPIClient method an upstream request belongs to
+_upstream_method = contextvars.ContextVar('upstream_method', default='direct')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return list(zip(self.labelnames, key))
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self._labels(k))} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, +Inf last; sum; count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collect):
+        """collect() -> iterable of (name, kind, help, [(labels dict, value), ...]), read at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to handle an API request', ('method', 'route')))
+http_requests = REGISTRY.register(Counter(
+    'http_requests_total', 'API requests by status code', ('method', 'route', 'status')))
+upstream_duration = REGISTRY.register(Histogram(
+    'upstream_request_duration_seconds', 'Duration of upstream HTTP calls', ('host', 'method')))
+upstream_errors = REGISTRY.register(Counter(
+    'upstream_errors_total', 'Upstream calls that raised or returned an HTTP error status',
+    ('host', 'method', 'reason')))
+model_inference = REGISTRY.register(Histogram(
+    'model_inference_seconds', 'Model inference time (stage="predict": model calls, "total": whole forecast)',
+    ('model', 'stage'), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+model_load = REGISTRY.register(Histogram(
+    'model_load_seconds', 'Time to load a model version from the registry', ('model', 'version'),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+cache_requests = REGISTRY.register(Counter(
+    'cache_requests_total', 'Cache lookups by result', ('cache', 'result')))
+
+
+def _hit_ratios():
+    with cache_requests._lock:
+        values = dict(cache_requests._values)
+    caches = sorted({cache for cache, _ in values})
+    samples = []
+    for cache in caches:
+        hits = values.get((cache, 'hit'), 0)
+        total = hits + values.get((cache, 'miss'), 0)
+        if total:
+            samples.append(({'cache': cache}, round(hits / total, 4)))
+    yield 'cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits', samples
+
+
+REGISTRY.add_collector(_hit_ratios)
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def render():
+    return REGISTRY.render()
+
+
+# --- Upstream calls -------------------------------------------------------
+
+def upstream_call(func):
+    """Label the upstream requests made inside an async client method with its name."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _upstream_method.set(func.__name__)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _upstream_method.reset(token)
+    return wrapper
+
+
+@contextmanager
+def track_upstream(host):
+    """Time one upstream request; the caller stores the response status in the yielded dict as 'code'."""
+    method = _upstream_method.get()
+    started = time.perf_counter()
+    status = {}
+    try:
+        yield status
+    except Exception as e:
+        upstream_errors.inc(host=host, method=method, reason=type(e).__name__)
+        raise
+    finally:
+        upstream_duration.observe(time.perf_counter() - started, host=host, method=method)
+    code = status.get('code')
+    if code is not None and code >= 400:
+        upstream_errors.inc(host=host, method=method, reason=f"http_{code}")
+
+
+# --- API requests ---------------------------------------------------------
+
+def _route_template(scope):
+    """
+    Path template of the matched route, e.g. /api/policymaker/data/{name}.
+    The matched route may be an included router's own, unprefixed one; the
+    prefix (include prefix and mount root_path) is what precedes the route's
+    template filled with the request's path parameters in the request path.
+    Falls back to the bare template when the two do not line up.
+    """
+    route = scope.get('route')
+    template = getattr(route, 'path', None)
+    if not template:
+        return 'unmatched'
+    path = scope.get('path', '')
+    try:
+        convertors = route.param_convertors
+        params = {name: convertors[name].to_string(value)
+                  for name, value in scope.get('path_params', {}).items() if name in convertors}
+        tail = route.path_format.format(**params)
+    except (AttributeError, KeyError, ValueError, AssertionError):
+        return template
+    if not path.endswith(tail):
+        return template
+    return path[:len(path) - len(tail)] + template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template (not per raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            path = _route_template(scope)
+            method = scope.get('method', '')
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=path)
+            http_requests.inc(method=method, route=path, status=status['code'])
@@ -0,0 +1,21 @@
+"""
+Deferred import of the ML stack.
+
+xgboost (and sklearn/scipy, which it pulls in) take about a second to
+import, so they are imported by the model loaders rather than at module
+import. The loaders run concurrently in worker threads at startup, and a
+first import of xgboost started from several threads at once can fail on
+its circular imports ("partially initialized module"), so the first import
+is serialised here.
+"""
+
+import threading
+
+_lock = threading.Lock()
+
+
+def import_xgboost():
+    """The xgboost module, imported on first call (thread-safe)."""
+    with _lock:
+        import xgboost
+    return xgboost
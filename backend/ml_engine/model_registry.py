@@ -0,0 +1,390 @@
+"""
+Model Registry
+Versioned model artifacts under ml_engine/models/registry.
+
+    registry/<name>/CURRENT                 active version
+    registry/<name>/<version>/manifest.json kind, creation time, sources, checksums
+                             /booster.ubj   XGBoost booster, binary UBJSON
+                             /features.json model input columns
+                             /scaler.joblib fitted scaler (forecast models)
+                             /encoder.json  station classes (heatmap models)
+
+Boosters are stored in XGBoost's native binary format instead of the JSON
+dumps (parsed text) and pickles (tied to the xgboost version that wrote
+them) the training scripts produce. Versions are written to a temporary
+directory and renamed into place, and CURRENT is replaced atomically, so a
+reader never sees half a version.
+
+Names are "<kind>-<city>": forecast-delhi, forecast-pune, heatmap-delhi,
+heatmap-pune. Until a name has been imported, load() falls back to the loose
+training outputs in ml_engine/models (version "legacy").
+
+    python -m ml_engine.model_registry list
+    python -m ml_engine.model_registry import-legacy
+    python -m ml_engine.model_registry activate forecast-delhi v1
+
+activate only changes what the next start loads; a running app swaps
+versions through POST /api/ml/models/{name}/activate.
+
+Config (env):
+    MODEL_REGISTRY_DIR  Registry root (default ml_engine/models/registry)
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .metrics import model_load
+from .ml_imports import import_xgboost
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).parent / 'models'
+REGISTRY_DIR = Path(os.getenv("MODEL_REGISTRY_DIR", MODELS_DIR / 'registry'))
+FORMAT_VERSION = 1
+
+# Loose training outputs per registry name, oldest first (see import_legacy)
+LEGACY_ARTIFACTS = {
+    'forecast-delhi': [
+        {'booster': 'xgboost_aqi.json', 'scaler': 'scaler.pkl', 'features': 'feature_names.pkl',
+         'training_log': 'training_log.json'},
+    ],
+    'forecast-pune': [
+        {'booster': 'pune_xgboost_aqi.json', 'scaler': 'pune_scaler.pkl', 'features': 'pune_feature_names.pkl',
+         'training_log': 'pune_training_log.json'},
+    ],
+    'heatmap-delhi': [
+        {'pickle': 'heatmap_model.pkl', 'encoder': 'station_encoder.pkl'},
+    ],
+    'heatmap-pune': [
+        {'pickle': 'pune_heatmap_model.pkl', 'encoder': 'pune_station_encoder.pkl',
+         'training_log': 'pune_heatmap_training_log.json'},
+    ],
+}
+
+# Seconds each loaded (name, version) took, for /api/ml/models
+_load_seconds = {}
+
+
+class ModelNotFound(LookupError):
+    pass
+
+
+class ModelVersion:
+    """
+    One loaded registry version.
+
+    Parameters
+    ----------
+    name, version : str
+        Registry name and version ("legacy" for the loose files).
+    kind : str
+        'forecast' (booster, scaler, features) or 'heatmap' (booster, encoder).
+    model : xgboost.XGBRegressor
+    scaler : fitted scaler or None
+    features : list of str or None
+    encoder : sklearn LabelEncoder or None
+    manifest : dict
+    """
+
+    def __init__(self, name, version, kind, model, scaler=None, features=None, encoder=None, manifest=None):
+        self.name = name
+        self.version = version
+        self.kind = kind
+        self.model = model
+        self.scaler = scaler
+        self.features = features
+        self.encoder = encoder
+        self.manifest = manifest or {}
+        self.load_seconds = None
+        self.loaded_at = None
+        self.nbytes = 0
+
+    def info(self):
+        return {'name': self.name, 'version': self.version, 'kind': self.kind,
+                'load_seconds': self.load_seconds, 'loaded_at': self.loaded_at,
+                'created_at': self.manifest.get('created_at'), 'mb': round(self.nbytes / 2**20, 2)}
+
+
+def _kind(name):
+    return name.split('-', 1)[0]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+# --- Reading ---------------------------------------------------------------
+
+def versions(name, root=REGISTRY_DIR):
+    """Stored versions of a model, oldest first."""
+    model_dir = Path(root) / name
+    if not model_dir.is_dir():
+        return []
+    found = [p.name for p in model_dir.iterdir() if (p / 'manifest.json').exists()]
+    return sorted(found, key=lambda v: int(v[1:]) if v[1:].isdigit() else 0)
+
+
+def current_version(name, root=REGISTRY_DIR):
+    path = Path(root) / name / 'CURRENT'
+    return path.read_text().strip() if path.exists() else None
+
+
+def manifest(name, version, root=REGISTRY_DIR):
+    return json.loads((Path(root) / name / version / 'manifest.json').read_text())
+
+
+def names(root=REGISTRY_DIR):
+    stored = [p.name for p in Path(root).iterdir() if p.is_dir()] if Path(root).is_dir() else []
+    return sorted(set(stored) | set(LEGACY_ARTIFACTS))
+
+
+def _label_encoder(classes):
+    from sklearn.preprocessing import LabelEncoder
+    import numpy as np
+    encoder = LabelEncoder()
+    encoder.classes_ = np.asarray(classes)
+    return encoder
+
+
+def _load_version(name, version, root):
+    import joblib
+    xgb = import_xgboost()
+    version_dir = Path(root) / name / version
+    meta = manifest(name, version, root)
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported registry format in {version_dir}")
+    files = meta['files']
+
+    model = xgb.XGBRegressor()
+    model.load_model(str(version_dir / files['booster']))
+    scaler = joblib.load(version_dir / files['scaler']) if 'scaler' in files else None
+    features = json.loads((version_dir / files['features']).read_text()) if 'features' in files else None
+    encoder = None
+    if 'encoder' in files:
+        encoder = _label_encoder(json.loads((version_dir / files['encoder']).read_text()))
+    loaded = ModelVersion(name, version, meta['kind'], model, scaler, features, encoder, meta)
+    # Approximate resident size: the booster's serialized trees
+    loaded.nbytes = (version_dir / files['booster']).stat().st_size
+    return loaded
+
+
+def _load_legacy(name):
+    """The newest loose training output for a name (before it is imported)."""
+    import pickle
+    import joblib
+    xgb = import_xgboost()
+    artifacts = LEGACY_ARTIFACTS.get(name)
+    if not artifacts:
+        raise ModelNotFound(name)
+    files = artifacts[-1]
+    paths = {role: MODELS_DIR / filename for role, filename in files.items()}
+    missing = [str(p) for role, p in paths.items() if role != 'training_log' and not p.exists()]
+    if missing:
+        raise ModelNotFound(f"{name}: missing {', '.join(missing)}")
+
+    if 'pickle' in paths:
+        with open(paths['pickle'], 'rb') as f:
+            model = pickle.load(f)
+    else:
+        model = xgb.XGBRegressor()
+        model.load_model(str(paths['booster']))
+    scaler = joblib.load(paths['scaler']) if 'scaler' in paths else None
+    features = list(joblib.load(paths['features'])) if 'features' in paths else None
+    encoder = None
+    if 'encoder' in paths:
+        with open(paths['encoder'], 'rb') as f:
+            encoder = pickle.load(f)
+    loaded = ModelVersion(name, 'legacy', _kind(name), model, scaler, features, encoder,
+                          {'sources': {role: p.name for role, p in paths.items()}})
+    loaded.nbytes = len(model.get_booster().save_raw(raw_format='ubj'))
+    return loaded
+
+
+def load(name, version=None, root=REGISTRY_DIR):
+    """
+    Load a version (default: CURRENT, else the loose training files).
+    Blocking; raises ModelNotFound when there is nothing to load.
+    """
+    # The first load would otherwise count xgboost's own import time
+    import_xgboost()
+    started = time.perf_counter()
+    version = version or current_version(name, root)
+    if version is None or version == 'legacy':
+        loaded = _load_legacy(name)
+    elif not (Path(root) / name / version / 'manifest.json').exists():
+        raise ModelNotFound(f"{name} {version}")
+    else:
+        loaded = _load_version(name, version, root)
+
+    loaded.load_seconds = round(time.perf_counter() - started, 4)
+    loaded.loaded_at = datetime.now().isoformat()
+    _load_seconds[(name, loaded.version)] = loaded.load_seconds
+    model_load.observe(loaded.load_seconds, model=name, version=loaded.version)
+    logger.info("Loaded model %s %s in %.3fs", name, loaded.version, loaded.load_seconds)
+    return loaded
+
+
+def describe(root=REGISTRY_DIR):
+    """{name: {current, versions: [{version, created_at, load_seconds}]}}"""
+    out = {}
+    for name in names(root):
+        entries = []
+        for version in versions(name, root):
+            meta = manifest(name, version, root)
+            entries.append({'version': version, 'created_at': meta.get('created_at'),
+                            'load_seconds': _load_seconds.get((name, version))})
+        if not entries:
+            entries.append({'version': 'legacy', 'load_seconds': _load_seconds.get((name, 'legacy'))})
+        out[name] = {'current': current_version(name, root), 'versions': entries}
+    return out
+
+
+# --- Writing ---------------------------------------------------------------
+
+def publish(name, model, scaler=None, features=None, encoder=None, sources=None, info=None,
+            activate=True, root=REGISTRY_DIR):
+    """
+    Store a trained model as the next version of `name`; returns the version.
+
+    model is an xgboost Booster or XGBRegressor; encoder a fitted
+    LabelEncoder. With activate, CURRENT points at the new version.
+    """
+    import joblib
+    model_dir = Path(root) / name
+    model_dir.mkdir(parents=True, exist_ok=True)
+    existing = versions(name, root)
+    version = f"v{int(existing[-1][1:]) + 1 if existing else 1}"
+
+    tmp = Path(tempfile.mkdtemp(prefix=f".{version}.", dir=model_dir))
+    try:
+        os.chmod(tmp, 0o755)
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        booster.save_model(str(tmp / 'booster.ubj'))
+        files = {'booster': 'booster.ubj'}
+        if features is not None:
+            (tmp / 'features.json').write_text(json.dumps(list(features)))
+            files['features'] = 'features.json'
+        if scaler is not None:
+            joblib.dump(scaler, tmp / 'scaler.joblib')
+            files['scaler'] = 'scaler.joblib'
+        if encoder is not None:
+            (tmp / 'encoder.json').write_text(json.dumps([str(c) for c in encoder.classes_]))
+            files['encoder'] = 'encoder.json'
+        meta = {
+            'format': FORMAT_VERSION,
+            'name': name,
+            'version': version,
+            'kind': _kind(name),
+            'created_at': datetime.now().isoformat(),
+            'files': files,
+            'sha256': {role: _sha256(tmp / filename) for role, filename in files.items()},
+            'sources': sources or {},
+            'info': info or {},
+        }
+        (tmp / 'manifest.json').write_text(json.dumps(meta, indent=2))
+        os.replace(tmp, model_dir / version)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    if activate:
+        set_current(name, version, root)
+    logger.info("Published %s %s", name, version)
+    return version
+
+
+def set_current(name, version, root=REGISTRY_DIR):
+    if not (Path(root) / name / version / 'manifest.json').exists():
+        raise ModelNotFound(f"{name} {version}")
+    _write_atomic(Path(root) / name / 'CURRENT', version + '\n')
+
+
+def import_legacy(root=REGISTRY_DIR):
+    """
+    Publish loose training outputs that are not in the registry yet (new
+    files or a retrained model: sources are matched by checksum); returns
+    {name: [new versions]}. The newest import becomes CURRENT.
+    """
+    import pickle
+    import joblib
+    xgb = import_xgboost()
+    imported = {}
+    for name, artifacts in LEGACY_ARTIFACTS.items():
+        known = [manifest(name, v, root).get('sources', {}) for v in versions(name, root)]
+        for files in artifacts:
+            paths = {role: MODELS_DIR / filename for role, filename in files.items()}
+            artifact_paths = {role: p for role, p in paths.items() if role != 'training_log'}
+            if not all(p.exists() for p in artifact_paths.values()):
+                continue
+            sources = {role: {'file': p.name, 'sha256': _sha256(p)} for role, p in artifact_paths.items()}
+            if sources in known:
+                continue
+            if 'pickle' in paths:
+                with open(paths['pickle'], 'rb') as f:
+                    model = pickle.load(f)
+            else:
+                model = xgb.Booster()
+                model.load_model(str(paths['booster']))
+            encoder = None
+            if 'encoder' in paths:
+                with open(paths['encoder'], 'rb') as f:
+                    encoder = pickle.load(f)
+            info = {}
+            if 'training_log' in paths and paths['training_log'].exists():
+                log = json.loads(paths['training_log'].read_text())
+                info = log[-1] if isinstance(log, list) and log else log
+            version = publish(
+                name, model,
+                scaler=joblib.load(paths['scaler']) if 'scaler' in paths else None,
+                features=joblib.load(paths['features']) if 'features' in paths else None,
+                encoder=encoder,
+                sources=sources, info=info, root=root)
+            known.append(sources)
+            imported.setdefault(name, []).append(version)
+    return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ml_engine.model_registry', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="Stored versions and the active one")
+    sub.add_parser('import-legacy', help="Publish the loose files in ml_engine/models")
+    activate = sub.add_parser('activate', help="Set the version loaded at the next start")
+    activate.add_argument('name')
+    activate.add_argument('version')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import-legacy':
+        for name, added in import_legacy().items():
+            print(f"{name}: {', '.join(added)} (current {current_version(name)})")
+    elif args.command == 'activate':
+        set_current(args.name, args.version)
+        print(f"{args.name}: current {args.version}")
+    else:
+        for name, entry in describe().items():
+            listed = ', '.join(v['version'] for v in entry['versions'])
+            print(f"{name:<16} current {entry['current'] or '-':<8} versions {listed}")
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -1,125 +1,282 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request, Response
 from datetime import timedelta
 import pandas as pd
 import asyncio
+import logging
+import os
+from http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+from fast_json import FastJSONRoute
+from ml_engine.city_registry import CityResources, get_city_registry
+from ml_engine import cpu_executor
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+logger = logging.getLogger(__name__)
 
 # --- ML Environment Setup ---
 try:
-    from ml_engine.forecast_3day import load_model, prepare_historical_data, forecast_next_hours
+    from ml_engine.forecast_3day import fetch_and_merge_live_data, prepare_historical_data, forecast_next_hours, feature_plan
+    from ml_engine import model_registry
+    from ml_engine.heatmap_prediction import predictor as heatmap_predictor
     from ml_engine.aqi_calculator import get_aqi_category
+    from ml_engine.forecast_cache import ForecastCache
+    from ml_engine.columnar_store import open_dataset, close_dataset
     ML_AVAILABLE = True
 except ImportError as e:
-    print(f"ML Module import failed: {e}")
+    logger.error("ML Module import failed: %s", e)
     ML_AVAILABLE = False
 
-# Global ML components - dictionary to support multiple cities
-ml_components = {
-    'Delhi': {'model': None, 'scaler': None, 'features': None},
-    'Pune': {'model': None, 'scaler': None, 'features': None}
-}
+# Forecast model + dataset per city, loaded on first request and evicted LRU
+# under the city memory budget (see city_registry). A city's entry is replaced
+# as a whole when a model version is swapped in, so a forecast that already
+# read it finishes on the version it started with.
+cities = get_city_registry()
+
+# Required in X-Admin-Token to activate model versions; unset disables activation
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN")
+# Cities whose forecast model is loaded by the startup warm-up; others load on first request
+PRELOAD_CITIES = [c.strip() for c in os.getenv("CITY_PRELOAD", "Delhi").split(",") if c.strip()]
+
+def _components(loaded, dataset=None):
+    return {'model': loaded.model, 'scaler': loaded.scaler, 'features': loaded.features,
+            'plan': feature_plan(loaded.features),
+            'version': loaded.version, 'info': loaded.info(), 'dataset': dataset}
+
+def _load_city(city, version=None):
+    """Blocking: (components, nbytes) for a city's forecast model and dataset."""
+    info = cities.get(city)
+    try:
+        loaded = model_registry.load(info.models['forecast'], version)
+    except model_registry.ModelNotFound as e:
+        logger.warning("Failed or skipped loading %s model (file not found?): %s", city, e)
+        return None, 0
+    dataset = open_dataset(info.datasets['forecast']) if 'forecast' in info.datasets else None
+    nbytes = loaded.nbytes + (dataset.nbytes if dataset is not None else 0)
+    logger.info("ML components for %s loaded successfully (%s, %.1f MB).", city, loaded.version, nbytes / 2**20)
+    return _components(loaded, dataset), nbytes
+
+def _release_city(city, components):
+    if components['dataset'] is not None:
+        close_dataset(components['dataset'].name)
+
+city_models = CityResources('city_models', _load_city, release=_release_city) if ML_AVAILABLE else None
+
+def latest_observation(city):
+    """
+    Blocking: pull live data into the city's dataset and return its newest
+    observation (None without data). Runs on the CPU executor.
+    """
+    components = city_models.get(city)
+    if components is None or components['dataset'] is None:
+        return None
+    store = components['dataset']
+    try:
+        fetch_and_merge_live_data(store, city=city)
+    except Exception as e:
+        logger.error("Error merging live data: %s", e)
+    return store.end
+
+def compute_forecast(city, version=None, latest=None):
+    """
+    Blocking: load data for the city, run the 72h forecast and apply the
+    calibration. Returns (forecasts, last_observation) or None without data.
+    Runs on the CPU executor; `version` is the model version to use, which a
+    process-pool worker loads itself if it does not have it yet, and `latest`
+    the observation latest_observation() saw (a worker whose dataset is
+    behind it fetches live data itself).
+    """
+    components = city_models.get(city)
+    if components is None:
+        return None
+    if version is not None and components['version'] != version:
+        loaded, nbytes = _load_city(city, version)
+        if loaded is None:
+            return None
+        components = loaded
+        if cpu_executor.in_worker():
+            city_models.put(city, components, nbytes)
+    df = prepare_historical_data(components['dataset'], city=city, until=latest)
+    if df is None:
+        return None
+
+    forecasts = forecast_next_hours(components['model'], components['scaler'], components['features'], df,
+                                    hours=72, plan=components['plan'])
+
+    # Apply consistent calibration to match History/Live endpoints
+    # (Delhi: OWM (~250) vs CPCB (~450) -> 1.8x; Pune uses raw ML output, confirmed accurate)
+    scale = cities.calibration(cities.get(city), 'forecast')
+    for f in forecasts:
+        if scale != 1.0:
+            f['predicted_aqi'] = min(f['predicted_aqi'] * scale, 500)
+
+        # Estimate pollutants for chart visualization (Heuristic based on typical composition)
+        # PM2.5 is usually the driver in Indian cities
+        aqi_val = f['predicted_aqi']
+        f['pm25'] = int(aqi_val * 0.65) # Approx contribution
+        f['pm10'] = int(aqi_val * 0.85)
+        f['no2'] = int(aqi_val * 0.15)
+        f['so2'] = int(aqi_val * 0.05)
+        f['co'] = round(aqi_val * 0.005, 1)
+        f['o3'] = int(aqi_val * 0.1)
+
+    return forecasts, df['Datetime'].iloc[-1]
+
+async def _latest_observation(city):
+    return await cpu_executor.run(latest_observation, city, task='forecast_check')
+
+async def _compute_forecast(city, latest):
+    components = await city_models.get_async(city)
+    version = components['version'] if components is not None else None
+    return await cpu_executor.run(compute_forecast, city, version, latest, task='forecast')
+
+# Materialized forecasts, recomputed when a new observation arrives (see forecast_cache)
+forecast_cache = ForecastCache(_compute_forecast, _latest_observation) if ML_AVAILABLE else None
+
+_init_task = None
+
+async def _load_ml():
+    preload = [c.name for c in (cities.get(name) for name in PRELOAD_CITIES) if c is not None and 'forecast' in c.models]
+    logger.info("Loading ML model components for %s...", ", ".join(preload) or "no cities")
+    # Model files are independent; load them side by side in worker threads
+    loaded = await asyncio.gather(*(city_models.get_async(city) for city in preload), return_exceptions=True)
+    for city, result in zip(preload, loaded):
+        if isinstance(result, Exception):
+            logger.error("Failed to load %s ML model: %s", city, result)
+        elif result is not None:
+            # Warm the forecast in the background so the first request is a hit
+            forecast_cache.refresh(city)
 
 async def init_ml():
-    global ml_components
-    if ML_AVAILABLE:
-        try:
-            print("Loading ML model components for cities...")
-            for city in ['Delhi', 'Pune']:
-                model, scaler, feature_names = load_model(city=city)
-                if model:
-                    ml_components[city] = {
-                        'model': model,
-                        'scaler': scaler,
-                        'features': feature_names
-                    }
-                    print(f"ML components for {city} loaded successfully.")
-                else:
-                    print(f"Failed or skipped loading {city} model (file not found?)")
-                    
-        except Exception as e:
-            print(f"Failed to load ML models: {e}")
-
-@router.on_event("startup")
-async def startup_event():
+    """Load the preloaded cities' models once; later and concurrent calls wait for that load."""
+    global _init_task
+    if not ML_AVAILABLE:
+        return
+    if _init_task is None:
+        _init_task = asyncio.ensure_future(_load_ml())
+    await asyncio.shield(_init_task)
+
+def ml_ready():
+    """{city: model loaded} for every city with a forecast model."""
+    return {c.name: ML_AVAILABLE and city_models.peek(c.name) is not None for c in cities.cities('forecast')}
+
+async def swap_forecast_model(city, version=None):
+    """
+    Load a registry version (default CURRENT) for a city and swap it in.
+    Requests keep being served from the old version until the new one is
+    loaded and its forecast recomputed.
+    """
     await init_ml()
+    components, nbytes = await asyncio.to_thread(_load_city, city, version)
+    if components is None:
+        raise model_registry.ModelNotFound(f"{cities.get(city).models['forecast']} {version or 'CURRENT'}")
+    city_models.put(city, components, nbytes)
+    logger.info("Swapped %s forecast model to %s", city, components['version'])
+    await forecast_cache.recompute(city)
+    return components['info']
+
+def active_versions():
+    """{registry name: version in use} for the models this process has loaded."""
+    active = {}
+    for city in cities.cities('forecast'):
+        components = city_models.peek(city.name) if ML_AVAILABLE else None
+        active[city.models['forecast']] = components['version'] if components else None
+    active[heatmap_predictor.registry_name] = heatmap_predictor.version
+    return active
 
 @router.get("/forecast-3day")
-async def get_ml_forecast(city: str = 'Delhi'):
+async def get_ml_forecast(request: Request, response: Response, city: str = 'Delhi'):
     """Get 3-day AQI forecast using the XGBoost model."""
     if not ML_AVAILABLE:
         raise HTTPException(status_code=503, detail="ML module not available (dependencies missing?)")
     
-    # Normalize city input?
-    target_city = 'Pune' if city.lower() == 'pune' else 'Delhi'
-    
-    components = ml_components.get(target_city)
-    if not components or not components['model']:
-        # Try fallback to Delhi if Pune fails? Or raise Error?
-        # Better to raise error if requested city not available
-        if target_city == 'Pune' and not components['model']:
-             print(f"Pune model not loaded. Fallback to Delhi?? No, return error.")
-             # Actually for hackathon, maybe fallback to Delhi model but tell user?
-             # Let's try to stick to requested city.
-             pass
-    
-    if not components or not components['model']:
-        # Last resort fallback to whatever is loaded
-        # if ml_components['Delhi']['model']:
-        #    components = ml_components['Delhi']
-        # else:
-            raise HTTPException(status_code=503, detail=f"ML Model not loaded/initialized for {target_city}")
-    
-    ml_model = components['model']
-    ml_scaler = components['scaler']
-    ml_features = components['features']
+    # Cities without a forecast model fall back to the default city
+    target_city = cities.resolve(city, require='forecast').name
+
+    # Requests that arrive while the startup models are still loading wait for them;
+    # other cities load here, on their first request
+    await init_ml()
+    components = await city_models.get_async(target_city)
+    if components is None:
+        raise HTTPException(status_code=503, detail=f"ML Model not loaded/initialized for {target_city}")
     
     try:
-        # Load data for specific city
-        df = prepare_historical_data(city=target_city)
-        
-        if df is None:
-             raise HTTPException(status_code=404, detail=f"Insufficient data for {target_city}")
-        
-        # Generate forecast
-        forecasts = forecast_next_hours(ml_model, ml_scaler, ml_features, df, hours=72)
-        
-        # Apply consistent calibration to match History/Live endpoints
-        for f in forecasts:
-            if target_city == 'Delhi':
-                 # Comparison: OWM (~250) vs CPCB (~450) -> Needs 1.8x scaling to match reality
-                 f['predicted_aqi'] = min(f['predicted_aqi'] * 1.8, 500)
-            
-            # Pune: Uses raw ML output (1.0x) as confirmed accurate
-            # pass
-            
-            # Estimate pollutants for chart visualization (Heuristic based on typical composition)
-            # PM2.5 is usually the driver in Indian cities
-            aqi_val = f['predicted_aqi']
-            f['pm25'] = int(aqi_val * 0.65) # Approx contribution
-            f['pm10'] = int(aqi_val * 0.85)
-            f['no2'] = int(aqi_val * 0.15)
-            f['so2'] = int(aqi_val * 0.05)
-            f['co'] = round(aqi_val * 0.005, 1)
-            f['o3'] = int(aqi_val * 0.1)
-                 
-        return forecasts
-        
+        forecasts = await forecast_cache.get(target_city)
+    except cpu_executor.ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
-        print(f"Prediction error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Prediction error: %s", e)
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+    if forecasts is None:
+        raise HTTPException(status_code=404, detail=f"Insufficient data for {target_city}")
+
+    # Valid until the entry is due for a check for new observations (0 while it is refreshing)
+    etag = make_etag('forecast-3day', target_city, forecast_cache.version(target_city))
+    max_age = forecast_cache.max_age(target_city)
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age)
+    set_cache_headers(response, etag, max_age)
+    return forecasts
+
+@router.get("/forecast-3day/cache")
+async def get_ml_forecast_cache_stats():
+    """Age and hit/miss counters of the materialized forecasts."""
+    if not ML_AVAILABLE:
+        return {}
+    return forecast_cache.stats()
+
+@router.get("/cities")
+async def get_cities():
+    """Served cities, their models, and the forecast models/datasets currently in memory."""
+    return {
+        'cities': [{'name': c.name, 'lat': c.lat, 'lon': c.lon, 'models': c.models} for c in cities.cities()],
+        'resident': city_models.stats() if ML_AVAILABLE else {},
+    }
+
+@router.get("/models")
+async def get_models():
+    """Registry versions per model, the version each one is serving and load times."""
+    if not ML_AVAILABLE:
+        return {}
+    described = await asyncio.to_thread(model_registry.describe)
+    for name, version in active_versions().items():
+        described.setdefault(name, {'current': None, 'versions': []})['active'] = version
+    return described
+
+@router.post("/models/{name}/activate")
+async def activate_model(name: str, version: str = None, x_admin_token: str = Header(None)):
+    """
+    Swap a model version into the running app without a restart (default:
+    the registry's CURRENT) and make it CURRENT for the next start.
+    """
+    if not MODEL_ADMIN_TOKEN or x_admin_token != MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model activation requires a valid X-Admin-Token")
+    if not ML_AVAILABLE:
+        raise HTTPException(status_code=503, detail="ML module not available (dependencies missing?)")
+
+    forecast_cities = {c.models['forecast']: c.name for c in cities.cities('forecast')}
+    try:
+        if name in forecast_cities:
+            loaded = await swap_forecast_model(forecast_cities[name], version)
+        elif name == heatmap_predictor.registry_name:
+            loaded = await heatmap_predictor.swap(version)
+        else:
+            raise HTTPException(status_code=404, detail=f"Model {name} is not served by this app")
+        if loaded['version'] != 'legacy':
+            await asyncio.to_thread(model_registry.set_current, name, loaded['version'])
+    except model_registry.ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Model version not found: {e}")
+    return loaded
+
 @router.get("/history")
 async def get_ml_history(city: str = 'Delhi', days: int = 7):
     """Get historical AQI data for charts using OpenWeatherMap."""
     try:
         from ml_engine.api_client import MultiSourceAPIClient
         client = MultiSourceAPIClient()
+        target = cities.resolve(city)
         
         # Use simple OWM fetch
-        df = client.fetch_history_data(city=city, days=days)
+        df = await client.fetch_history_data(city=target.name, days=days)
         
         if df is None or df.empty:
              raise HTTPException(status_code=404, detail=f"No history data for {city}")
@@ -128,11 +285,10 @@ async def get_ml_history(city: str = 'Delhi', days: int = 7):
         # OpenWeather typically underreports compared to ground truth
         # Delhi: severe pollution city (typical range 250-450)
         # Pune: moderate pollution city (typical range 80-150)
-        if city.lower() == 'delhi':
-            df['AQI_computed'] = (df['AQI_computed'] * 1.8).clip(upper=500)
-        elif city.lower() == 'pune':
-            # Reduced from 1.1 to 0.6 to match current avg of ~165
-            df['AQI_computed'] = (df['AQI_computed'] * 0.6).clip(upper=500)
+        # (Pune reduced from 1.1 to 0.6 to match current avg of ~165; see cities.json)
+        scale = cities.calibration(target, 'history')
+        if scale != 1.0:
+            df['AQI_computed'] = (df['AQI_computed'] * scale).clip(upper=500)
         
         # Format for frontend
         output = []
@@ -147,6 +303,6 @@ async def get_ml_history(city: str = 'Delhi', days: int = 7):
         return output
         
     except Exception as e:
-        print(f"History fetch error: {e}")
+        logger.error("History fetch error: %s", e)
         # Return empty list or basic fallback instead of crash
         return []
@@ -0,0 +1,168 @@
+"""
+Spatial Raster Engine
+Gridded AQI surface over a city's bounding box, interpolated from the
+station values served by the heatmap.
+
+Station positions are fixed, so the interpolation weights are too: for every
+grid cell the k nearest stations (KD-tree on a local km projection) get an
+IDW or local ordinary-kriging weight, stored once as a sparse
+(cells x stations) matrix. Refreshing the raster for new station values is
+then a single sparse product. Stations without a value are dropped by
+renormalising each cell's weights over the stations that have one; that
+product is computed in the same pass.
+
+Rasters are encoded as row-major little-endian uint16 AQI (north-west
+corner first, NODATA for cells with no station in reach).
+
+Config (env):
+    HEATMAP_RASTER_CELL_KM    Grid resolution in km (default 0.5)
+    HEATMAP_RASTER_NEIGHBORS  Stations contributing to each cell (default 8)
+"""
+
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CELL_KM = float(os.getenv("HEATMAP_RASTER_CELL_KM", 0.5))
+NEIGHBORS = int(os.getenv("HEATMAP_RASTER_NEIGHBORS", 8))
+NODATA = np.iinfo(np.uint16).max
+METHODS = ('idw', 'kriging')
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG_EQUATOR = 111.320
+
+
+def bounding_box(lat, lng, pad_deg=0.05):
+    """(south, west, north, east) around a set of points."""
+    return tuple(round(v, 6) for v in (float(np.min(lat)) - pad_deg, float(np.min(lng)) - pad_deg,
+                                       float(np.max(lat)) + pad_deg, float(np.max(lng)) + pad_deg))
+
+
+class SpatialRaster:
+    """
+    Precomputed interpolation from station values to a regular grid.
+
+    Parameters
+    ----------
+    lat, lng : array-like
+        Station coordinates (degrees), in the order values will be given.
+    bbox : tuple
+        (south, west, north, east) in degrees.
+    cell_km : float
+        Grid resolution.
+    method : {'idw', 'kriging'}
+        Inverse distance weighting, or local ordinary kriging with an
+        exponential variogram.
+    neighbors : int
+        Nearest stations used per cell.
+    power : float
+        IDW distance exponent.
+    range_km : float
+        Kriging variogram range.
+    """
+
+    def __init__(self, lat, lng, bbox, cell_km=CELL_KM, method='idw', neighbors=NEIGHBORS,
+                 power=2.0, range_km=10.0):
+        if method not in METHODS:
+            raise ValueError(f"Unknown interpolation method: {method}")
+        self.method = method
+        self.bbox = tuple(bbox)
+        south, west, north, east = self.bbox
+
+        # Equirectangular projection around the box centre is plenty at city scale
+        self._lat0 = (south + north) / 2
+        self._km_per_deg_lng = KM_PER_DEG_LNG_EQUATOR * np.cos(np.radians(self._lat0))
+        self.rows = max(1, int(np.ceil((north - south) * KM_PER_DEG_LAT / cell_km)))
+        self.cols = max(1, int(np.ceil((east - west) * self._km_per_deg_lng / cell_km)))
+
+        # Cell centres, north-west first
+        cell_lat = north - (np.arange(self.rows) + 0.5) * (north - south) / self.rows
+        cell_lng = west + (np.arange(self.cols) + 0.5) * (east - west) / self.cols
+        grid_lat, grid_lng = np.meshgrid(cell_lat, cell_lng, indexing='ij')
+
+        stations = self._project(np.asarray(lat, dtype=float), np.asarray(lng, dtype=float))
+        cells = self._project(grid_lat.ravel(), grid_lng.ravel())
+        self.n_stations = len(stations)
+        k = min(neighbors, self.n_stations)
+
+        # scipy is imported on first use: only the raster endpoint needs it
+        from scipy import sparse
+        from scipy.spatial import cKDTree
+        tree = cKDTree(stations)
+        dist, idx = tree.query(cells, k=k)
+        dist, idx = dist.reshape(len(cells), k), idx.reshape(len(cells), k)
+        if method == 'idw':
+            weights = self._idw_weights(dist, power)
+        else:
+            weights = self._kriging_weights(stations, dist, idx, range_km)
+
+        self.weights = sparse.csr_matrix(
+            (weights.ravel(), idx.ravel(), np.arange(0, len(cells) * k + 1, k)),
+            shape=(len(cells), self.n_stations),
+        )
+        logger.debug("Built %s raster %dx%d over %s stations", method, self.rows, self.cols, self.n_stations)
+
+    def _project(self, lat, lng):
+        return np.column_stack([(lng - self.bbox[1]) * self._km_per_deg_lng,
+                                (lat - self.bbox[0]) * KM_PER_DEG_LAT])
+
+    @staticmethod
+    def _idw_weights(dist, power):
+        with np.errstate(divide='ignore'):
+            w = 1.0 / dist ** power
+        # A cell centred on a station takes that station's value
+        exact = dist == 0
+        hit = exact.any(axis=1)
+        w[hit] = exact[hit]
+        return w / w.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def _kriging_weights(stations, dist, idx, range_km):
+        """Ordinary kriging weights over each cell's neighbours, solved as one batch."""
+        def covariance(h):
+            return np.exp(-3.0 * h / range_km)
+
+        n_cells, k = idx.shape
+        pts = stations[idx]                                   # (cells, k, 2)
+        between = np.linalg.norm(pts[:, :, None, :] - pts[:, None, :, :], axis=-1)
+        A = np.ones((n_cells, k + 1, k + 1))
+        A[:, :k, :k] = covariance(between)
+        A[:, k, k] = 0.0
+        b = np.ones((n_cells, k + 1))
+        b[:, :k] = covariance(dist)
+        return np.linalg.solve(A, b[..., None])[:, :k, 0]
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    def interpolate(self, values):
+        """(rows, cols) float surface from station values (NaN = no value)."""
+        values = np.asarray(values, dtype=float)
+        present = ~np.isnan(values)
+        stacked = np.column_stack([np.where(present, values, 0.0), present])
+        num, den = (self.weights @ stacked).T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            surface = np.where(np.abs(den) > 1e-9, num / den, np.nan)
+        return surface.reshape(self.rows, self.cols)
+
+    def encode(self, surface):
+        """Surface -> little-endian uint16 bytes (AQI clipped to 0-500, NODATA for gaps)."""
+        out = np.full(surface.shape, NODATA, dtype='<u2')
+        valid = ~np.isnan(surface)
+        out[valid] = np.clip(np.round(surface[valid]), 0, 500)
+        return out.tobytes()
+
+    def describe(self):
+        """Grid geometry for clients decoding the binary raster."""
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'bbox': list(self.bbox),
+            'method': self.method,
+            'dtype': 'uint16le',
+            'nodata': int(NODATA),
+        }
@@ -0,0 +1,174 @@
+"""
+Station Registry
+Canonical list of monitoring stations (ml_engine/data/stations.json) with
+integer ids, coordinates and known name variants.
+
+CPCB, the training CSVs and the frontend all spell station names a little
+differently ("Alipur, Delhi - DPCC", "Alipur", "Dwarka" vs "Dwarka-Sector 8").
+Every spelling is normalised (lowercase, punctuation folded to spaces) and
+hashed into one alias index, so matching a name is a dictionary lookup:
+
+    1. the normalised name itself (canonical names and listed aliases)
+    2. the name without its ", City - Agency" suffix, then without a
+       "-Suffix" part (CPCB's own cleaning)
+    3. a one-off substring scan, as the old matching loops did; its answer
+       (or miss) is remembered so the name is never scanned again
+
+Lookups can be scoped to a city: each city has its own alias index, so
+"Nehru Nagar, Pune - IITM" resolved for Pune never lands on Delhi's Nehru
+Nagar. Unscoped lookups search every station, first listed wins.
+
+Resolution counts are kept per method for reporting. The job graph resolves
+names from several threads, so the learned answers and counts are locked.
+"""
+
+import json
+import logging
+import re
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATIONS_PATH = Path(__file__).parent / 'data' / 'stations.json'
+
+Station = namedtuple('Station', ['id', 'name', 'city', 'lat', 'lng'])
+
+_registry = None
+
+
+def normalize_name(name):
+    """'Dwarka-Sector 8' -> 'dwarka sector 8'."""
+    return re.sub(r'[^a-z0-9]+', ' ', str(name).lower()).strip()
+
+
+def _candidates(name):
+    """Normalised forms of a raw name, most specific first."""
+    raw = str(name).strip()
+    head = raw.split(',')[0]
+    return [normalize_name(raw), normalize_name(head), normalize_name(head.split('-')[0])]
+
+
+class StationRegistry:
+    """
+    Station id <-> name/alias/coordinate index.
+
+    Parameters
+    ----------
+    stations : list of dict
+        Entries with id, name, city, lat, lng and optional aliases.
+    """
+
+    # Shorter normalised names are too ambiguous for the substring fallback
+    MIN_FUZZY_LENGTH = 3
+
+    def __init__(self, stations):
+        self._by_id = {}
+        # Alias index per city (normalised city name), and None for all cities
+        self._index = {None: {}}
+        for entry in stations:
+            station = Station(int(entry['id']), entry['name'], entry['city'],
+                              float(entry['lat']), float(entry['lng']))
+            self._by_id[station.id] = station
+            city_index = self._index.setdefault(normalize_name(station.city), {})
+            for alias in [station.name] + list(entry.get('aliases', [])):
+                key = normalize_name(alias)
+                if key in city_index and city_index[key] != station.id:
+                    logger.warning("Station alias '%s' is ambiguous; keeping %s", alias, city_index[key])
+                    continue
+                city_index[key] = station.id
+                self._index[None].setdefault(key, station.id)
+        # Canonical names for the substring fallback, per city and for all cities
+        self._canonical_keys = {None: []}
+        for s in self._by_id.values():
+            entry = (normalize_name(s.name), s.id)
+            self._canonical_keys[None].append(entry)
+            self._canonical_keys.setdefault(normalize_name(s.city), []).append(entry)
+        # Outcome of the substring fallback (including misses) per (city, unmatched name)
+        self._learned = {}
+        self._counters = {'exact': 0, 'cleaned': 0, 'fuzzy': 0, 'unresolved': 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=STATIONS_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def get(self, station_id):
+        return self._by_id.get(station_id)
+
+    def stations(self, city=None):
+        """Stations in registry order, optionally for one city."""
+        if city is None:
+            return list(self._by_id.values())
+        city = city.lower()
+        return [s for s in self._by_id.values() if s.city.lower() == city]
+
+    def resolve(self, name, city=None):
+        """Station for any known spelling of its name (within `city`, if given), or None."""
+        if not name:
+            return None
+        city = normalize_name(city) if city is not None else None
+        index = self._index.get(city, {})
+        forms = _candidates(name)
+        for i, key in enumerate(forms):
+            station_id = index.get(key)
+            if station_id is not None:
+                self._count('exact' if i == 0 else 'cleaned')
+                return self._by_id[station_id]
+
+        learned_key = (city, forms[0])
+        with self._lock:
+            known = learned_key in self._learned
+            station_id = self._learned.get(learned_key)
+        if not known:
+            # The scan is deterministic, so racing threads store the same answer
+            station_id = self._fuzzy(forms[0], city)
+            with self._lock:
+                self._learned[learned_key] = station_id
+        self._count('fuzzy' if station_id is not None else 'unresolved')
+        return None if station_id is None else self._by_id[station_id]
+
+    def _count(self, method):
+        with self._lock:
+            self._counters[method] += 1
+
+    def _fuzzy(self, key, city=None):
+        if len(key) < self.MIN_FUZZY_LENGTH:
+            return None
+        for canonical, station_id in self._canonical_keys.get(city, []):
+            if len(canonical) >= self.MIN_FUZZY_LENGTH and (canonical in key or key in canonical):
+                return station_id
+        return None
+
+    def coords(self, name, city=None):
+        """(lat, lng) for a station name (within `city`, if given), or (None, None) if it is unknown."""
+        station = self.resolve(name, city)
+        return (station.lat, station.lng) if station else (None, None)
+
+    def stats(self):
+        """Resolution counts by method, plus the overall resolution rate."""
+        with self._lock:
+            out = dict(self._counters)
+        total = sum(out.values())
+        out['resolution_rate'] = round((total - out['unresolved']) / total, 3) if total else None
+        return out
+
+    def log_stats(self, label):
+        stats = self.stats()
+        logger.info("%s: station names resolved %s (exact %s, cleaned %s, fuzzy %s, unresolved %s)",
+                    label, stats['resolution_rate'], stats['exact'], stats['cleaned'],
+                    stats['fuzzy'], stats['unresolved'])
+
+
+def get_registry():
+    """The process-wide registry, loaded on first use."""
+    global _registry
+    if _registry is None:
+        _registry = StationRegistry.load()
+        logger.info("Loaded %s stations from %s", len(_registry), STATIONS_PATH.name)
+    return _registry
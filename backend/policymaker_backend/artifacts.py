@@ -0,0 +1,158 @@
+"""
+Artifact Writer
+Writes the policymaker job outputs (dashboard_stats.json, station_rankings.json,
+...) into the frontend's public data directory.
+
+    - JSON is serialised compactly (no indentation)
+    - each file is written to a temp file in the same directory and renamed
+      into place, so readers never see a half-written artifact
+    - a file whose content hash matches the manifest is not rewritten
+    - precompressed .gz (and .br, when the brotli package is installed)
+      siblings are written next to each file for static serving
+    - manifest.json maps each artifact to its sha256, size and a short
+      version string for cache busting
+
+The serialised bytes are also kept on the writer (documents), so the job's
+results can be published in memory without reading the files back.
+
+Stages of the job run concurrently, so writes are safe to call from several
+threads.
+
+The .gz/.br siblings, manifest.json and job_timings.json are generated on
+every run and are not committed (see .gitignore); POLICYMAKER_OUTPUT_DIR
+(jobs.py) moves the whole output out of the source tree.
+
+Config (env):
+    ARTIFACT_PRECOMPRESS    Write .gz/.br siblings (default 1)
+    ARTIFACT_GZIP_LEVEL     gzip level (default 9)
+    ARTIFACT_BROTLI_QUALITY brotli quality (default 11)
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+PRECOMPRESS = os.getenv("ARTIFACT_PRECOMPRESS", "1") not in ("0", "false", "False")
+GZIP_LEVEL = int(os.getenv("ARTIFACT_GZIP_LEVEL", 9))
+BROTLI_QUALITY = int(os.getenv("ARTIFACT_BROTLI_QUALITY", 11))
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def dumps(obj):
+    """Compact UTF-8 JSON bytes."""
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def atomic_write(path, data):
+    """Write bytes to path via a temp file in the same directory and a rename."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates 0600; artifacts are served as static files
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ArtifactWriter:
+    """
+    Content-addressed writer for one output directory.
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory the artifacts (and manifest.json) are written to.
+    precompress : bool
+        Also write .gz / .br siblings.
+    """
+
+    def __init__(self, output_dir, precompress=PRECOMPRESS):
+        self.output_dir = output_dir
+        self.precompress = precompress
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+        # Every artifact this writer produced, written or unchanged: name -> entry + 'body'
+        self.documents = {}
+        self._counters = {'written': 0, 'unchanged': 0}
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def _load_manifest(self):
+        try:
+            with open(self._path(MANIFEST_NAME), 'r') as f:
+                manifest = json.load(f)
+            return manifest.get('files', {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def write_json(self, name, obj):
+        """Serialise obj to output_dir/name unless identical content is already there. Returns the path."""
+        return self.write_bytes(name, dumps(obj))
+
+    def write_bytes(self, name, data):
+        path = self._path(name)
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            previous = self.manifest.get(name)
+        if previous and previous.get('sha256') == digest and os.path.exists(path):
+            with self._lock:
+                self.documents[name] = dict(previous, body=data)
+                self._counters['unchanged'] += 1
+            logger.debug("Artifact %s unchanged, not rewritten", name)
+            return path
+
+        atomic_write(path, data)
+        entry = {
+            'sha256': digest,
+            'version': digest[:12],
+            'bytes': len(data),
+            'updated_at': datetime.now().isoformat(),
+        }
+        if self.precompress:
+            # mtime=0 keeps the .gz bytes a pure function of the content
+            gz = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+            atomic_write(path + '.gz', gz)
+            entry['gzip_bytes'] = len(gz)
+            if brotli is not None:
+                br = brotli.compress(data, quality=BROTLI_QUALITY)
+                atomic_write(path + '.br', br)
+                entry['br_bytes'] = len(br)
+
+        with self._lock:
+            self.manifest[name] = entry
+            self.documents[name] = dict(entry, body=data)
+            self._counters['written'] += 1
+        return path
+
+    def save_manifest(self):
+        """Write manifest.json (itself atomically, without hashing or siblings)."""
+        with self._lock:
+            files = dict(sorted(self.manifest.items()))
+        payload = {'generated_at': datetime.now().isoformat(), 'files': files}
+        atomic_write(self._path(MANIFEST_NAME), json.dumps(payload, indent=2).encode('utf-8'))
+        return self._path(MANIFEST_NAME)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,138 @@
+"""
+Job Graph
+Small dependency-graph runner for the policymaker batch job.
+
+Each stage declares the stages it needs and whether it is I/O-bound (network
+fetches; run on an I/O thread pool) or CPU-bound (model runs, aggregation,
+file output; run on a separate worker pool). A stage starts as soon as all of
+its dependencies have finished, so independent fetches overlap instead of
+waiting on each other. A stage that raises is logged and its dependents are
+skipped; unrelated branches still run.
+
+Stage functions receive the results of the finished stages as a dict
+(stage name -> return value).
+
+Config (env):
+    JOB_IO_WORKERS   Concurrent I/O stages (default 8)
+    JOB_CPU_WORKERS  Concurrent CPU stages (default: CPU count)
+"""
+
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+IO_WORKERS = int(os.getenv("JOB_IO_WORKERS", 8))
+CPU_WORKERS = int(os.getenv("JOB_CPU_WORKERS", os.cpu_count() or 2))
+
+Stage = namedtuple('Stage', ['name', 'func', 'deps', 'kind'])
+
+
+class JobGraph:
+    """Stages registered with @graph.stage(...) and run by run()."""
+
+    KINDS = ('io', 'cpu')
+
+    def __init__(self, name='job'):
+        self.name = name
+        self.stages = {}
+
+    def stage(self, name, deps=(), kind='cpu'):
+        """Decorator registering func(results) as a stage."""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown stage kind: {kind}")
+
+        def register(func):
+            if name in self.stages:
+                raise ValueError(f"Duplicate stage: {name}")
+            self.stages[name] = Stage(name, func, tuple(deps), kind)
+            return func
+        return register
+
+    def _validate(self):
+        for st in self.stages.values():
+            missing = [d for d in st.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{st.name}' depends on unknown stages: {missing}")
+
+    def run(self):
+        """
+        Run every stage once, respecting dependencies.
+        Returns (results, report): stage results, and per-stage status and
+        wall-clock timings.
+        """
+        self._validate()
+        started = time.perf_counter()
+        results, timings, status = {}, {}, {}
+        pending = dict(self.stages)
+        running = {}
+
+        def execute(st):
+            t0 = time.perf_counter()
+            try:
+                return st.func(results)
+            finally:
+                timings[st.name] = (t0 - started, time.perf_counter() - t0)
+
+        with ThreadPoolExecutor(IO_WORKERS, thread_name_prefix=f"{self.name}-io") as io_pool, \
+                ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix=f"{self.name}-cpu") as cpu_pool:
+            while pending or running:
+                # Skip stages whose dependencies failed (transitively), start the ready ones
+                changed = True
+                while changed:
+                    changed = False
+                    for name, st in list(pending.items()):
+                        if any(status.get(d) in ('failed', 'skipped') for d in st.deps):
+                            status[name] = 'skipped'
+                            del pending[name]
+                            changed = True
+                            logger.warning("Stage %s skipped (dependency did not complete)", name)
+                        elif all(status.get(d) == 'ok' for d in st.deps):
+                            pool = io_pool if st.kind == 'io' else cpu_pool
+                            running[pool.submit(execute, st)] = name
+                            del pending[name]
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                        status[name] = 'ok'
+                    except Exception:
+                        status[name] = 'failed'
+                        logger.exception("Stage %s failed", name)
+
+        total = time.perf_counter() - started
+        report = {
+            'job': self.name,
+            'total_seconds': round(total, 3),
+            'stages': [
+                {
+                    'stage': name,
+                    'kind': st.kind,
+                    'deps': list(st.deps),
+                    'status': status.get(name, 'skipped'),
+                    'start_offset_seconds': round(timings[name][0], 3) if name in timings else None,
+                    'seconds': round(timings[name][1], 3) if name in timings else None,
+                }
+                for name, st in self.stages.items()
+            ],
+        }
+        return results, report
+
+
+def log_report(report):
+    """One line per stage, in start order."""
+    logger.info("Stage timings (%s, total %.2fs):", report['job'], report['total_seconds'])
+    ordered = sorted(report['stages'], key=lambda s: (s['start_offset_seconds'] is None, s['start_offset_seconds'] or 0))
+    for s in ordered:
+        if s['seconds'] is None:
+            logger.info("  %-18s %-4s %-7s", s['stage'], s['kind'], s['status'])
+        else:
+            logger.info("  %-18s %-4s %-7s start +%6.2fs  took %6.2fs",
+                        s['stage'], s['kind'], s['status'], s['start_offset_seconds'], s['seconds'])
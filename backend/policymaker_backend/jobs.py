@@ -11,7 +11,9 @@ Uses REAL CPCB API data when available.
 import sys
 import os
 import json
+import logging
 import random
+import threading
 from datetime import datetime, timedelta
 import numpy as np
 from dotenv import load_dotenv
@@ -22,6 +24,8 @@ from pathlib import Path
 env_path = Path(__file__).resolve().parent.parent.parent / '.env' # Go up from services/jobs/
 load_dotenv(dotenv_path=env_path)
 
+logger = logging.getLogger(__name__)
+
 # Import ML components
 # Add backend root to sys.path to access ml_engine
 backend_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
@@ -30,270 +34,134 @@ if backend_root not in sys.path:
 
 try:
     from backend.policymaker_backend.ml_engine.station_forecast import StationForecaster
-    from backend.policymaker_backend.ml_engine.api_client import MultiSourceAPIClient
+    from backend.policymaker_backend.ml_engine.api_client import MultiSourceAPIClient, OPENWEATHERMAP_BASE_URL
+    from backend.ml_engine import http_pool
     from backend.ml_engine.aqi_calculator import compute_aqi_for_dataframe, calculate_aqi_from_pollutants
+    from backend.ml_engine.aqi_kernels import pm25_to_aqi
+    from backend.ml_engine.station_registry import get_registry
+    from backend.policymaker_backend.job_graph import JobGraph, log_report
+    from backend.policymaker_backend.artifacts import ArtifactWriter
 except ImportError:
     # If running as script inside folder?
     try:
         from policymaker_backend.ml_engine.station_forecast import StationForecaster
-        from policymaker_backend.ml_engine.api_client import MultiSourceAPIClient
+        from policymaker_backend.ml_engine.api_client import MultiSourceAPIClient, OPENWEATHERMAP_BASE_URL
+        from ml_engine import http_pool
         from ml_engine.aqi_calculator import compute_aqi_for_dataframe, calculate_aqi_from_pollutants
+        from ml_engine.aqi_kernels import pm25_to_aqi
+        from ml_engine.station_registry import get_registry
+        from policymaker_backend.job_graph import JobGraph, log_report
+        from policymaker_backend.artifacts import ArtifactWriter
     except ImportError:
          # Fallback for relative sibling import if paths are messy
         sys.path.append(os.path.join(os.path.dirname(__file__), 'ml_engine'))
         from station_forecast import StationForecaster
-        from api_client import MultiSourceAPIClient
+        from api_client import MultiSourceAPIClient, OPENWEATHERMAP_BASE_URL
         # Shared one needs full path
+        from backend.ml_engine import http_pool
         from backend.ml_engine.aqi_calculator import compute_aqi_for_dataframe, calculate_aqi_from_pollutants
+        from backend.ml_engine.aqi_kernels import pm25_to_aqi
+        from backend.ml_engine.station_registry import get_registry
+        from job_graph import JobGraph, log_report
+        from artifacts import ArtifactWriter
+
+
+# Output directory: the frontend's public data (backend/policymaker_backend/ ->
+# ../../vayumitra-final/public/data); POLICYMAKER_OUTPUT_DIR points it elsewhere
+OUTPUT_DIR = os.getenv("POLICYMAKER_OUTPUT_DIR") or os.path.join(
+    os.path.dirname(__file__), '..', '..', 'vayumitra-final', 'public', 'data')
 
-def load_station_locations():
-    """Load station coordinates from JSON."""
-    # Updated path: backend/data/station_locations.json
-    # Resolving from backend/policymaker_backend/jobs.py
-    # backend_root is setup above.
-    path = os.path.join(backend_root, 'backend', 'data', 'station_locations.json')
-    if not os.path.exists(path):
-         # Try absolute path based on CWD if running from backend
-         path = os.path.abspath(os.path.join(os.getcwd(), 'data', 'station_locations.json'))
+# Model and station history are loaded once per process and reused across runs
+_forecaster = None
+_forecaster_lock = threading.Lock()
 
-    if os.path.exists(path):
-        with open(path, 'r') as f:
-            return json.load(f)
-    print(f"Warning: Station locations not found at {path}")
-    return None
 
+def get_forecaster():
+    """The shared StationForecaster, with its station data loaded if available."""
+    global _forecaster
+    with _forecaster_lock:
+        if _forecaster is None:
+            _forecaster = StationForecaster()
+        if _forecaster.station_data is None:
+            _forecaster.load_station_data()
+        return _forecaster
 
 
-def generate_policymaker_data():
+def forecaster_status():
+    """(model loaded, station data loaded) for the shared forecaster, without loading it."""
+    forecaster = _forecaster
+    if forecaster is None:
+        return False, False
+    return forecaster.model is not None, forecaster.station_data is not None
+
+
+def generate_policymaker_data(artifacts=None):
     """
     Main function to generate all policymaker backend data.
+
+    The job is a graph of stages (see job_graph): the CPCB, OWM history and
+    OWM weather fetches run concurrently with the station forecast, and each
+    output file is written as soon as its inputs are ready. Per-stage
+    timings are saved to job_timings.json.
+
+    artifacts: ArtifactWriter to write through (default: a new one on
+    OUTPUT_DIR); its documents hold this run's outputs afterwards.
     """
-    print("=" * 60)
-    print("POLICYMAKER BACKEND DATA GENERATION")
-    print("=" * 60)
-    
+    logger.info("=" * 60)
+    logger.info("POLICYMAKER BACKEND DATA GENERATION")
+    logger.info("=" * 60)
+
     # Output directory
-    # Output directory: backend/services/jobs/ -> ../../../vayumitra-final/public/data
-    output_dir = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'vayumitra-final', 'public', 'data')
+    output_dir = artifacts.output_dir if artifacts is not None else OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
-    
-    # Load station map early
-    station_map = load_station_locations() or {}
+    # Atomic, hash-skipped writes with .gz/.br siblings and a manifest
+    if artifacts is None:
+        artifacts = ArtifactWriter(output_dir)
+
+    # Canonical stations (ids, coordinates, name aliases)
+    registry = get_registry()
+    owm_key = os.getenv("OPENWEATHER_API_KEY")
+    if owm_key == "YOUR_API_KEY_HERE":
+        owm_key = None
+
+    graph = JobGraph('policymaker')
 
     # 1. FETCH LIVE DATA FROM CPCB API
-    print("\n[1/3] Fetching Live CPCB Data...")
-    api_key = os.getenv("CPCB_API_KEY")
-    live_stations_data = None
-    
-    if api_key and len(api_key) > 5:
+    @graph.stage('cpcb', kind='io')
+    def fetch_cpcb(results):
+        logger.info("[1/3] Fetching Live CPCB Data...")
+        api_key = os.getenv("CPCB_API_KEY")
+
+        if not (api_key and len(api_key) > 5):
+            logger.warning("[X] No CPCB API key found in .env")
+            return None
         try:
             client = MultiSourceAPIClient(cpcb_key=api_key)
-            live_stations_data = client.fetch_cpcb_current_stations(city="Delhi")
-            
+            live_stations_data = http_pool.run_sync(client.fetch_cpcb_current_stations(city="Delhi"))
+
             if live_stations_data and len(live_stations_data) > 0:
-                print(f"[OK] SUCCESS: Fetched live data from {len(live_stations_data)} stations")
-                print(f"  Sample stations: {list(live_stations_data.keys())[:5]}")
-            else:
-                print("[X] WARNING: CPCB API returned no data")
-                live_stations_data = None
-        except Exception as e:
-            print(f"[X] ERROR: CPCB API failed: {e}")
-            live_stations_data = None
-    else:
-        print("[X] WARNING: No CPCB API key found in .env")
-    
-    # 2. GENERATE DASHBOARD STATS
-    print("\n[2/3] Generating Dashboard Stats...")
-    dashboard_stats = {
-        "generated_at": datetime.now().isoformat(),
-        "live_aqi": 0,
-        "live_breakdown": {},
-        "weekly_trend": [],
-        "data_source": "simulation",  # Will be updated if real data used
-        "note": "Real-time AQI based on current CPCB readings. Values may be higher than 24-hour averaged AQI shown on other platforms."
-    }
-    
-    if live_stations_data:
-        # Calculate city-wide averages from REAL DATA
-        print("  Using REAL CPCB DATA for dashboard stats")
-        dashboard_stats["data_source"] = "cpcb_api"
-        
-        # Aggregate pollutants (CPCB uses 'OZONE' not 'O3')
-        poll_sums = {'PM2.5': 0, 'PM10': 0, 'NO2': 0, 'SO2': 0, 'CO': 0, 'O3': 0, 'OZONE': 0}
-        poll_counts = {'PM2.5': 0, 'PM10': 0, 'NO2': 0, 'SO2': 0, 'CO': 0, 'O3': 0, 'OZONE': 0}
-        
-        # Also create station rankings
-        station_rankings = []
-        
-        for station_name, pollutants in live_stations_data.items():
-            # Inject small noise/jitter to make data look "live" even if API is static
-            # +/ 2% variation
-            for p_key in pollutants:
-                 if pollutants[p_key] > 0 and isinstance(pollutants[p_key], (int, float)):
-                     noise = random.uniform(0.98, 1.02)
-                     pollutants[p_key] = pollutants[p_key] * noise
-
-            # Calculate AQI for this station
-            station_aqi = calculate_aqi_from_pollutants(pollutants)
-            
-            if station_aqi > 0:
-                station_rankings.append({
-                    "name": station_name,
-                    "aqi": station_aqi,
-                    "pm25": round(pollutants.get('PM2.5', 0), 1),
-                    "pm10": round(pollutants.get('PM10', 0), 1),
-                    "no2": round(pollutants.get('NO2', 0), 1),
-                    "so2": round(pollutants.get('SO2', 0), 1),
-                    "co": round(pollutants.get('CO', 0), 1),
-                    "o3": round(pollutants.get('O3', 0) or pollutants.get('OZONE', 0), 1),
-                    "lat": station_map.get(station_name, {}).get('lat'),
-                    "lng": station_map.get(station_name, {}).get('lng')
-                })
-                
-                # Try fuzzy match if exact match failed
-                if station_rankings[-1]['lat'] is None:
-                     for k, v in station_map.items():
-                         if k in station_name or station_name in k:
-                             station_rankings[-1]['lat'] = v['lat']
-                             station_rankings[-1]['lng'] = v['lng']
-                             break
-            
-            # Aggregate for city average
-            for p in poll_sums.keys():
-                if p in pollutants and pollutants[p] > 0:
-                    poll_sums[p] += pollutants[p]
-                    poll_counts[p] += 1
-        
-        # Sort stations by AQI (highest first)
-        station_rankings.sort(key=lambda x: x['aqi'], reverse=True)
-        
-        # Add simulated 1h change (since we don't have hourly persistence yet)
-        # In a real system, we would fetch station_rankings.json from disk first to compare
-        try:
-            old_rankings = []
-            if os.path.exists(os.path.join(output_dir, 'station_rankings.json')):
-                with open(os.path.join(output_dir, 'station_rankings.json'), 'r') as f:
-                    old_rankings = json.load(f)
-            
-            old_map = {s['name']: s['aqi'] for s in old_rankings}
-            
-            for station in station_rankings:
-                if station['name'] in old_map:
-                    # Calculate real change from last run
-                    station['change'] = station['aqi'] - old_map[station['name']]
-                    # Add sign
-                    val = station['change']
-                    station['change_str'] = f"+{val}" if val > 0 else f"{val}"
-                else:
-                    # Simulate small fluctuation if new or first run
-                    val = random.randint(-10, 15)
-                    station['change'] = val
-                    station['change_str'] = f"+{val}" if val > 0 else f"{val}"
-                    
+                logger.info("[OK] SUCCESS: Fetched live data from %s stations", len(live_stations_data))
+                logger.info("  Sample stations: %s", list(live_stations_data.keys())[:5])
+                return live_stations_data
+            logger.warning("[X] CPCB API returned no data")
         except Exception as e:
-            print(f"  Warning: Could not calc change from previous run: {e}")
-            for station in station_rankings:
-                val = random.randint(-5, 10)
-                station['change'] = val
-                station['change_str'] = f"+{val}" if val > 0 else f"{val}"
-
-        # Save top 40 stations
-        rankings_path = os.path.join(output_dir, 'station_rankings.json')
-        with open(rankings_path, 'w') as f:
-            json.dump(station_rankings[:40], f, indent=2)
-        print(f"  Saved {len(station_rankings[:40])} station rankings")
-        
-        # Calculate averages and merge OZONE into O3
-        breakdown = {}
-        for p in poll_sums.keys():
-            if poll_counts[p] > 0:
-                breakdown[p] = round(poll_sums[p] / poll_counts[p], 1)
-            else:
-                breakdown[p] = 0
-        
-        # Merge OZONE into O3 if O3 is 0
-        if breakdown.get('O3', 0) == 0 and breakdown.get('OZONE', 0) > 0:
-            breakdown['O3'] = breakdown['OZONE']
-        
-        # Remove OZONE key (we use O3 in frontend)
-        if 'OZONE' in breakdown:
-            del breakdown['OZONE']
-        
-        dashboard_stats['live_breakdown'] = breakdown
-        dashboard_stats['live_aqi'] = calculate_aqi_from_pollutants(breakdown)
-        
-        print(f"  Live AQI: {dashboard_stats['live_aqi']} (from {len(live_stations_data)} stations)")
-        
-    else:
-        # Fallback to historical CSV data with winter boost
-        print("  Using HISTORICAL DATA with winter adjustment (fallback)")
-        forecaster = StationForecaster()
-        if forecaster.station_data is None:
-            forecaster.load_station_data()
-        
-        df = forecaster.station_data
-        if df is not None and not df.empty:
-            # Use last week, boosted for winter
-            end_date_csv = df['Datetime'].max()
-            start_date_csv = end_date_csv - timedelta(days=6)
-            mask = (df['Datetime'] >= start_date_csv) & (df['Datetime'] <= end_date_csv)
-            daily_stats = df[mask].groupby(df['Datetime'].dt.date)['AQI_computed'].mean()
-            
-            days_list = list(daily_stats.items())
-            if len(days_list) > 0:
-                # Boost last day for "today"
-                raw_aqi = days_list[-1][1] if len(days_list) > 0 else 50
-                
-                # Apply Diurnal Cycle (Time of Day variation)
-                # AQI is typically higher 8am-10am and 8pm-11pm
-                # Lower during afternoon 2pm-5pm
-                current_hour = datetime.now().hour
-                hour_modifier = 1.0
-                
-                if 7 <= current_hour <= 10:  # Morning Peak
-                    hour_modifier = 1.2
-                elif 14 <= current_hour <= 17: # Afternoon dip
-                    hour_modifier = 0.8
-                elif 20 <= current_hour <= 23: # Evening Peak
-                    hour_modifier = 1.25
-                else:
-                    hour_modifier = 1.0
-                
-                # Add randomness (+/- 5%)
-                noise = random.uniform(0.95, 1.05)
-                
-                simulated_aqi = int(raw_aqi * 4 * hour_modifier * noise + 20)
-                
-                dashboard_stats['live_aqi'] = simulated_aqi
-                dashboard_stats['live_breakdown'] = {
-                    "PM2.5": round(dashboard_stats['live_aqi'] * 0.6, 1),
-                    "PM10": round(dashboard_stats['live_aqi'] * 0.85, 1),
-                    "NO2": round(dashboard_stats['live_aqi'] * 0.15, 1),
-                    "SO2": round(random.uniform(10, 30), 1),
-                    "CO": round(random.uniform(1.0, 3.0), 1),
-                    "O3": round(random.uniform(20, 50), 1)
-                }
-                print(f"  Fallback AQI: {dashboard_stats['live_aqi']} (simulated with time-of-day {current_hour}h)")
-    
-    # Weekly Trend - Use OpenWeatherMap historical data for REAL 7-day trend
-    print("  Generating 7-day trend from OpenWeatherMap historical data...")
-    trend_data = []
-    
-    # Try to fetch from OpenWeatherMap
-    owm_key = os.getenv("OPENWEATHER_API_KEY")
-    
-    if owm_key and owm_key != "YOUR_API_KEY_HERE":
+            logger.error("[X] CPCB API failed: %s", e)
+        return None
+
+    # OpenWeatherMap historical data for the REAL 7-day trend
+    @graph.stage('owm_history', kind='io')
+    def fetch_owm_history(results):
+        if not owm_key:
+            return None
         try:
-            import requests
-            
             # Delhi coordinates
             lat, lon = 28.7041, 77.1025
-            
+
             # Get last 7 days
             end_time = int(datetime.now().timestamp())
             start_time = int((datetime.now() - timedelta(days=6)).timestamp())
-            
-            url = "http://api.openweathermap.org/data/2.5/air_pollution/history"
+
+            url = f"{OPENWEATHERMAP_BASE_URL}/data/2.5/air_pollution/history"
             params = {
                 'lat': lat,
                 'lon': lon,
@@ -301,113 +169,343 @@ def generate_policymaker_data():
                 'end': end_time,
                 'appid': owm_key
             }
-            
-            print(f"  Fetching historical data from OpenWeatherMap...")
-            response = requests.get(url, params=params, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                hourly_data = data.get('list', [])
-                
-                if len(hourly_data) > 0:
-                    print(f"  Received {len(hourly_data)} hourly data points")
-                    
-                    # Save granular history for Heatmap Matrix (Historical Mode)
-                    history_export = []
-                    for record in hourly_data:
-                        history_export.append({
-                            "time": datetime.fromtimestamp(record['dt']).isoformat(),
-                            "aqi": calculate_aqi_from_pollutants(
-                                {'PM2.5': record['components'].get('pm2_5', 0)}
-                            )
-                        })
-                    
-                    history_path = os.path.join(output_dir, 'city_history_168h.json')
-                    with open(history_path, 'w') as f:
-                        json.dump(history_export, f, indent=2)
-                    print(f"  Saved 168h history to: {history_path}")
-
-                    # Group by day and calculate daily averages
-                    daily_pm25 = {}
-                    for record in hourly_data:
-                        dt = datetime.fromtimestamp(record['dt'])
-                        date_key = dt.date()
-                        
-                        if date_key not in daily_pm25:
-                            daily_pm25[date_key] = []
-                        
-                        pm25 = record['components'].get('pm2_5', 0)
-                        daily_pm25[date_key].append(pm25)
-                    
-                    # Create trend for last 7 days
-                    today = datetime.now().date()
-                    for i in range(7):
-                        target_date = today - timedelta(days=(6-i))
-                        
-                        if target_date in daily_pm25:
-                            # Real data available
-                            avg_pm25 = sum(daily_pm25[target_date]) / len(daily_pm25[target_date])
-                            
-                            # Calculate AQI from PM2.5 using standard formula
-                            aqi = calculate_aqi_from_pollutants({'PM2.5': avg_pm25})
-                        else:
-                            # Fallback to current value if date missing
-                            aqi = dashboard_stats['live_aqi']
-                        
-                        trend_data.append({
-                            "date": target_date.strftime("%Y-%m-%d"),
-                            "day": target_date.strftime("%a"),
-                            "aqi": aqi
-                        })
-                    
-                    # Override today with CPCB live data
-                    trend_data[-1]['aqi'] = dashboard_stats['live_aqi']
-                    
-                    dashboard_stats['weekly_trend'] = trend_data
-                    dashboard_stats['trend_source'] = 'openweathermap_historical'
-                    print(f"  ✓ Built 7-day trend from OpenWeatherMap historical data")
-                    
-                    # Calculate and print 7-day average
-                    avg_7day = sum(d['aqi'] for d in trend_data) / len(trend_data)
-                    print(f"  7-day average AQI: {int(avg_7day)}")
-                else:
-                    raise Exception("No data returned from OWM API")
-                    
-            else:
+
+            logger.info("  Fetching historical data from OpenWeatherMap...")
+            response = http_pool.run_sync(http_pool.get(url, params=params, timeout=30))
+
+            if response.status_code != 200:
                 raise Exception(f"OWM API returned status {response.status_code}")
-                
+            hourly_data = response.json().get('list', [])
+            if len(hourly_data) == 0:
+                raise Exception("No data returned from OWM API")
+            logger.info("  Received %s hourly data points", len(hourly_data))
+            return hourly_data
         except Exception as e:
-            print(f"  [WARNING] OpenWeatherMap failed ({e}), using CPCB baseline")
-            owm_key = None  # Fall back to baseline method
-    
-    # Fallback: Generate realistic trend based on CPCB current value
-    if not owm_key or len(trend_data) == 0:
-        print("  Falling back to CPCB-baseline trend generation...")
+            logger.warning("  OpenWeatherMap failed (%s), using CPCB baseline", e)
+            return None
+
+    # 2.2 FETCH REAL CURRENT WEATHER (OpenWeatherMap)
+    @graph.stage('weather', kind='io')
+    def fetch_weather(results):
+        logger.info("[2.2] Fetching Real Weather Data...")
+        weather_real = {
+            "temperature": 30, # Fallback
+            "humidity": 50,
+            "windSpeed": 10,
+            "pressure": 1010,
+            "rainProbability": 0,
+            "confidence": 82 # Default
+        }
+
+        if owm_key:
+            try:
+                 # Fetch Current Weather
+                 w_url = f"{OPENWEATHERMAP_BASE_URL}/data/2.5/weather"
+                 w_params = {
+                     'lat': 28.7041,
+                     'lon': 77.1025,
+                     'appid': owm_key,
+                     'units': 'metric'
+                 }
+                 w_res = http_pool.run_sync(http_pool.get(w_url, params=w_params, timeout=10))
+                 if w_res.status_code == 200:
+                     w_data = w_res.json()
+                     weather_real = {
+                         "temperature": round(w_data['main']['temp']),
+                         "humidity": w_data['main']['humidity'],
+                         "windSpeed": round(w_data['wind']['speed'] * 3.6, 1), # m/s to km/h
+                         "pressure": w_data['main']['pressure'],
+                         "rainProbability": 0, # Current weather doesn't have prob, need forecast for that
+                         "description": w_data['weather'][0]['description'],
+                         "confidence": 92 # High confidence for real data
+                     }
+                     # Get rain prob from forecast if needed, or assume low if clear
+                     if 'rain' in w_data:
+                         weather_real['rainProbability'] = 90
+                     elif 'clouds' in w_data and w_data['clouds']['all'] > 80:
+                         weather_real['rainProbability'] = 40
+
+                     logger.info("  Fetched real weather: %s°C, %s%% Humidity", weather_real['temperature'], weather_real['humidity'])
+                 else:
+                     logger.error("  OWM Weather API failed: %s", w_res.status_code)
+                     weather_real['confidence'] = 75
+            except Exception as e:
+                 logger.error("  Error fetching weather: %s", e)
+                 weather_real['confidence'] = 70
+
+        # Add trends and impacts logic (heuristic based on values)
+        weather_real['trends'] = {
+            "temperature": "up" if weather_real['temperature'] < 35 else "down",
+            "humidity": "down" if weather_real['humidity'] > 60 else "up",
+            "windSpeed": "up" if weather_real['windSpeed'] < 10 else "neutral",
+            "pressure": "neutral",
+            "rain": "up" if weather_real['rainProbability'] > 20 else "neutral"
+        }
+
+        # Impact on Pollution
+        # High wind = better (dispersal), High temp = worse (ozone), Rain = better (washout)
+        weather_real['impacts'] = {
+            "temperature": "worsens" if weather_real['temperature'] > 30 else "neutral",
+            "humidity": "worsens" if weather_real['humidity'] > 70 else "improves", # High humidity traps PM
+            "windSpeed": "improves" if weather_real['windSpeed'] > 10 else "worsens", # Stagnant air bad
+            "pressure": "neutral",
+            "rain": "improves" if weather_real['rainProbability'] > 30 else "neutral"
+        }
+        return weather_real
+
+    # 2. GENERATE DASHBOARD STATS (live part) + STATION RANKINGS
+    @graph.stage('live_stats', deps=['cpcb'])
+    def build_live_stats(results):
+        logger.info("[2/3] Generating Dashboard Stats...")
+        live_stations_data = results['cpcb']
+        dashboard_stats = {
+            "generated_at": datetime.now().isoformat(),
+            "live_aqi": 0,
+            "live_breakdown": {},
+            "weekly_trend": [],
+            "data_source": "simulation",  # Will be updated if real data used
+            "note": "Real-time AQI based on current CPCB readings. Values may be higher than 24-hour averaged AQI shown on other platforms."
+        }
+        station_rankings = []
+
+        if live_stations_data:
+            # Calculate city-wide averages from REAL DATA
+            logger.info("  Using REAL CPCB DATA for dashboard stats")
+            dashboard_stats["data_source"] = "cpcb_api"
+
+            # Aggregate pollutants (CPCB uses 'OZONE' not 'O3')
+            poll_sums = {'PM2.5': 0, 'PM10': 0, 'NO2': 0, 'SO2': 0, 'CO': 0, 'O3': 0, 'OZONE': 0}
+            poll_counts = {'PM2.5': 0, 'PM10': 0, 'NO2': 0, 'SO2': 0, 'CO': 0, 'O3': 0, 'OZONE': 0}
+
+            for station_name, pollutants in live_stations_data.items():
+                # Inject small noise/jitter to make data look "live" even if API is static
+                # +/ 2% variation
+                for p_key in pollutants:
+                     if pollutants[p_key] > 0 and isinstance(pollutants[p_key], (int, float)):
+                         noise = random.uniform(0.98, 1.02)
+                         pollutants[p_key] = pollutants[p_key] * noise
+
+                # Calculate AQI for this station
+                station_aqi = calculate_aqi_from_pollutants(pollutants)
+
+                if station_aqi > 0:
+                    lat, lng = registry.coords(station_name, 'Delhi')
+                    station_rankings.append({
+                        "name": station_name,
+                        "aqi": station_aqi,
+                        "pm25": round(pollutants.get('PM2.5', 0), 1),
+                        "pm10": round(pollutants.get('PM10', 0), 1),
+                        "no2": round(pollutants.get('NO2', 0), 1),
+                        "so2": round(pollutants.get('SO2', 0), 1),
+                        "co": round(pollutants.get('CO', 0), 1),
+                        "o3": round(pollutants.get('O3', 0) or pollutants.get('OZONE', 0), 1),
+                        "lat": lat,
+                        "lng": lng
+                    })
+
+                # Aggregate for city average
+                for p in poll_sums.keys():
+                    if p in pollutants and pollutants[p] > 0:
+                        poll_sums[p] += pollutants[p]
+                        poll_counts[p] += 1
+
+            # Sort stations by AQI (highest first)
+            station_rankings.sort(key=lambda x: x['aqi'], reverse=True)
+
+            # Add simulated 1h change (since we don't have hourly persistence yet)
+            # In a real system, we would fetch station_rankings.json from disk first to compare
+            try:
+                old_rankings = []
+                if os.path.exists(os.path.join(output_dir, 'station_rankings.json')):
+                    with open(os.path.join(output_dir, 'station_rankings.json'), 'r') as f:
+                        old_rankings = json.load(f)
+
+                old_map = {s['name']: s['aqi'] for s in old_rankings}
+
+                for station in station_rankings:
+                    if station['name'] in old_map:
+                        # Calculate real change from last run
+                        station['change'] = station['aqi'] - old_map[station['name']]
+                        # Add sign
+                        val = station['change']
+                        station['change_str'] = f"+{val}" if val > 0 else f"{val}"
+                    else:
+                        # Simulate small fluctuation if new or first run
+                        val = random.randint(-10, 15)
+                        station['change'] = val
+                        station['change_str'] = f"+{val}" if val > 0 else f"{val}"
+
+            except Exception as e:
+                logger.warning("  Could not calc change from previous run: %s", e)
+                for station in station_rankings:
+                    val = random.randint(-5, 10)
+                    station['change'] = val
+                    station['change_str'] = f"+{val}" if val > 0 else f"{val}"
+
+            # Save top 40 stations
+            artifacts.write_json('station_rankings.json', station_rankings[:40])
+            logger.info("  Saved %s station rankings", len(station_rankings[:40]))
+
+            # Calculate averages and merge OZONE into O3
+            breakdown = {}
+            for p in poll_sums.keys():
+                if poll_counts[p] > 0:
+                    breakdown[p] = round(poll_sums[p] / poll_counts[p], 1)
+                else:
+                    breakdown[p] = 0
+
+            # Merge OZONE into O3 if O3 is 0
+            if breakdown.get('O3', 0) == 0 and breakdown.get('OZONE', 0) > 0:
+                breakdown['O3'] = breakdown['OZONE']
+
+            # Remove OZONE key (we use O3 in frontend)
+            if 'OZONE' in breakdown:
+                del breakdown['OZONE']
+
+            dashboard_stats['live_breakdown'] = breakdown
+            dashboard_stats['live_aqi'] = calculate_aqi_from_pollutants(breakdown)
+
+            logger.info("  Live AQI: %s (from %s stations)", dashboard_stats['live_aqi'], len(live_stations_data))
+
+        else:
+            # Fallback to historical CSV data with winter boost
+            logger.warning("  Using HISTORICAL DATA with winter adjustment (fallback)")
+            forecaster = get_forecaster()
+
+            df = forecaster.station_data
+            if df is not None and not df.empty:
+                # Use last week, boosted for winter
+                end_date_csv = df['Datetime'].max()
+                start_date_csv = end_date_csv - timedelta(days=6)
+                mask = (df['Datetime'] >= start_date_csv) & (df['Datetime'] <= end_date_csv)
+                daily_stats = df[mask].groupby(df['Datetime'].dt.date)['AQI_computed'].mean()
+
+                days_list = list(daily_stats.items())
+                if len(days_list) > 0:
+                    # Boost last day for "today"
+                    raw_aqi = days_list[-1][1] if len(days_list) > 0 else 50
+
+                    # Apply Diurnal Cycle (Time of Day variation)
+                    # AQI is typically higher 8am-10am and 8pm-11pm
+                    # Lower during afternoon 2pm-5pm
+                    current_hour = datetime.now().hour
+                    hour_modifier = 1.0
+
+                    if 7 <= current_hour <= 10:  # Morning Peak
+                        hour_modifier = 1.2
+                    elif 14 <= current_hour <= 17: # Afternoon dip
+                        hour_modifier = 0.8
+                    elif 20 <= current_hour <= 23: # Evening Peak
+                        hour_modifier = 1.25
+                    else:
+                        hour_modifier = 1.0
+
+                    # Add randomness (+/- 5%)
+                    noise = random.uniform(0.95, 1.05)
+
+                    simulated_aqi = int(raw_aqi * 4 * hour_modifier * noise + 20)
+
+                    dashboard_stats['live_aqi'] = simulated_aqi
+                    dashboard_stats['live_breakdown'] = {
+                        "PM2.5": round(dashboard_stats['live_aqi'] * 0.6, 1),
+                        "PM10": round(dashboard_stats['live_aqi'] * 0.85, 1),
+                        "NO2": round(dashboard_stats['live_aqi'] * 0.15, 1),
+                        "SO2": round(random.uniform(10, 30), 1),
+                        "CO": round(random.uniform(1.0, 3.0), 1),
+                        "O3": round(random.uniform(20, 50), 1)
+                    }
+                    logger.warning("  Fallback AQI: %s (simulated with time-of-day %sh)", dashboard_stats['live_aqi'], current_hour)
+
+        return {'dashboard_stats': dashboard_stats, 'station_rankings': station_rankings}
+
+    # Weekly Trend (+ 168h history for the heatmap matrix)
+    @graph.stage('weekly_trend', deps=['live_stats', 'owm_history'])
+    def build_weekly_trend(results):
+        logger.info("  Generating 7-day trend from OpenWeatherMap historical data...")
+        live_aqi = results['live_stats']['dashboard_stats']['live_aqi']
+        hourly_data = results['owm_history']
+        trend_data = []
+
+        if hourly_data:
+            # Save granular history for Heatmap Matrix (Historical Mode)
+            history_pm25 = np.array([record['components'].get('pm2_5') or 0 for record in hourly_data], dtype=float)
+            history_aqi = pm25_to_aqi(history_pm25).astype(int)
+            history_export = [
+                {
+                    "time": datetime.fromtimestamp(record['dt']).isoformat(),
+                    "aqi": int(aqi)
+                }
+                for record, aqi in zip(hourly_data, history_aqi)
+            ]
+
+            history_path = artifacts.write_json('city_history_168h.json', history_export)
+            logger.info("  Saved 168h history to: %s", history_path)
+
+            # Group by day and calculate daily averages
+            daily_pm25 = {}
+            for record in hourly_data:
+                dt = datetime.fromtimestamp(record['dt'])
+                date_key = dt.date()
+
+                if date_key not in daily_pm25:
+                    daily_pm25[date_key] = []
+
+                pm25 = record['components'].get('pm2_5', 0)
+                daily_pm25[date_key].append(pm25)
+
+            # Create trend for last 7 days
+            today = datetime.now().date()
+            for i in range(7):
+                target_date = today - timedelta(days=(6-i))
+
+                if target_date in daily_pm25:
+                    # Real data available
+                    avg_pm25 = sum(daily_pm25[target_date]) / len(daily_pm25[target_date])
+
+                    # Calculate AQI from PM2.5 using standard formula
+                    aqi = calculate_aqi_from_pollutants({'PM2.5': avg_pm25})
+                else:
+                    # Fallback to current value if date missing
+                    aqi = live_aqi
+
+                trend_data.append({
+                    "date": target_date.strftime("%Y-%m-%d"),
+                    "day": target_date.strftime("%a"),
+                    "aqi": aqi
+                })
+
+            # Override today with CPCB live data
+            trend_data[-1]['aqi'] = live_aqi
+            logger.info("  ✓ Built 7-day trend from OpenWeatherMap historical data")
+
+            # Calculate and print 7-day average
+            avg_7day = sum(d['aqi'] for d in trend_data) / len(trend_data)
+            logger.info("  7-day average AQI: %s", int(avg_7day))
+            return {'weekly_trend': trend_data, 'trend_source': 'openweathermap_historical'}
+
+        # Fallback: Generate realistic trend based on CPCB current value
+        logger.info("  Falling back to CPCB-baseline trend generation...")
         sim_today = datetime.now().date()
-        today_aqi = dashboard_stats['live_aqi'] if dashboard_stats['live_aqi'] > 0 else 150
-        
+        today_aqi = live_aqi if live_aqi > 0 else 150
+
         daily_variations = [0.92, 0.88, 0.95, 1.08, 0.98, 0.94, 1.00]
-        
+
         for i in range(7):
             target_date = sim_today - timedelta(days=(6-i))
             variation = daily_variations[i]
             noise = random.uniform(-0.03, 0.03)
             day_aqi = int(today_aqi * (variation + noise))
             day_aqi = max(50, min(day_aqi, 500))
-            
+
             trend_data.append({
                 "date": target_date.strftime("%Y-%m-%d"),
                 "day": target_date.strftime("%a"),
                 "aqi": day_aqi
             })
-        
-        trend_data[-1]['aqi'] = today_aqi
-        dashboard_stats['weekly_trend'] = trend_data
+
         trend_data[-1]['aqi'] = today_aqi
-        dashboard_stats['weekly_trend'] = trend_data
-        dashboard_stats['trend_source'] = 'cpcb_baseline_simulation'
-        print(f"  Generated 7-day trend from CPCB baseline")
-        
+        logger.info("  Generated 7-day trend from CPCB baseline")
+
         # Also generate simulated history for matrix
         sim_history = []
         current_time = datetime.now()
@@ -420,107 +518,49 @@ def generate_policymaker_data():
             # Weekly trend influence
             day_idx = (168-i) // 24
             trend_mod = daily_variations[min(day_idx, 6)]
-            
+
             val = int(base * hour_mod * trend_mod * random.uniform(0.9, 1.1))
             sim_history.append({
                 "time": t.isoformat(),
                 "aqi": val
             })
-        
-        history_path = os.path.join(output_dir, 'city_history_168h.json')
-        with open(history_path, 'w') as f:
-            json.dump(sim_history, f, indent=2)
-        print(f"  Saved simulated 168h history (fallback)")
 
-    # 2.2 FETCH REAL CURRENT WEATHER (OpenWeatherMap)
-    print("\n[2.2] Fetching Real Weather Data...")
-    weather_real = {
-        "temperature": 30, # Fallback
-        "humidity": 50,
-        "windSpeed": 10,
-        "pressure": 1010,
-        "rainProbability": 0,
-        "confidence": 82 # Default
-    }
-    
-    if owm_key and owm_key != "YOUR_API_KEY_HERE":
-        try:
-             # Fetch Current Weather
-             w_url = "http://api.openweathermap.org/data/2.5/weather"
-             w_params = {
-                 'lat': 28.7041,
-                 'lon': 77.1025,
-                 'appid': owm_key,
-                 'units': 'metric'
-             }
-             w_res = requests.get(w_url, params=w_params, timeout=10)
-             if w_res.status_code == 200:
-                 w_data = w_res.json()
-                 weather_real = {
-                     "temperature": round(w_data['main']['temp']),
-                     "humidity": w_data['main']['humidity'],
-                     "windSpeed": round(w_data['wind']['speed'] * 3.6, 1), # m/s to km/h
-                     "pressure": w_data['main']['pressure'],
-                     "rainProbability": 0, # Current weather doesn't have prob, need forecast for that
-                     "description": w_data['weather'][0]['description'],
-                     "confidence": 92 # High confidence for real data
-                 }
-                 # Get rain prob from forecast if needed, or assume low if clear
-                 if 'rain' in w_data:
-                     weather_real['rainProbability'] = 90
-                 elif 'clouds' in w_data and w_data['clouds']['all'] > 80:
-                     weather_real['rainProbability'] = 40
-                 
-                 print(f"  Fetched real weather: {weather_real['temperature']}°C, {weather_real['humidity']}% Humidity")
-             else:
-                 print(f"  OWM Weather API failed: {w_res.status_code}")
-                 weather_real['confidence'] = 75
-        except Exception as e:
-             print(f"  Error fetching weather: {e}")
-             weather_real['confidence'] = 70
-    
-    # Add trends and impacts logic (heuristic based on values)
-    weather_real['trends'] = {
-        "temperature": "up" if weather_real['temperature'] < 35 else "down",
-        "humidity": "down" if weather_real['humidity'] > 60 else "up",
-        "windSpeed": "up" if weather_real['windSpeed'] < 10 else "neutral",
-        "pressure": "neutral",
-        "rain": "up" if weather_real['rainProbability'] > 20 else "neutral"
-    }
-    
-    # Impact on Pollution
-    # High wind = better (dispersal), High temp = worse (ozone), Rain = better (washout)
-    weather_real['impacts'] = {
-        "temperature": "worsens" if weather_real['temperature'] > 30 else "neutral",
-        "humidity": "worsens" if weather_real['humidity'] > 70 else "improves", # High humidity traps PM
-        "windSpeed": "improves" if weather_real['windSpeed'] > 10 else "worsens", # Stagnant air bad
-        "pressure": "neutral",
-        "rain": "improves" if weather_real['rainProbability'] > 30 else "neutral"
-    }
-    
-    dashboard_stats['weather_real'] = weather_real
-    
-    # Save dashboard stats
-    stats_path = os.path.join(output_dir, 'dashboard_stats.json')
-    with open(stats_path, 'w') as f:
-        json.dump(dashboard_stats, f, indent=2)
-    print(f"  Saved to: {stats_path}")
-    
+        artifacts.write_json('city_history_168h.json', sim_history)
+        logger.warning("  Saved simulated 168h history (fallback)")
+        return {'weekly_trend': trend_data, 'trend_source': 'cpcb_baseline_simulation'}
+
+    @graph.stage('dashboard', deps=['live_stats', 'weekly_trend', 'weather'])
+    def save_dashboard(results):
+        dashboard_stats = dict(results['live_stats']['dashboard_stats'])
+        dashboard_stats.update(results['weekly_trend'])
+        dashboard_stats['weather_real'] = results['weather']
+
+        # Save dashboard stats
+        stats_path = artifacts.write_json('dashboard_stats.json', dashboard_stats)
+        logger.info("  Saved to: %s", stats_path)
+        return dashboard_stats
+
     # 2.5 GENERATE 7-DAY STATION RANKINGS (Derived)
     # To support "This Week" filter without 40+ API calls, we estimate 7-day average per station
     # by scaling live values relative to the City's Real 7-Day Trend.
-    print("\n[2.5] Generating 7-Day Station Rankings (Estimated from Trend)...")
-    if 'weekly_trend' in dashboard_stats and len(dashboard_stats['weekly_trend']) > 0 and len(station_rankings) > 0:
+    @graph.stage('rankings_7d', deps=['dashboard', 'live_stats'])
+    def build_rankings_7d(results):
+        logger.info("[2.5] Generating 7-Day Station Rankings (Estimated from Trend)...")
+        dashboard_stats = results['dashboard']
+        station_rankings = results['live_stats']['station_rankings']
+        if not (len(dashboard_stats['weekly_trend']) > 0 and len(station_rankings) > 0):
+            logger.info("  Skipping 7d rankings (missing trend or station data)")
+            return None
         try:
             # Calculate City stats
             trend = dashboard_stats['weekly_trend']
             avg_7d = sum(d['aqi'] for d in trend) / len(trend)
             live_aqi = dashboard_stats['live_aqi'] if dashboard_stats['live_aqi'] > 0 else 1
-            
+
             # Ratio: How much cleaner/dirtier was the week compared to today?
             ratio = avg_7d / live_aqi
-            print(f"  City 7-Day Avg: {avg_7d:.1f}, Live: {live_aqi}, Ratio: {ratio:.2f}")
-            
+            logger.info("  City 7-Day Avg: %.1f, Live: %s, Ratio: %.2f", avg_7d, live_aqi, ratio)
+
             rankings_7d = []
             for station in station_rankings: # Iterate over live stations
                 # Apply ratio with some station-specific noise (variance)
@@ -528,11 +568,11 @@ def generate_policymaker_data():
                 # Noise factor: 0.85 to 1.15
                 variance = random.uniform(0.85, 1.15)
                 factor = ratio * variance
-                
+
                 # Create derived entry
                 new_aqi = int(station['aqi'] * factor)
                 new_aqi = max(50, min(new_aqi, 500)) # Clamp
-                
+
                 rankings_7d.append({
                     "name": station['name'],
                     "aqi": new_aqi,
@@ -547,251 +587,244 @@ def generate_policymaker_data():
                     "change": 0, # Avg change is less meaningful here
                     "change_str": "Avg"
                 })
-            
+
             # Sort by new AQI
             rankings_7d.sort(key=lambda x: x['aqi'], reverse=True)
-            
+
             # Save
-            r7_path = os.path.join(output_dir, 'station_rankings_7d.json')
-            with open(r7_path, 'w') as f:
-                json.dump(rankings_7d[:40], f, indent=2)
-            print(f"  Saved 7-day derived rankings to: {r7_path}")
-            
+            r7_path = artifacts.write_json('station_rankings_7d.json', rankings_7d[:40])
+            logger.info("  Saved 7-day derived rankings to: %s", r7_path)
+            return rankings_7d
+
         except Exception as e:
-            print(f"  Error generating 7d rankings: {e}")
-    else:
-        print("  Skipping 7d rankings (missing trend or station data)")
-    
+            logger.error("  Error generating 7d rankings: %s", e)
+            return None
+
     # 3. GENERATE HEATMAP (72h forecast)
-    print("\n[3/3] Generating 72-Hour Heatmap Forecast...")
-    print("  (This will take ~2-3 minutes for 72 hourly grids)")
-    
-    # Was loaded earlier
-    # station_map = load_station_locations()
-    if not station_map:
-        print("  ERROR: station_locations.json not found")
-        return
-    
-    forecaster = StationForecaster()
-    if forecaster.station_data is None:
-        if not forecaster.load_station_data():
-            print("  ERROR: Could not load forecast data")
-            return
-    
-    results = forecaster.generate_all_forecasts()
-    if not results:
-        print("  ERROR: No forecasts generated")
-        return
-    
-    forecast_map = {}
-    for res in results:
-        name = res['station']
-        matched_key = None
-        if name in station_map:
-            matched_key = name
-        else:
-            for k in station_map:
-                if k in name or name in k:
-                    matched_key = k
-                    break
-        if matched_key:
-            forecast_map[matched_key] = res['forecast']
-    
-    print(f"  Matched forecasts for {len(forecast_map)} stations")
-    
-    # Save station forecasts for frontend matrix
-    # Format: List of { name: StationName, forecast: [ {time, aqi}, ... ] }
-    # We'll use the station_rankings order to keep consistent "Top Hotspots" view
-    
-    # helper to find station forecast
-    final_forecasts = []
-    
-    # Use ranking order
-    for rank_item in station_rankings[:50]: # Top 50 or all
-        st_name = rank_item['name']
-        
-        # Try finding in forecast map
-        matched_fc = None
-        if st_name in forecast_map:
-            matched_fc = forecast_map[st_name]
-        else:
-            # Fuzzy check again just in case
-            for k, v in forecast_map.items():
-                if k in st_name or st_name in k:
-                    matched_fc = v
-                    break
-        
-        if matched_fc:
-            final_forecasts.append({
-                "name": st_name,
-                "forecast": matched_fc # Store full forecast (usually 72h)
-            })
-    
-    forecast_path = os.path.join(output_dir, 'station_forecasts.json')
-    with open(forecast_path, 'w') as f:
-        json.dump(final_forecasts, f, indent=2)
-    print(f"  Saved hourly forecasts to: {forecast_path}")
-    
-    # Calculate City Average Forecast (72 Hours)
-    # Aggregate all station forecasts to get one "Delhi" forecast line
-    print("  Calculating city-wide 72h average forecast...")
-    city_forecast = []
-    
-    if final_forecasts:
-        # Assuming all stations have aligned timestamps (they should from StationForecaster)
-        # We take the first station's timeline as reference
-        ref_forecast = final_forecasts[0]['forecast']
-        total_hours = len(ref_forecast) # Should be 72 if model configured right, but StationForecaster default might be 72
-        
-        # Determine max length available across most stations
-        # (StationForecaster usually returns 72h by default)
-        
-        for i in range(total_hours):
-            if i >= len(ref_forecast): break
-            
-            ref_time = ref_forecast[i]['time']
-            
-            # Aggregate all available numeric keys (AQI, PM2.5, etc.)
-            sums = {}
-            counts = {}
-            
-            for st in final_forecasts:
-                if i < len(st['forecast']):
-                    record = st['forecast'][i]
-                    for k, v in record.items():
-                        # numeric check
-                        if isinstance(v, (int, float)) and k != 'time':
-                            sums[k] = sums.get(k, 0) + v
-                            counts[k] = counts.get(k, 0) + 1
-            
-            # Average
-            if counts.get('aqi', 0) > 0:
-                avg_entry = { "time": ref_time }
-                for k, total in sums.items():
-                    if counts[k] > 0:
-                        avg_entry[k] = int(total / counts[k])
-                city_forecast.append(avg_entry)
-    
-    # Save city forecast
-    city_forecast_path = os.path.join(output_dir, 'city_forecast_72h.json')
-    with open(city_forecast_path, 'w') as f:
-        json.dump(city_forecast, f, indent=2)
-    print(f"  Saved 72h city forecast to: {city_forecast_path}")
-    
-    print(f"  Saved 72h city forecast to: {city_forecast_path}")
-    
+    # Independent of the fetches above: the forecaster reads the same shared CPCB snapshot
+    @graph.stage('forecast')
+    def run_forecast(results):
+        logger.info("[3/3] Generating 72-Hour Heatmap Forecast...")
+        logger.info("  (All stations are forecast together, one model call per hour)")
+
+        forecaster = get_forecaster()
+        if forecaster.station_data is None:
+            logger.error("  Could not load forecast data")
+            return None
+
+        forecasts = forecaster.generate_all_forecasts()
+        if not forecasts:
+            logger.error("  No forecasts generated")
+            return None
+        return forecasts
+
+    @graph.stage('station_forecasts', deps=['forecast', 'live_stats'])
+    def save_station_forecasts(results):
+        forecasts = results['forecast']
+        station_rankings = results['live_stats']['station_rankings']
+        if not forecasts:
+            return None
+        if not len(registry):
+            logger.error("  Station registry is empty")
+            return None
+
+        # Forecasts keyed by station id, so ranking names join in one lookup
+        forecast_map = {}
+        for res in forecasts:
+            station = registry.resolve(res['station'], 'Delhi')
+            if station is not None:
+                forecast_map[station.id] = res['forecast']
+
+        logger.info("  Matched forecasts for %s stations", len(forecast_map))
+
+        # Save station forecasts for frontend matrix
+        # Format: List of { name: StationName, forecast: [ {time, aqi}, ... ] }
+        # We'll use the station_rankings order to keep consistent "Top Hotspots" view
+
+        # helper to find station forecast
+        final_forecasts = []
+
+        # Use ranking order
+        for rank_item in station_rankings[:50]: # Top 50 or all
+            st_name = rank_item['name']
+
+            # Try finding in forecast map
+            station = registry.resolve(st_name, 'Delhi')
+            matched_fc = forecast_map.get(station.id) if station is not None else None
+
+            if matched_fc:
+                final_forecasts.append({
+                    "name": st_name,
+                    "forecast": matched_fc # Store full forecast (usually 72h)
+                })
+
+        registry.log_stats("  Station joins")
+
+        forecast_path = artifacts.write_json('station_forecasts.json', final_forecasts)
+        logger.info("  Saved hourly forecasts to: %s", forecast_path)
+
+        # Calculate City Average Forecast (72 Hours)
+        # Aggregate all station forecasts to get one "Delhi" forecast line
+        logger.info("  Calculating city-wide 72h average forecast...")
+        city_forecast = []
+
+        if final_forecasts:
+            # Assuming all stations have aligned timestamps (they should from StationForecaster)
+            # We take the first station's timeline as reference
+            ref_forecast = final_forecasts[0]['forecast']
+            total_hours = len(ref_forecast) # Should be 72 if model configured right, but StationForecaster default might be 72
+
+            # Determine max length available across most stations
+            # (StationForecaster usually returns 72h by default)
+
+            for i in range(total_hours):
+                if i >= len(ref_forecast): break
+
+                ref_time = ref_forecast[i]['time']
+
+                # Aggregate all available numeric keys (AQI, PM2.5, etc.)
+                sums = {}
+                counts = {}
+
+                for st in final_forecasts:
+                    if i < len(st['forecast']):
+                        record = st['forecast'][i]
+                        for k, v in record.items():
+                            # numeric check
+                            if isinstance(v, (int, float)) and k != 'time':
+                                sums[k] = sums.get(k, 0) + v
+                                counts[k] = counts.get(k, 0) + 1
+
+                # Average
+                if counts.get('aqi', 0) > 0:
+                    avg_entry = { "time": ref_time }
+                    for k, total in sums.items():
+                        if counts[k] > 0:
+                            avg_entry[k] = int(total / counts[k])
+                    city_forecast.append(avg_entry)
+
+        # Save city forecast
+        city_forecast_path = artifacts.write_json('city_forecast_72h.json', city_forecast)
+        logger.info("  Saved 72h city forecast to: %s", city_forecast_path)
+        return final_forecasts
+
     # 4. GENERATE SOURCE ATTRIBUTION (Heuristic Model based on Real Pollutants)
-    print("\n[4/4] Generating Source Attribution Model...")
-    
-    # Get live breakdown from stats
-    breakdown = dashboard_stats.get('live_breakdown', {})
-    pm25 = breakdown.get('PM2.5', 0)
-    pm10 = breakdown.get('PM10', 0)
-    no2 = breakdown.get('NO2', 0)
-    so2 = breakdown.get('SO2', 0)
-    co = breakdown.get('CO', 0)
-    
-    # Heuristic Scoring
-    # Vehicular: High NO2, CO
-    score_vehicular = (no2 * 1.5) + (co * 20) 
-    
-    # Industrial: High SO2, part of PM2.5
-    score_industrial = (so2 * 5) + (pm25 * 0.3)
-    
-    # Construction/Dust: Coarse fraction (PM10 - PM2.5)
-    coarse_pm = max(0, pm10 - pm25)
-    score_construction = coarse_pm * 1.2
-    
-    # Biomass Burning: PM2.5 dominant, some CO
-    score_burning = (pm25 * 0.6) + (co * 10)
-    
-    # Other/Secondary: Baseline
-    score_other = 50 # Baseline constant
-    
-    total_score = score_vehicular + score_industrial + score_construction + score_burning + score_other
-    if total_score == 0: total_score = 1 # Avoid div by zero
-    
-    # Normalize to %
-    sources = [
-        { "source": 'Industrial', "percentage": int((score_industrial / total_score) * 100), "icon": '🏭', "color": '#ef4444' },
-        { "source": 'Vehicular', "percentage": int((score_vehicular / total_score) * 100), "icon": '🚗', "color": '#f59e0b' },
-        { "source": 'Construction', "percentage": int((score_construction / total_score) * 100), "icon": '🏗️', "color": '#f97316' },
-        { "source": 'Burning', "percentage": int((score_burning / total_score) * 100), "icon": '🔥', "color": '#dc2626' },
-        { "source": 'Other', "percentage": int((score_other / total_score) * 100), "icon": '🌾', "color": '#94a3b8' }
-    ]
-    
-    # Adjust rounding error to ensure 100%
-    curr_sum = sum(s['percentage'] for s in sources)
-    diff = 100 - curr_sum
-    # Add diff to largest sector
-    sources.sort(key=lambda x: x['percentage'], reverse=True)
-    sources[0]['percentage'] += diff
-    
-    # Re-sort specific order if needed, or keep sorted by percentage? 
-    # Frontend layout expects specific order? No, usually sorted by magnitude is better or fixed.
-    # Let's keep fixed order for consistent UI colors if frontend maps by index, but frontend maps by name.
-    # We will sort by percentage for "Top Sources" feel
-    
-    source_path = os.path.join(output_dir, 'source_attribution.json')
-    with open(source_path, 'w') as f:
-        json.dump(sources, f, indent=2)
-    print(f"  Saved source attribution derived from live pollutants to: {source_path}")
+    @graph.stage('attribution', deps=['live_stats'])
+    def build_attribution(results):
+        logger.info("[4/4] Generating Source Attribution Model...")
+
+        # Get live breakdown from stats
+        breakdown = results['live_stats']['dashboard_stats'].get('live_breakdown', {})
+        pm25 = breakdown.get('PM2.5', 0)
+        pm10 = breakdown.get('PM10', 0)
+        no2 = breakdown.get('NO2', 0)
+        so2 = breakdown.get('SO2', 0)
+        co = breakdown.get('CO', 0)
+
+        # Heuristic Scoring
+        # Vehicular: High NO2, CO
+        score_vehicular = (no2 * 1.5) + (co * 20)
+
+        # Industrial: High SO2, part of PM2.5
+        score_industrial = (so2 * 5) + (pm25 * 0.3)
+
+        # Construction/Dust: Coarse fraction (PM10 - PM2.5)
+        coarse_pm = max(0, pm10 - pm25)
+        score_construction = coarse_pm * 1.2
+
+        # Biomass Burning: PM2.5 dominant, some CO
+        score_burning = (pm25 * 0.6) + (co * 10)
+
+        # Other/Secondary: Baseline
+        score_other = 50 # Baseline constant
+
+        total_score = score_vehicular + score_industrial + score_construction + score_burning + score_other
+        if total_score == 0: total_score = 1 # Avoid div by zero
+
+        # Normalize to %
+        sources = [
+            { "source": 'Industrial', "percentage": int((score_industrial / total_score) * 100), "icon": '🏭', "color": '#ef4444' },
+            { "source": 'Vehicular', "percentage": int((score_vehicular / total_score) * 100), "icon": '🚗', "color": '#f59e0b' },
+            { "source": 'Construction', "percentage": int((score_construction / total_score) * 100), "icon": '🏗️', "color": '#f97316' },
+            { "source": 'Burning', "percentage": int((score_burning / total_score) * 100), "icon": '🔥', "color": '#dc2626' },
+            { "source": 'Other', "percentage": int((score_other / total_score) * 100), "icon": '🌾', "color": '#94a3b8' }
+        ]
+
+        # Adjust rounding error to ensure 100%
+        curr_sum = sum(s['percentage'] for s in sources)
+        diff = 100 - curr_sum
+        # Add diff to largest sector
+        sources.sort(key=lambda x: x['percentage'], reverse=True)
+        sources[0]['percentage'] += diff
+
+        # Re-sort specific order if needed, or keep sorted by percentage?
+        # Frontend layout expects specific order? No, usually sorted by magnitude is better or fixed.
+        # Let's keep fixed order for consistent UI colors if frontend maps by index, but frontend maps by name.
+        # We will sort by percentage for "Top Sources" feel
+
+        source_path = artifacts.write_json('source_attribution.json', sources)
+        logger.info("  Saved source attribution derived from live pollutants to: %s", source_path)
+        return sources
 
     # 4.5 GENERATE 7-DAY SOURCE ATTRIBUTION (Derived from Trend/History)
     # We need a 'weekly' view. We'll use the 7-day history to estimate average composition.
-    print("\n[4.5] Generating 7-Day Source Attribution...")
-    try:
-        # Load the 168h history we just made, or use trend ratio
-        history_path = os.path.join(output_dir, 'city_history_168h.json')
-        if os.path.exists(history_path):
+    @graph.stage('attribution_7d', deps=['dashboard'])
+    def build_attribution_7d(results):
+        logger.info("[4.5] Generating 7-Day Source Attribution...")
+        dashboard_stats = results['dashboard']
+        try:
+            # Load the 168h history we just made, or use trend ratio
+            history_path = os.path.join(output_dir, 'city_history_168h.json')
+            if not os.path.exists(history_path):
+                return None
             with open(history_path, 'r') as f:
                 history = json.load(f)
-            
+
             # Simple avg of AQI is known, but we need components.
             # OWM history gave us components but we only saved AQI in 'city_history_168h.json' loops (oops, looking back at step 275, I only saved 'aqi').
-            # We should have saved components in step 275. 
+            # We should have saved components in step 275.
             # BUT, we can estimate based on ratio.
-            
+
             # Use Live Breakdown as baseline
             # Adjust based on simple heuristics about weekly cycles
             # e.g. Weekends have less traffic (Vehicular down), more recreational/domestic?
             # Or just randomize slightly to show "change".
-            
+
             # Since we want to show it *changing* as requested:
             # Let's assume weekly avg has slightly less traffic than peak hours of Today (if Today is a weekday).
             # We'll create a variation of the live scores.
-            
+
             # Copy live breakdown
             avg_breakdown = dashboard_stats.get('live_breakdown', {}).copy()
-            
+
             # Apply 7-day vs Live AQI ratio to all components to get "Average Concentrations"
             ratio = 1.0
             if dashboard_stats['live_aqi'] > 0 and 'weekly_trend' in dashboard_stats:
                  avg_7d = sum(d['aqi'] for d in dashboard_stats['weekly_trend']) / len(dashboard_stats['weekly_trend'])
                  ratio = avg_7d / dashboard_stats['live_aqi']
-            
+
             # Adjust specific sectors for weekly pattern
             # e.g. Vehicular might be lower on average (0.9 * ratio)
             # Construction might be constant (1.0 * ratio)
             # Industries constant (1.0 * ratio)
-            
+
             # Recalculate scores with these adjusted "Average" concentrations
             pm25_avg = avg_breakdown.get('PM2.5', 0) * ratio
             pm10_avg = avg_breakdown.get('PM10', 0) * ratio
             no2_avg = avg_breakdown.get('NO2', 0) * ratio * 0.95 # Slightly less traffic on avg
             so2_avg = avg_breakdown.get('SO2', 0) * ratio
             co_avg = avg_breakdown.get('CO', 0) * ratio
-            
-            score_vehicular = (no2_avg * 1.5) + (co_avg * 20) 
+
+            score_vehicular = (no2_avg * 1.5) + (co_avg * 20)
             score_industrial = (so2_avg * 5) + (pm25_avg * 0.3)
             coarse_pm = max(0, pm10_avg - pm25_avg)
             score_construction = coarse_pm * 1.2
             score_burning = (pm25_avg * 0.6) + (co_avg * 10)
             score_other = 50 # Baseline
-            
+
             total_score = score_vehicular + score_industrial + score_construction + score_burning + score_other
             if total_score == 0: total_score = 1
-            
+
             sources_7d = [
                 { "source": 'Industrial', "percentage": int((score_industrial / total_score) * 100), "icon": '🏭', "color": '#ef4444' },
                 { "source": 'Vehicular', "percentage": int((score_vehicular / total_score) * 100), "icon": '🚗', "color": '#f59e0b' },
@@ -799,28 +832,40 @@ def generate_policymaker_data():
                 { "source": 'Burning', "percentage": int((score_burning / total_score) * 100), "icon": '🔥', "color": '#dc2626' },
                 { "source": 'Other', "percentage": int((score_other / total_score) * 100), "icon": '🌾', "color": '#94a3b8' }
             ]
-            
+
             # Normalize
             curr_sum = sum(s['percentage'] for s in sources_7d)
             diff = 100 - curr_sum
             sources_7d.sort(key=lambda x: x['percentage'], reverse=True)
             sources_7d[0]['percentage'] += diff
-            
-            s7_path = os.path.join(output_dir, 'source_attribution_7d.json')
-            with open(s7_path, 'w') as f:
-                json.dump(sources_7d, f, indent=2)
-            print(f"  Saved 7-day source attribution to: {s7_path}")
-            
-    except Exception as e:
-        print(f"  Error generating 7d source attribution: {e}")
-
-    print("\n" + "=" * 60)
-    print("SUMMARY:")
-    print(f"  Data Source: {dashboard_stats['data_source']}")
-    print(f"  Live AQI: {dashboard_stats['live_aqi']}")
-    print(f"  Stations: {len(live_stations_data) if live_stations_data else 'N/A (using fallback)'}")
-    print(f"  Files Generated: dashboard_stats.json, station_rankings.json, station_forecasts.json, source_attribution.json")
-    print("=" * 60)
+
+            s7_path = artifacts.write_json('source_attribution_7d.json', sources_7d)
+            logger.info("  Saved 7-day source attribution to: %s", s7_path)
+            return sources_7d
+
+        except Exception as e:
+            logger.error("  Error generating 7d source attribution: %s", e)
+            return None
+
+    results, report = graph.run()
+    report['generated_at'] = datetime.now().isoformat()
+    artifacts.write_json('job_timings.json', report)
+    artifacts.save_manifest()
+    log_report(report)
+    written = artifacts.stats()
+    logger.info("Artifacts: %s written, %s unchanged", written['written'], written['unchanged'])
+
+    dashboard_stats = results.get('dashboard') or {}
+    live_stations_data = results.get('cpcb')
+    logger.info("=" * 60)
+    logger.info("SUMMARY:")
+    logger.info("  Data Source: %s", dashboard_stats.get('data_source'))
+    logger.info("  Live AQI: %s", dashboard_stats.get('live_aqi'))
+    logger.info("  Stations: %s", len(live_stations_data) if live_stations_data else 'N/A (using fallback)')
+    logger.info("  Files Generated: dashboard_stats.json, station_rankings.json, station_forecasts.json, source_attribution.json, job_timings.json, manifest.json")
+    logger.info("=" * 60)
+    return report
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     generate_policymaker_data()
@@ -1,367 +1,19 @@
 """
 Multi-Source API Client for AQI Data
-Supports OpenAQ (historical), OpenWeatherMap (real-time), and CPCB OGD (Government Data)
+The policymaker backend shares the async, pooled client in ml_engine.api_client;
+this module only re-exports it so existing imports keep working.
 """
-import requests
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from pathlib import Path
-import os
 
-async def fetch_live_weather_data():
-    """Helper to fetch just the latest weather parameters for model inference."""
-    # Instantiate client with keys from env (assuming loaded)
-    client = MultiSourceAPIClient(
-        openweathermap_key=os.getenv("OPENWEATHERMAP_API_KEY"),
-        openaq_key=os.getenv("OPENAQ_API_KEY"),
-        cpcb_key=os.getenv("CPCB_API_KEY")
+try:
+    from backend.ml_engine.api_client import (
+        MultiSourceAPIClient, fetch_live_weather_data, fetch_cpcb_station_data, OPENWEATHERMAP_BASE_URL
     )
-    
-    # Run synchronous fetch in this async wrapper (simpler than full async rewrite)
-    # Get 1 hour of data to get latest conditions
-    df = client.fetch_realtime_data(city='Delhi', hours=1)
-    
-    if df is not None and not df.empty:
-        latest = df.iloc[-1]
-        return {
-            'main': {
-                # Fallback to defaults if no weather source available
-                'temp': latest.get('Temp_2m_C', 25.0),
-                'humidity': latest.get('Humidity_Percent', 50.0)
-            },
-            'wind': {
-                'speed': latest.get('Wind_Speed_10m_kmh', 5.0) / 3.6 # Convert km/h to m/s
-            }
-        }
-    return {}
-
-async def fetch_cpcb_station_data():
-    """Helper to fetch station-wise data specifically for the heatmap."""
-    client = MultiSourceAPIClient(
-        cpcb_key=os.getenv("CPCB_API_KEY")
+    from backend.ml_engine.http_pool import run_sync
+except ImportError:
+    from ml_engine.api_client import (
+        MultiSourceAPIClient, fetch_live_weather_data, fetch_cpcb_station_data, OPENWEATHERMAP_BASE_URL
     )
-    return client.fetch_cpcb_current_stations(city='Delhi')
-
-
-class MultiSourceAPIClient:
-    """
-    Unified client for fetching AQI data from multiple sources.
-    - CPCB OGD: Official Government Data (High Priority for India)
-    - OpenWeatherMap: Real-time weather proxy
-    - OpenAQ: Historical backup
-    """
-    
-    # City coordinates
-    CITY_COORDS = {
-        'Delhi': {'lat': 28.7041, 'lon': 77.1025},
-        'Mumbai': {'lat': 19.0760, 'lon': 72.8777},
-        'Bangalore': {'lat': 12.9716, 'lon': 77.5946},
-        'Kolkata': {'lat': 22.5726, 'lon': 88.3639},
-        'Pune': {'lat': 18.5204, 'lon': 73.8567}
-    }
-    
-    def __init__(self, openweathermap_key=None, openaq_key=None, cpcb_key=None):
-        self.owm_key = openweathermap_key
-        self.openaq_key = openaq_key
-        self.cpcb_key = cpcb_key
-    
-    def fetch_realtime_data(self, city='Delhi', hours=24):
-        """
-        Fetch real-time data using the best available source.
-        Priority: CPCB (Official) > OpenWeatherMap > Simulated
-        """
-        print(f'\nFetching real-time data for {city}...')
-        
-        # Try CPCB/OGD first (Official for India)
-        # Note: OGD API usually separates Pollutants (Resource 1) from Weather (Resource 2 or sometimes absent)
-        # But we can check if it works.
-        if self.cpcb_key:
-            # For the general 'city' average, we can aggregate station data if available
-            df = self._fetch_cpcb_ogd(city)
-            if df is not None and len(df) > 0:
-                print("  [OK] Using CPCB OGD Data")
-                return df
-
-        # Try OpenWeatherMap (Good for weather parameters needed for model)
-        if self.owm_key and self.owm_key != 'YOUR_API_KEY_HERE':
-            df = self._fetch_openweathermap(city, hours)
-            if df is not None and len(df) > 0:
-                return df
-        
-        # Fall back to simulated data
-        print('[INFO] Using simulated data (no API keys or APIs unavailable)')
-        return self._generate_simulated_data(city, hours)
-
-    def fetch_cpcb_current_stations(self, city='Delhi'):
-        """Specific method to get station-wise breakdown for Heatmap."""
-        if not self.cpcb_key:
-            return None
-            
-        try:
-            # Resource ID for "Real time Air Quality Index from various location"
-            resource_id = "3b01bcb8-0b14-4abf-b6f2-c1bfd384ba69"
-            url = f"https://api.data.gov.in/resource/{resource_id}"
-            
-            params = {
-                "api-key": self.cpcb_key,
-                "format": "json",
-                "limit": 500, # Get a large batch
-                "filters[city]": city,
-            }
-            
-            # Remove pollutant filters to get everything and filter in-memory
-            # This avoids API quirks with strings like "PM2.5" vs "PM 2.5"
-            
-            print(f"DEBUG: Calling CPCB OGD API: {url} with limit=500, city={city}")
-            response = requests.get(url, params=params, timeout=15)
-            print(f"DEBUG: CPCB Response Status: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"CPCB API Error: {response.status_code} - {response.text[:100]}")
-                return None
-                
-            data = response.json()
-            records = data.get("records", [])
-            print(f"DEBUG: CPCB Records Found: {len(records)}")
-            
-            # Process records into a dictionary: { "StationName": { "PM2.5": val, "AQI": val } }
-            station_data = {}
-            
-            match_count = 0
-            pm25_count = 0
-            
-            for item in records:
-                s_name = item.get("station", "").strip()
-                if not s_name: continue
-                
-                # Clean name: "Alipur, Delhi - DPCC" -> "Alipur"
-                # Splits by comma or hyphen to get the main locality name
-                s_name_clean = s_name.split(",")[0].split("-")[0].strip()
-                
-                if s_name_clean not in station_data:
-                    station_data[s_name_clean] = {}
-                
-                pollutant = item.get("pollutant_id")
-                avg_val = item.get("avg_value")
-                
-                if pollutant and avg_val is not None:
-                    try:
-                        val = float(avg_val)
-                        station_data[s_name_clean][pollutant] = val
-                        if pollutant == "PM2.5":
-                            pm25_count += 1
-                    except:
-                        pass
-                        
-            print(f"DEBUG: Stations with data: {len(station_data)}. PM2.5 records: {pm25_count}")
-            if len(station_data) > 0:
-                 print(f"DEBUG: Sample Station Keys: {list(station_data.keys())[:5]}")
-                 
-            return station_data
-                        
-            return station_data
-            
-        except Exception as e:
-            print(f"Error fetching CPCB stations: {e}")
-            return None
-
-    def _fetch_cpcb_ogd(self, city):
-        """Fetch city-average from OGD."""
-        # Simple implementation: fetch stations and average them
-        s_data = self.fetch_cpcb_current_stations(city)
-        if not s_data:
-            print(f"  [WARN] CPCB Station Data is Empty/None for {city}")
-            return None
-            
-        # Aggregate
-        pm25_vals = []
-        for s_name, s in s_data.items():
-            if "PM2.5" in s:
-                pm25_vals.append(s["PM2.5"])
-            else:
-                pass # print(f"  [DEBUG] No PM2.5 for {s_name}")
-        
-        print(f"  [DEBUG] Found PM2.5 data for {len(pm25_vals)} stations.")
-        
-        if not pm25_vals:
-            print("  [WARN] No PM2.5 values found across all stations (Fallback trigger).")
-            return None
-            
-        if len(pm25_vals) >= 4:
-            # Use Trimmed Mean (discard top/bottom 25%) to match SAFAR/Official aggregation style
-            # which filters out extreme hotspots and super-clean green zones.
-            # Debug script showed this matches User ref (235) almost perfectly (231).
-            pm25_vals.sort()
-            n_vals = len(pm25_vals)
-            # Remove top and bottom 25% (quarter)
-            trim_cnt = int(n_vals * 0.25)
-            # Ensure we don't trim everything
-            if trim_cnt > 0 and (n_vals - 2*trim_cnt) > 0:
-                 trimmed_vals = pm25_vals[trim_cnt : n_vals - trim_cnt]
-                 avg_aqi = np.mean(trimmed_vals)
-                 print(f"  [OK] Using Trimmed Mean (25% cut, n={len(trimmed_vals)}): {avg_aqi}")
-            else:
-                 # Fallback to Median if too few points to trim
-                 avg_aqi = np.median(pm25_vals)
-                 print(f"  [OK] Using Median (n={len(pm25_vals)}): {avg_aqi}")
-        else:
-            # Fallback to simple median for sparse data
-            avg_aqi = np.median(pm25_vals)
-            print(f"  [OK] Using Median (n={len(pm25_vals)}): {avg_aqi}")
-
-        # We need to provide 'PM2_5_ugm3' because the model expects it as a feature.
-        # But we must ensure downstream logic doesn't re-calculate AQI from this "Mass" if it's actually AQI.
-        # Quick fix: Reverse convert Avg AQI -> Mass so the model gets the correct physical input?
-        # OR: Just set it, and ensure 'AQI_computed' is set, and we skip re-calc if it exists.
-        
-        # Let's approximate Mass from AQI for the feature column
-        def aqi_to_pm25_approx(aqi):
-            if aqi <= 50: return aqi * (30/50)
-            if aqi <= 100: return 30 + (aqi-50)*(30/50)
-            if aqi <= 200: return 60 + (aqi-100)*(30/100)
-            if aqi <= 300: return 90 + (aqi-200)*(30/100)
-            if aqi <= 400: return 120 + (aqi-300)*(130/100)
-            return 250 + (aqi-400)*(130/100)
-
-        estimated_mass = aqi_to_pm25_approx(avg_aqi)
-        
-        record = {
-            'Datetime': datetime.now(),
-            'PM2_5_ugm3': estimated_mass, # Physical mass for model features
-            'AQI_computed': avg_aqi,      # Direct AQI for display
-            'PM10_ugm3': estimated_mass * 1.5, # Estimate
-            'NO2_ugm3': 40,
-            'CO_ugm3': 1000,
-            'O3_ugm3': 30,
-            'SO2_ugm3': 10,
-            'Temp_2m_C': 25.0, # Default, missing in OGD
-            'Humidity_Percent': 50, # Default
-            'Wind_Speed_10m_kmh': 10.0 # Default
-        }
-        
-        return pd.DataFrame([record])
-
-    def _fetch_openweathermap(self, city, hours):
-        """Fetch from OpenWeatherMap Air Pollution API."""
-        try:
-            coords = self.CITY_COORDS.get(city, self.CITY_COORDS['Delhi'])
-            
-            end_time = int(datetime.now().timestamp())
-            start_time = int((datetime.now() - timedelta(hours=hours)).timestamp())
-            
-            url = "http://api.openweathermap.org/data/2.5/air_pollution/history"
-            params = {
-                'lat': coords['lat'],
-                'lon': coords['lon'],
-                'start': start_time,
-                'end': end_time,
-                'appid': self.owm_key
-            }
-            
-            print(f'  Calling OpenWeatherMap API...')
-            response = requests.get(url, params=params, timeout=30)
-            
-            if response.status_code != 200:
-                print(f'  OpenWeatherMap error: {response.status_code}')
-                return None
-            
-            data = response.json()
-            
-            if 'list' not in data:
-                print('  Unexpected response format')
-                return None
-            
-            records = []
-            for item in data['list']:
-                dt = datetime.fromtimestamp(item['dt'])
-                components = item['components']
-                
-                record = {
-                    'Datetime': dt,
-                    'PM2_5_ugm3': components.get('pm2_5', np.nan),
-                    'PM10_ugm3': components.get('pm10', np.nan),
-                    'NO2_ugm3': components.get('no2', np.nan),
-                    'CO_ugm3': components.get('co', np.nan),
-                    'O3_ugm3': components.get('o3', np.nan),
-                    'SO2_ugm3': components.get('so2', np.nan),
-                    'Temp_2m_C': 25.0,  # OWM doesn't provide temp in this API
-                    'Humidity_Percent': 60,
-                    'Wind_Speed_10m_kmh': 10.0
-                }
-                records.append(record)
-            
-            df = pd.DataFrame(records)
-            df = df.sort_values('Datetime')
-            
-            print(f'  [OK] Fetched {len(df)} records from OpenWeatherMap')
-            return df
-            
-        except Exception as e:
-            print(f'  OpenWeatherMap error: {e}')
-            return None
-    
-    def _fetch_openaq(self, city, hours):
-        # ... (Existing OpenAQ logic kept same, omitted for brevity if no changes, 
-        # but to overwrite cleanly I must include it or use partial replace. 
-        # I will include stub here or full if small. The previous file was ~270 lines.
-        # To avoid deleting OpenAQ logic, I will paste the whole file content carefully.)
-        return None # Placeholder for this Artifact output, relying on existing file content for this method? 
-        # No, write_to_file overwrites. I MUST provide the full file.
-        pass
-
-    def _generate_simulated_data(self, city, hours):
-        """Generate realistic simulated data for demo/testing."""
-        print(f'  Generating {hours} hours of simulated data...')
-        
-        # Base patterns by month
-        current_month = datetime.now().month
-        
-        if current_month in [11, 12, 1, 2]:  # Winter - high pollution
-            base_pm25 = 200
-            base_aqi = 300
-        elif current_month in [6, 7, 8, 9]:  # Monsoon - lower pollution
-            base_pm25 = 80
-            base_aqi = 150
-        else:  # Transition
-            base_pm25 = 120
-            base_aqi = 200
-        
-        records = []
-        now = datetime.now()
-        
-        for h in range(hours, 0, -1):
-            dt = now - timedelta(hours=h)
-            hour_of_day = dt.hour
-            
-            if hour_of_day in [7, 8, 9, 18, 19, 20]:
-                factor = 1.2
-            elif hour_of_day in [2, 3, 4, 5]:
-                factor = 0.8
-            else:
-                factor = 1.0
-            
-            noise = np.random.normal(0, 15)
-            pm25 = max(10, base_pm25 * factor + noise)
-            pm10 = max(20, pm25 * 1.7 + np.random.normal(0, 20))
-            
-            record = {
-                'Datetime': dt,
-                'PM2_5_ugm3': pm25,
-                'PM10_ugm3': pm10,
-                'NO2_ugm3': max(10, 60 * factor + np.random.normal(0, 10)),
-                'CO_ugm3': max(200, 1500 * factor + np.random.normal(0, 200)),
-                'O3_ugm3': max(5, 40 - noise * 0.3),
-                'SO2_ugm3': max(5, 25 + np.random.normal(0, 8)),
-                'Temp_2m_C': 22 + np.random.normal(0, 3),
-                'Humidity_Percent': min(100, max(30, 65 + np.random.normal(0, 10))),
-                'Wind_Speed_10m_kmh': max(1, 10 + np.random.normal(0, 4))
-            }
-            records.append(record)
-        
-        df = pd.DataFrame(records)
-        return df
+    from ml_engine.http_pool import run_sync
 
-def test_client():
-    # ... test logic
-    pass
+__all__ = ['MultiSourceAPIClient', 'fetch_live_weather_data', 'fetch_cpcb_station_data', 'run_sync',
+           'OPENWEATHERMAP_BASE_URL']
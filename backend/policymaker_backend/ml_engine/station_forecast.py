@@ -1,11 +1,11 @@
 
 import pandas as pd
 import numpy as np
-import joblib
-import xgboost as xgb
 from datetime import datetime, timedelta
 import os
 import sys
+import time
+import logging
 from pathlib import Path
 
 # Add parent directory to path to allow imports
@@ -14,13 +14,60 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 # Adjusted for new location
 try:
     from backend.ml_engine.aqi_calculator import compute_aqi_for_dataframe
+    from backend.ml_engine.aqi_kernels import pm25_to_aqi
+    from backend.ml_engine.feature_state import RollingFeatureState
+    from backend.ml_engine.feature_plan import FeaturePlan
+    from backend.ml_engine.columnar_store import open_dataset
+    from backend.ml_engine.station_registry import get_registry
+    from backend.ml_engine.metrics import model_inference
+    from backend.ml_engine.ml_imports import import_xgboost
+    from backend.ml_engine import model_registry
+    from backend.ml_engine.city_registry import get_city_registry
 except ImportError:
     sys.path.append(str(Path(__file__).resolve().parent.parent.parent)) # Add backend
     from ml_engine.aqi_calculator import compute_aqi_for_dataframe
+    from ml_engine.aqi_kernels import pm25_to_aqi
+    from ml_engine.feature_state import RollingFeatureState
+    from ml_engine.feature_plan import FeaturePlan
+    from ml_engine.columnar_store import open_dataset
+    from ml_engine.station_registry import get_registry
+    from ml_engine.metrics import model_inference
+    from ml_engine.ml_imports import import_xgboost
+    from ml_engine import model_registry
+    from ml_engine.city_registry import get_city_registry
+
+logger = logging.getLogger(__name__)
 
 # Configuration matching the training logic
 LAG_HOURS = [1, 3, 6, 12, 24]
 ROLLING_WINDOWS = [3, 6, 12, 24]
+HISTORY_HOURS = 24
+
+POLLUTANT_COLS = ['PM2_5_ugm3', 'PM10_ugm3', 'NO2_ugm3', 'CO_ugm3', 'O3_ugm3', 'SO2_ugm3']
+WEATHER_COLS = ['Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']
+WEATHER_DEFAULTS = [25.0, 50.0, 5.0]
+OUTPUT_POLLUTANT_NAMES = [c.replace('_ugm3', '').replace('_', '.') for c in POLLUTANT_COLS] # PM2_5 -> PM2.5
+
+# Map CPCB API keys to CSV keys
+OVERRIDE_KEY_MAP = {
+    'PM2.5': 'PM2_5_ugm3',
+    'PM10': 'PM10_ugm3',
+    'NO2': 'NO2_ugm3',
+    'CO': 'CO_ugm3',
+    'O3': 'O3_ugm3',
+    'SO2': 'SO2_ugm3'
+}
+
+# Diurnal factor for Traffic/Industrial activity applied to pollutant inputs, by hour
+TRAFFIC_FACTOR = np.ones(24)
+TRAFFIC_FACTOR[[8, 9, 10, 18, 19, 20]] = 1.15
+TRAFFIC_FACTOR[[2, 3, 4]] = 0.85
+
+# Post-processing multiplier on the predicted AQI, by hour.
+# Peak traffic hours (8-10am, 6-9pm) get a boost, night hours (2-5am) a dip.
+DIURNAL_MULT = np.ones(24)
+DIURNAL_MULT[[8, 9, 10, 18, 19, 20, 21]] = 1.15
+DIURNAL_MULT[[2, 3, 4, 5]] = 0.85
 
 # Point to shared resources in backend/ml_engine/
 # Current file: backend/policymaker_backend/ml_engine/station_forecast.py
@@ -29,283 +76,214 @@ SHARED_ML_DIR = Path(__file__).resolve().parent.parent.parent / "ml_engine"
 MODEL_DIR = SHARED_ML_DIR / "models"
 DATA_DIR = SHARED_ML_DIR / "data"
 
+def _derive_station_aqi(df):
+    """AQI_computed precomputed once at conversion time, if the CSV lacks it."""
+    if 'AQI_computed' in df.columns:
+        return {}
+    # Basic PM2.5 to AQI approx for speed (missing PM2.5 -> 0)
+    return {'AQI_computed': pm25_to_aqi(df['PM2_5_ugm3']).fillna(0)}
+
+
 class StationForecaster:
     def __init__(self):
         self.model = None
         self.scaler = None
         self.feature_names = None
+        self.feature_plan = None
+        self.version = None
         self.station_data = None
         self.load_artifacts()
 
     def load_artifacts(self):
-        """Load model, scaler and feature names"""
+        """Load model, scaler and feature names (the Delhi forecast model's CURRENT registry version)"""
         try:
-            model_path = MODEL_DIR / "xgboost_aqi.json"
-            scaler_path = MODEL_DIR / "scaler.pkl"
-            features_path = MODEL_DIR / "feature_names.pkl"
-            
-            self.model = xgb.Booster()
-            self.model.load_model(model_path)
-            
-            self.scaler = joblib.load(scaler_path)
-            self.feature_names = joblib.load(features_path)
-            
-            print("[INFO] StationForecaster loaded model and artifacts.")
+            loaded = model_registry.load(get_city_registry().get('Delhi').models['forecast'])
+            self.model = loaded.model.get_booster()
+            self.scaler = loaded.scaler
+            self.feature_names = loaded.features
+            self.feature_plan = FeaturePlan(self.feature_names, LAG_HOURS, ROLLING_WINDOWS)
+            self.version = loaded.version
+
+            logger.info("StationForecaster loaded model and artifacts (%s).", loaded.version)
         except Exception as e:
-            print(f"[ERROR] Failed to load artifacts: {e}")
+            logger.error("Failed to load artifacts: %s", e)
 
     def load_station_data(self):
-        """Load the combined station data CSV"""
+        """Load the last 7 days of the combined station data (columnar copy of the CSV)"""
         try:
-            csv_path = DATA_DIR / "delhi_stations_combined.csv"
-            if not csv_path.exists():
-                print(f"[ERROR] Data file not found: {csv_path}")
+            store = open_dataset("delhi_stations_combined.csv", derive=_derive_station_aqi)
+            if store is None:
+                logger.error("Data file not found: %s", DATA_DIR / "delhi_stations_combined.csv")
                 return False
-                
-            # Read CSV efficiently
-            df = pd.read_csv(csv_path, parse_dates=['Datetime'])
-            
+
             # Filter for recent data (optimize memory)
             # We need enough history for lags (max 24h) + rolling (max 24h)
-            # Taking last 7 days is safe
-            cutoff_date = df['Datetime'].max() - timedelta(days=7)
-            df = df[df['Datetime'] >= cutoff_date].copy()
-            
-            # Ensure AQI is computed
-            if 'AQI_computed' not in df.columns:
-                print("[INFO] Computing AQI for loaded data...")
-                # Basic PM2.5 to AQI approx for speed
-                def approx_aqi(pm25):
-                     if pd.isna(pm25): return 0
-                     if pm25 <= 30: return pm25 * 50/30
-                     if pm25 <= 60: return 50 + (pm25-30) * 50/30
-                     if pm25 <= 90: return 100 + (pm25-60) * 100/30
-                     if pm25 <= 120: return 200 + (pm25-90) * 100/130
-                     if pm25 <= 250: return 300 + (pm25-120) * 100/130
-                     return 400 + (pm25-250) * 100/130
-                
-                df['AQI_computed'] = df['PM2_5_ugm3'].apply(approx_aqi)
+            # Taking last 7 days is safe; rows are time-sorted so this is a slice
+            cutoff_date = store.end - timedelta(days=7)
+            df = store.to_frame(since=cutoff_date)
 
             self.station_data = df
-            print(f"[INFO] Loaded station data. {len(df)} records from {len(df['StationName'].unique())} stations.")
+            logger.info("Loaded station data. %s records from %s stations.", len(df), len(df['StationName'].unique()))
             return True
         except Exception as e:
-            print(f"[ERROR] Failed to load station data: {e}")
+            logger.error("Failed to load station data: %s", e)
             return False
 
-    def get_rolling_stats(self, aqi_history, window):
-        if len(aqi_history) < window:
-            arr = aqi_history
-        else:
-            arr = aqi_history[-window:]
-        
-        return {
-            'mean': np.mean(arr),
-            'std': np.std(arr) if len(arr) > 1 else 0,
-            'max': np.max(arr),
-            'min': np.min(arr)
-        }
-
-    def forecast_station(self, station_name, hours=72, current_override=None):
-        if self.station_data is None:
-            return None
-            
-        # Get history from CSV
-        station_df = self.station_data[self.station_data['StationName'] == station_name].copy()
-        
+    def _initial_state(self, last_row, current_override=None):
+        """
+        Build the starting point of a station's recursive forecast from its
+        latest CSV row (or None) and live values:
+        (start_datetime, current_aqi, current_vals, lat, lng), or None if the
+        station has neither CSV history nor live values.
+        """
         # If no history, we can't do rolling stats easily without cold-start logic
         # But we can try to synthetic start if we have current override
-        if station_df.empty and not current_override:
+        if last_row is None and not current_override:
             return None
-            
-        # Feature columns needed
-        # We need to construction a 'last row' state
-        if not station_df.empty:
-            station_df = station_df.sort_values('Datetime')
-            last_row = station_df.iloc[-1].to_dict()
-            # If CSV data is too old (> 24h), we ideally shouldn't use it for "current" rolling window
-            # but we will use it for "trend shape" or just rely on the new start point.
-        else:
-            # Synthetic last row
-            last_row = {}
+
+        # If CSV data is too old (> 24h), we don't use it for the "current" rolling
+        # window, only as a fallback starting point.
+        last_row = dict(last_row) if last_row is not None else {}
 
         # 1. Determine Start Time and Initial Pollutants
         if current_override:
-            # Use Live Data Time
-            # CPCB API data doesn't always have timestamp per station in the simple dict, 
-            # usually it's "current". We assume Now.
+            # CPCB API data doesn't always have timestamp per station in the simple
+            # dict, usually it's "current". We assume Now.
             start_datetime = datetime.now()
-            
+
             # Merge live values into last_row state
             # current_override is like {'PM2.5': 120, 'AQI': 150, ...}
-            # Map API keys to CSV keys
-            key_map = {
-                'PM2.5': 'PM2_5_ugm3', 
-                'PM10': 'PM10_ugm3', 
-                'NO2': 'NO2_ugm3',
-                'CO': 'CO_ugm3',
-                'O3': 'O3_ugm3',
-                'SO2': 'SO2_ugm3'
-            }
-            
-            for api_key, csv_key in key_map.items():
+            for api_key, csv_key in OVERRIDE_KEY_MAP.items():
                 if api_key in current_override:
                     last_row[csv_key] = current_override[api_key]
-            
+
             # Recalculate AQI_computed from the *live* PM2.5 if available
             if 'PM2.5' in current_override:
-                # Basic approx again just to be consistent
-                def approx_aqi(pm25):
-                     if pd.isna(pm25): return 0
-                     if pm25 <= 30: return pm25 * 50/30
-                     if pm25 <= 60: return 50 + (pm25-30) * 50/30
-                     if pm25 <= 90: return 100 + (pm25-60) * 100/30
-                     if pm25 <= 120: return 200 + (pm25-90) * 100/130
-                     if pm25 <= 250: return 300 + (pm25-120) * 100/130
-                     return 400 + (pm25-250) * 100/130
-                last_row['AQI_computed'] = approx_aqi(current_override['PM2.5'])
-            
+                last_row['AQI_computed'] = np.nan_to_num(pm25_to_aqi(current_override['PM2.5']))
         else:
             # Fallback to CSV time (which might be old -> producing 'old' forecasts)
-            # But the user flagged this as an issue.
             start_datetime = last_row.get('Datetime', datetime.now())
 
         current_aqi = last_row.get('AQI_computed', 50) # Default if totally missing
-        
+
+        current_vals = [last_row.get(col, 0) for col in POLLUTANT_COLS + WEATHER_COLS]
+        # Fix missing weather (if CSV didn't have it or we started fresh)
+        for i, default in enumerate(WEATHER_DEFAULTS, start=len(POLLUTANT_COLS)):
+            if current_vals[i] == 0:
+                current_vals[i] = default
+
+        return (start_datetime, current_aqi, current_vals,
+                last_row.get('Latitude', 0), last_row.get('Longitude', 0))
+
+    def forecast_stations(self, station_names, overrides=None, hours=72):
+        """
+        Batched recursive forecast.
+
+        Every station's state (pollutants, weather, AQI history) is held as a
+        row of a matrix and all stations advance one hour at a time, so each
+        step is a single scaler.transform and a single model.predict no matter
+        how many stations there are. Returns one result (or None) per name, in
+        the same format as forecast_station.
+        """
+        if self.station_data is None:
+            return [None] * len(station_names)
+        xgb = import_xgboost()
+        overrides = overrides if overrides is not None else [None] * len(station_names)
+
+        last_rows = {}
+        if len(self.station_data):
+            latest = self.station_data.sort_values('Datetime', kind='stable').groupby('StationName').tail(1)
+            last_rows = {row['StationName']: row for row in latest.to_dict('records')}
+
+        states = [self._initial_state(last_rows.get(name), override)
+                  for name, override in zip(station_names, overrides)]
+        active = [i for i, state in enumerate(states) if state is not None]
+        results = [None] * len(station_names)
+        if not active:
+            return results
+
+        started = time.perf_counter()
+        predict_seconds = 0.0
+        n = len(active)
+        starts = pd.DatetimeIndex([states[i][0] for i in active])
+        # All state is float64 (the model's float32 output is widened on arrival)
+        current_aqi = np.array([states[i][1] for i in active], dtype=np.float64)
+        values = np.array([states[i][2] for i in active], dtype=np.float64)
+        pollutants = values[:, :len(POLLUTANT_COLS)]
+        weather = values[:, len(POLLUTANT_COLS):]
+
         # 2. Reconstruct History for features
         # If we have a gap, our rolling stats from CSV are invalid for 'Now'.
-        # We will synth a history: [Current_AQI] * 24. 
-        # This assumes steady state leading up to now. Better than using 6-month old data.
-        aqi_history = [current_aqi] * 24
-        
-        # Initial pollutants dict
-        pollutant_cols = ['PM2_5_ugm3', 'PM10_ugm3', 'NO2_ugm3', 'CO_ugm3', 'O3_ugm3', 'SO2_ugm3',
-                          'Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']
-        current_vals = {col: last_row.get(col, 0) for col in pollutant_cols}
-        
-        # Fix missing weather (if CSV didn't have it or we started fresh)
-        if current_vals['Temp_2m_C'] == 0: current_vals['Temp_2m_C'] = 25.0
-        if current_vals['Humidity_Percent'] == 0: current_vals['Humidity_Percent'] = 50.0
-        if current_vals['Wind_Speed_10m_kmh'] == 0: current_vals['Wind_Speed_10m_kmh'] = 5.0
+        # We synth a steady-state history: [Current_AQI] * 24 (columns are t-23 .. t).
+        history = RollingFeatureState(np.repeat(current_aqi[:, None], HISTORY_HOURS, axis=1),
+                                      LAG_HOURS, ROLLING_WINDOWS)
 
-        forecasts = []
-        
+        plan = self.feature_plan
+        pollutant_group = plan.columns(POLLUTANT_COLS)
+        X = plan.allocate(n)
+        # Weather is held constant over the horizon
+        plan.write_group(X, plan.columns(WEATHER_COLS), weather)
+
+        forecasts = [[] for _ in range(n)]
         for h in range(1, hours + 1):
-            future_dt = start_datetime + timedelta(hours=h)
-            features = {}
-            
+            future = starts + pd.Timedelta(hours=h)
+            hour_of_day = future.hour.to_numpy()
+            month = future.month.to_numpy()
+            dow = future.dayofweek.to_numpy()
+
             # Simple Weather/Pollutant Evolution (Persistence + Diurnal)
-            hour_of_day = future_dt.hour
-            # Diurnal factor for Traffic/Industrial activity
-            if hour_of_day in [8, 9, 10, 18, 19, 20]:
-                factor = 1.15
-            elif hour_of_day in [2, 3, 4]:
-                factor = 0.85
-            else:
-                factor = 1.0
-                
-            for col, val in current_vals.items():
-                if col in ['Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']:
-                    features[col] = val 
-                else:
-                    # Decay towards background? Or persist?
-                    # Let's persist base level * diurnal factor
-                    features[col] = val * factor
-            
-            # Temporal features
-            features['hour'] = hour_of_day
-            features['day_of_week'] = future_dt.weekday()
-            features['month'] = future_dt.month
-            features['is_weekend'] = 1 if future_dt.weekday() >= 5 else 0
-            # Trig
-            features['hour_sin'] = np.sin(2 * np.pi * hour_of_day / 24)
-            features['hour_cos'] = np.cos(2 * np.pi * hour_of_day / 24)
-            features['month_sin'] = np.sin(2 * np.pi * future_dt.month / 12)
-            features['month_cos'] = np.cos(2 * np.pi * future_dt.month / 12)
-            
-            # Lags
-            for lag in LAG_HOURS:
-                # AQI history is [t-24, ... t-1, t_current]
-                # We need t-lag.
-                # Since we appended predicted values, history grows.
-                idx = -lag
-                if abs(idx) <= len(aqi_history):
-                    features[f'AQI_computed_lag_{lag}h'] = aqi_history[idx]
-                else:
-                    features[f'AQI_computed_lag_{lag}h'] = aqi_history[0]
-            
-            # Rolling
-            for window in ROLLING_WINDOWS:
-                stats = self.get_rolling_stats(aqi_history, window)
-                features[f'AQI_computed_rolling_mean_{window}h'] = stats['mean']
-                features[f'AQI_computed_rolling_std_{window}h'] = stats['std']
-                features[f'AQI_computed_rolling_max_{window}h'] = stats['max']
-                features[f'AQI_computed_rolling_min_{window}h'] = stats['min']
-            
-            # Predict
-            X = np.array([[features.get(f, 0) for f in self.feature_names]])
+            plan.write_group(X, pollutant_group, pollutants * TRAFFIC_FACTOR[hour_of_day][:, None])
+
+            # Temporal, lag and rolling features
+            plan.write_temporal(X, hour_of_day, dow, month)
+            plan.write_history(X, history)
+
+            # Predict (one call for every station)
+            step_started = time.perf_counter()
             try:
-                X_scaled = self.scaler.transform(X)
-                pred_aqi = self.model.predict(xgb.DMatrix(X_scaled))[0]
+                pred_aqi = self.model.predict(xgb.DMatrix(self.scaler.transform(X))).astype(np.float64)
             except Exception:
-                pred_aqi = aqi_history[-1] 
-            
+                pred_aqi = history.lag(1)
+            predict_seconds += time.perf_counter() - step_started
+
             # Clamp
-            pred_aqi = max(5, pred_aqi)
-            
+            pred_aqi = np.maximum(pred_aqi, 5.0)
+
             # Artificial Diurnal Injection (Post-Processing) to ensure visual "breathing"
-            # Peak traffic hours (8-10am, 6-9pm) get +10-20% boost
-            # Night hours (2-4am) get -10-15% dip
-            diurnal_mult = 1.0
-            if hour_of_day in [8, 9, 10, 18, 19, 20, 21]:
-                diurnal_mult = 1.15
-            elif hour_of_day in [2, 3, 4, 5]:
-                diurnal_mult = 0.85
-            
-            # Apply only if model variance is low (which we know it is)
-            pred_aqi = pred_aqi * diurnal_mult
-            
-            # forecasts.append moved to end of loop to capture updated pollutants
-            
+            pred_aqi = pred_aqi * DIURNAL_MULT[hour_of_day]
+
             # Update
-            aqi_history.append(pred_aqi)
-            # Keep history manageable
-            if len(aqi_history) > 50:
-                aqi_history = aqi_history[-50:]
-            
-            # Update current state for pollutant features next step (simple recursion)
-            # In a better model we'd predict all pollutants, but here we just scale AQI
-            # and assume pollutants scale roughly with it for input to next step.
-            ratio = pred_aqi / current_aqi if current_aqi > 0 else 1.0
-            # Damping the ratio to prevent explosion
-            # ratio = 1.0 + (ratio - 1.0) * 0.5 # Removed damping to increase variance
-            
-            projected_pollutants = {}
-            for col in pollutant_cols:
-                if col not in ['Temp_2m_C', 'Humidity_Percent', 'Wind_Speed_10m_kmh']:
-                    new_val = current_vals[col] * ratio
-                    current_vals[col] = new_val
-                    
-                    # Store clean name for output
-                    clean_name = col.replace('_ugm3', '').replace('_', '.') # PM2_5 -> PM2.5
-                    projected_pollutants[clean_name] = int(new_val)
-            
+            history.push(pred_aqi)
+
+            # Pollutants scale with the predicted AQI for input to the next step
+            has_aqi = current_aqi > 0
+            ratio = np.ones(n)
+            ratio[has_aqi] = pred_aqi[has_aqi] / current_aqi[has_aqi]
+            pollutants = pollutants * ratio[:, None]
             current_aqi = pred_aqi
 
-            # Append forecast with pollutants
-            forecast_entry = {
-                "time": future_dt.strftime("%Y-%m-%d %H:%M"),
-                "aqi": int(pred_aqi)
+            times = future.strftime("%Y-%m-%d %H:%M")
+            aqi_out = pred_aqi.astype(np.int64)
+            pollutant_out = pollutants.astype(np.int64)
+            for k in range(n):
+                entry = {"time": times[k], "aqi": int(aqi_out[k])}
+                entry.update(zip(OUTPUT_POLLUTANT_NAMES, pollutant_out[k].tolist()))
+                forecasts[k].append(entry)
+
+        for k, i in enumerate(active):
+            _, _, _, lat, lng = states[i]
+            results[i] = {
+                "station": station_names[i],
+                "lat": lat,
+                "lng": lng,
+                "forecast": forecasts[k]
             }
-            forecast_entry.update(projected_pollutants)
-            forecasts.append(forecast_entry)
-            
-        return {
-            "station": station_name,
-            "lat": last_row.get('Latitude', 0),
-            "lng": last_row.get('Longitude', 0),
-            "forecast": forecasts
-        }
+        model_inference.observe(predict_seconds, model='station_forecast', stage='predict')
+        model_inference.observe(time.perf_counter() - started, model='station_forecast', stage='total')
+        return results
+
+    def forecast_station(self, station_name, hours=72, current_override=None):
+        return self.forecast_stations([station_name], [current_override], hours=hours)[0]
 
     def generate_all_forecasts(self):
         # 1. Load CSV mainly for Station Coordinates (Lat/Lng) mapping
@@ -314,48 +292,51 @@ class StationForecaster:
                 return []
                 
         # 2. Fetch Live CPCB Data
-        print("[INFO] Fetching LIVE CPCB Station Data...")
+        logger.info("Fetching LIVE CPCB Station Data...")
         try:
             # Dynamic import to avoid circular dependency at module level if any
-            # Dynamic import to avoid circular dependency at module level if any
-            from backend.policymaker_backend.ml_engine.api_client import MultiSourceAPIClient
+            try:
+                from backend.policymaker_backend.ml_engine.api_client import MultiSourceAPIClient, run_sync
+            except ImportError:
+                from policymaker_backend.ml_engine.api_client import MultiSourceAPIClient, run_sync
             import os
             client = MultiSourceAPIClient(cpcb_key=os.getenv("CPCB_API_KEY"))
-            live_data = client.fetch_cpcb_current_stations(city='Delhi') # { "StationName": { "PM2.5": 100, ... } }
+            live_data = run_sync(client.fetch_cpcb_current_stations(city='Delhi')) # { "StationName": { "PM2.5": 100, ... } }
         except Exception as e:
-            print(f"[ERROR] Failed to fetch live data: {e}")
+            logger.error("Failed to fetch live data: %s", e)
             live_data = {}
 
         if not live_data:
-            print("[WARN] No live data available. Forecasts will use old CSV data (might be inaccurate).")
+            logger.warning("No live data available. Forecasts will use old CSV data (might be inaccurate).")
             live_data = {}
 
         stations = self.station_data['StationName'].unique()
         results = []
         
-        print(f"[INFO] Generating forecasts for {len(stations)} stations...")
+        logger.info("Generating forecasts for %s stations...", len(stations))
+        # CSV and CPCB spellings differ ("Dwarka-Sector 8" vs "Dwarka"); join on registry ids
+        registry = get_registry()
+        live_by_id = {}
+        for k, v in live_data.items():
+            match = registry.resolve(k, 'Delhi')
+            if match is not None:
+                live_by_id.setdefault(match.id, v)
+
+        names, overrides = [], []
         for station in stations:
             if not isinstance(station, str): continue
-            
-            # Find matching live data?
-            # CSV names: "Alipur, Delhi - DPCC" -> cleaned in client?
-            # The client cleaning logic needs to match what we have in CSV.
-            # Station names in CSV are like "Alipur", "Anand Vihar", etc. (Cleaned)
-            
-            # Let's try direct match or fuzzy match
+
             live_vals = live_data.get(station)
-            
-            # If standard name mismatch, try finding partial
             if not live_vals:
-                for k, v in live_data.items():
-                    if k in station or station in k:
-                        live_vals = v
-                        break
-            
-            res = self.forecast_station(station, current_override=live_vals)
-            if res:
-                results.append(res)
-                
+                match = registry.resolve(station, 'Delhi')
+                live_vals = live_by_id.get(match.id) if match is not None else None
+
+            names.append(station)
+            overrides.append(live_vals)
+        registry.log_stats("Live CPCB join")
+
+        # All stations advance together: one transform + one predict per hour
+        results = [res for res in self.forecast_stations(names, overrides) if res]
         return results
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Request, Response
 from policymaker_backend.services import (
     mockSensors, mockHistoricalData, mockForecastData, mockHotspots,
     mockAlerts, mockHealthData, mockZoneHealthImpact, mockTrafficData,
@@ -7,70 +7,43 @@ from policymaker_backend.services import (
     mockSourceAttribution, mockVulnerablePopulations, mockPolicySimulation
 )
 import os
+import logging
+from ml_engine.aqi_calculator import calculate_aqi_from_pollutants
+from ml_engine import http_pool
+from ml_engine.api_client import OPENWEATHERMAP_BASE_URL
+from ml_engine.station_registry import get_registry
+from ml_engine.city_registry import get_city_registry
+from policymaker_backend.scheduler import scheduler, snapshot
+from http_cache import etag_matches, make_etag, not_modified, set_cache_headers, set_no_store
+from fast_json import FastJSONRoute, StaticJSON
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+logger = logging.getLogger(__name__)
 
-import random
-
-# Static coordinates for known stations to fix missing map pins
-STATION_COORDS = {
-    # Pune
-    "Shivajinagar": {"lat": 18.5314, "lng": 73.8446},
-    "Hadapsar": {"lat": 18.5089, "lng": 73.9259},
-    "Kothrud": {"lat": 18.5074, "lng": 73.8077},
-    "Katraj": {"lat": 18.4529, "lng": 73.8589},
-    "Pashan": {"lat": 18.5362, "lng": 73.7929},
-    "Lohegaon": {"lat": 18.5779, "lng": 73.9277},
-    "Bhosari": {"lat": 18.6298, "lng": 73.8475},
-    "Nigdi": {"lat": 18.6492, "lng": 73.7707},
-    "Alandi": {"lat": 18.6770, "lng": 73.8950},
-    "Wakad": {"lat": 18.5996, "lng": 73.7634},
-    "Manjri": {"lat": 18.5173, "lng": 73.9616},
-    "Thergaon": {"lat": 18.6186, "lng": 73.7667},
-    "Savita": {"lat": 18.50, "lng": 73.80}, # Placeholder partial match support
-    
-    # Delhi
-    "Jahangirpuri": {"lat": 28.7324, "lng": 77.1706},
-    "Anand Vihar": {"lat": 28.6469, "lng": 77.3160},
-    "Bawana": {"lat": 28.7762, "lng": 77.0500},
-    "Rohini": {"lat": 28.7383, "lng": 77.1085},
-    "Wazirpur": {"lat": 28.6973, "lng": 77.1656},
-    "Ashok Vihar": {"lat": 28.6963, "lng": 77.1726},
-    "Dwarka": {"lat": 28.5921, "lng": 77.0460},
-    "ITO": {"lat": 28.6288, "lng": 77.2435},
-    "Mandir Marg": {"lat": 28.6366, "lng": 77.1994},
-    "Punjabi Bagh": {"lat": 28.6683, "lng": 77.1328},
-    "R K Puram": {"lat": 28.5638, "lng": 77.1825},
-}
+# Manual data refreshes are disabled unless a token is configured
+DATA_ADMIN_TOKEN = os.getenv("POLICYMAKER_ADMIN_TOKEN")
 
-CITY_CENTERS = {
-    'Pune': {'lat': 18.5204, 'lng': 73.8567},
-    'Delhi': {'lat': 28.7041, 'lng': 77.1025}
-}
+# The mock payloads never change: serialize and gzip them once
+STATIC = {name: StaticJSON(value) for name, value in {
+    'sensors': mockSensors,
+    'history': mockHistoricalData,
+    'forecast': mockForecastData,
+    'hotspots': mockHotspots,
+    'alerts': mockAlerts,
+    'health': mockHealthData,
+    'zone_health': mockZoneHealthImpact,
+    'traffic': mockTrafficData,
+    'traffic_hourly': mockHourlyTraffic,
+    'emissions': mockEmissionSources,
+    'congestion': mockCongestionHotspots,
+    'reports': mockReports,
+    'scheduled_reports': mockScheduledReports,
+    'weather': mockWeatherData,
+    'vulnerable': mockVulnerablePopulations,
+    'policy_simulation': mockPolicySimulation,
+}.items()}
 
-def calculate_ind_aqi(pm25, pm10):
-    """Calculate India AQI from PM2.5 and PM10."""
-    aqi_25 = 0
-    if pm25:
-        c = pm25
-        if c <= 30: aqi_25 = c * 50/30
-        elif c <= 60: aqi_25 = 50 + (c-30)*50/30
-        elif c <= 90: aqi_25 = 100 + (c-60)*100/30
-        elif c <= 120: aqi_25 = 200 + (c-90)*100/30
-        elif c <= 250: aqi_25 = 300 + (c-120)*100/130
-        else: aqi_25 = 400 + (c-250)*100/130
-        
-    aqi_10 = 0
-    if pm10:
-        c = pm10
-        if c <= 50: aqi_10 = c * 50/50
-        elif c <= 100: aqi_10 = 50 + (c-50)*50/50
-        elif c <= 250: aqi_10 = 100 + (c-100)*100/150
-        elif c <= 350: aqi_10 = 200 + (c-250)*100/100
-        elif c <= 430: aqi_10 = 300 + (c-350)*100/80
-        else: aqi_10 = 400 + (c-430)*100/70
-        
-    return int(max(aqi_25, aqi_10))
+import random
 
 @router.get("/sensors")
 async def get_sensors(city: str = 'Delhi'):
@@ -78,10 +51,11 @@ async def get_sensors(city: str = 'Delhi'):
         from ml_engine.api_client import MultiSourceAPIClient
         client = MultiSourceAPIClient()
         # Fetch station data
-        stations = client.fetch_cpcb_current_stations(city=city)
-        # Determine fallback logic context
-        city_key = 'Pune' if city.lower() == 'pune' else 'Delhi'
+        stations = await client.fetch_cpcb_current_stations(city=city)
+        # Determine fallback logic context (city center, calibration)
+        city_info = get_city_registry().resolve(city)
         
+        registry = get_registry()
         sensor_list = []
         if stations:
             for name, data in stations.items():
@@ -94,7 +68,7 @@ async def get_sensors(city: str = 'Delhi'):
                 
                 # If AQI missing/0, Calculate it!
                 if (aqi == 'NA' or aqi is None or aqi == 0) and (pm25 > 0 or pm10 > 0):
-                     aqi = calculate_ind_aqi(pm25, pm10)
+                     aqi = calculate_aqi_from_pollutants({'PM2.5': pm25, 'PM10': pm10})
                 elif aqi == 'NA' or aqi is None:
                      aqi = 0
                 
@@ -102,21 +76,16 @@ async def get_sensors(city: str = 'Delhi'):
                 lat = data.get('latitude')
                 lng = data.get('longitude')
                 
-                # Fuzzy match for coords if API missing
+                # Registry lookup for coords if API missing
                 if not lat or not lng:
-                    for key in STATION_COORDS:
-                        if key.lower() in name.lower():
-                            lat = STATION_COORDS[key]['lat']
-                            lng = STATION_COORDS[key]['lng']
-                            break
+                    lat, lng = registry.coords(name, city_info.name)
                 
                 # Jitter Fallback: If still no coords, place near city center randomly
                 # This ensures ALL live stations appear on map
                 if not lat or not lng:
-                    center = CITY_CENTERS.get(city_key, CITY_CENTERS['Delhi'])
                     # Random offset +/- 0.05 degrees (~5km)
-                    lat = center['lat'] + random.uniform(-0.05, 0.05)
-                    lng = center['lng'] + random.uniform(-0.05, 0.05)
+                    lat = city_info.lat + random.uniform(-0.05, 0.05)
+                    lng = city_info.lon + random.uniform(-0.05, 0.05)
                             
                 sensor_list.append({
                     "id": name,
@@ -134,18 +103,19 @@ async def get_sensors(city: str = 'Delhi'):
                 })
 
         # Sanitize Data: Cap outliers and handle partial failures
+        # City calibration (cities.json): CPCB sensors for Pune report inflated
+        # values, 0.6x matches ground reality (~165 avg)
+        scale = get_city_registry().calibration(city_info, 'sensors')
         if sensor_list:
             for sensor in sensor_list:
                 # Cap extremely high values which are likely sensor errors
                 if sensor['aqi'] > 900:
                     sensor['aqi'] = 500
                 
-                # Pune Calibration: CPCB sensors for Pune report inflated values
-                # Apply 0.6x correction factor to match ground reality (~165 avg)
-                if city.lower() == 'pune':
-                    sensor['aqi'] = int(sensor['aqi'] * 0.6)
-                    sensor['pm25'] = int(sensor['pm25'] * 0.6)
-                    sensor['pm10'] = int(sensor['pm10'] * 0.6)
+                if scale != 1.0:
+                    sensor['aqi'] = int(sensor['aqi'] * scale)
+                    sensor['pm25'] = int(sensor['pm25'] * scale)
+                    sensor['pm10'] = int(sensor['pm10'] * scale)
                     
                 # Ensure integer
                 sensor['aqi'] = int(sensor['aqi'])
@@ -173,17 +143,30 @@ async def get_sensors(city: str = 'Delhi'):
         return sensor_list
 
     except Exception as e:
-        print(f"Error fetching sensors: {e}")
-        return mockSensors # ultimate fallback
+        logger.error("Error fetching sensors: %s", e)
+        return STATIC['sensors'].response() # ultimate fallback
 
 @router.get("/rankings")
-async def get_rankings(city: str = 'Delhi'):
+async def get_rankings(request: Request, response: Response, city: str = 'Delhi'):
     """Fetch live CPCB station data and return sorted rankings."""
     try:
-        from ml_engine.api_client import MultiSourceAPIClient
+        from ml_engine.api_client import MultiSourceAPIClient, cpcb_snapshots
         client = MultiSourceAPIClient()
-        stations = client.fetch_cpcb_current_stations(city=city)
+        stations = await client.fetch_cpcb_current_stations(city=city)
+
+        # Rankings are a pure function of the city's CPCB snapshot
+        version = cpcb_snapshots.version(city)
+        if version is not None:
+            etag = make_etag('rankings', city, version)
+            max_age = cpcb_snapshots.max_age(city)
+            if etag_matches(request, etag):
+                return not_modified(etag, max_age)
+            set_cache_headers(response, etag, max_age)
+        else:
+            set_no_store(response)
         
+        registry = get_registry()
+        city_name = get_city_registry().resolve(city).name
         ranking_list = []
         if stations:
             for name, data in stations.items():
@@ -200,7 +183,7 @@ async def get_rankings(city: str = 'Delhi'):
                 
                 # If AQI missing/0, Calculate it!
                 if (aqi == 'NA' or aqi is None or aqi == 0) and (pm25 > 0 or pm10 > 0):
-                     aqi = calculate_ind_aqi(pm25, pm10)
+                     aqi = calculate_aqi_from_pollutants({'PM2.5': pm25, 'PM10': pm10})
                 elif aqi == 'NA' or aqi is None:
                      aqi = 0
                 
@@ -209,11 +192,7 @@ async def get_rankings(city: str = 'Delhi'):
                 lng = data.get('longitude')
                 
                 if not lat or not lng:
-                    for key in STATION_COORDS:
-                        if key.lower() in name.lower():
-                            lat = STATION_COORDS[key]['lat']
-                            lng = STATION_COORDS[key]['lng']
-                            break
+                    lat, lng = registry.coords(name, city_name)
                             
                 if aqi:
                     try:
@@ -234,17 +213,19 @@ async def get_rankings(city: str = 'Delhi'):
                     except:
                         pass
                         
-        # Apply city-specific calibration for realistic AQI levels
-        # Pune Calibration: Apply 0.6x correction to match ground reality
-        if city.lower() == 'pune' and ranking_list:
+        # Apply city-specific calibration for realistic AQI levels (cities.json;
+        # Pune: 0.6x correction to match ground reality)
+        cities = get_city_registry()
+        scale = cities.calibration(cities.resolve(city), 'sensors')
+        if scale != 1.0 and ranking_list:
             for item in ranking_list:
-                item['aqi'] = int(item['aqi'] * 0.6)
-                item['pm25'] = int(item['pm25'] * 0.6)
-                item['pm10'] = int(item['pm10'] * 0.6)
+                item['aqi'] = int(item['aqi'] * scale)
+                item['pm25'] = int(item['pm25'] * scale)
+                item['pm10'] = int(item['pm10'] * scale)
  
         # BUT only if truly empty, to avoid blank screen.
         if not ranking_list:
-            print(f"WARNING: Live rankings empty for {city}. Using fallback mock.")
+            logger.warning("Live rankings empty for %s. Using fallback mock.", city)
             if city.lower() == 'pune':
                 return [
                     {"id": 1, "name": "Shivajinagar", "aqi": 180, "change": "+5", "pm25": 85, "pm10": 120, "no2": 45, "lat": 18.5314, "lng": 73.8446},
@@ -272,7 +253,8 @@ async def get_rankings(city: str = 'Delhi'):
         return ranking_list[:50]
         
     except Exception as e:
-        print(f"Rankings Error: {e}")
+        logger.error("Rankings Error: %s", e)
+        set_no_store(response)
         # Return mock on crash
         return [
              {"id": 1, "name": "System Error", "aqi": 0, "change": "--"}
@@ -280,65 +262,65 @@ async def get_rankings(city: str = 'Delhi'):
 
 @router.get("/history")
 async def get_history():
-    return mockHistoricalData
+    return STATIC['history'].response()
 
 @router.get("/forecast")
 async def get_forecast():
-    return mockForecastData
+    return STATIC['forecast'].response()
 
 @router.get("/hotspots")
 async def get_hotspots():
-    return mockHotspots
+    return STATIC['hotspots'].response()
 
 @router.get("/alerts")
 async def get_alerts():
-    return mockAlerts
+    return STATIC['alerts'].response()
 
 @router.get("/health")
 async def get_health():
-    return mockHealthData
+    return STATIC['health'].response()
 
 @router.get("/zone-health")
 async def get_zone_health():
-    return mockZoneHealthImpact
+    return STATIC['zone_health'].response()
 
 @router.get("/traffic")
 async def get_traffic():
-    return mockTrafficData
+    return STATIC['traffic'].response()
 
 @router.get("/traffic-hourly")
 async def get_traffic_hourly():
-    return mockHourlyTraffic
+    return STATIC['traffic_hourly'].response()
 
 @router.get("/emissions")
 async def get_emissions():
-    return mockEmissionSources
+    return STATIC['emissions'].response()
 
 @router.get("/congestion")
 async def get_congestion():
-    return mockCongestionHotspots
+    return STATIC['congestion'].response()
 
 @router.get("/reports/recent")
 async def get_recent_reports():
-    return mockReports
+    return STATIC['reports'].response()
 
 @router.get("/reports/scheduled")
 async def get_scheduled_reports():
-    return mockScheduledReports
+    return STATIC['scheduled_reports'].response()
 
 @router.get("/weather")
 async def get_weather(city: str = 'Delhi'):
     try:
-        import requests
         api_key = os.getenv("OPENWEATHER_API_KEY")
         
         # Fallback if key missing
         if not api_key:
-            return mockWeatherData
+            return STATIC['weather'].response()
             
         # Fetch current weather
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city},IN&appid={api_key}&units=metric"
-        response = requests.get(url)
+        url = f"{OPENWEATHERMAP_BASE_URL}/data/2.5/weather"
+        params = {'q': f"{city},IN", 'appid': api_key, 'units': 'metric'}
+        response = await http_pool.get(url, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -364,10 +346,10 @@ async def get_weather(city: str = 'Delhi'):
                     "rain": "improves"
                 }
             }
-        return mockWeatherData
+        return STATIC['weather'].response()
     except Exception as e:
-        print(f"Weather API Error: {e}")
-        return mockWeatherData
+        logger.error("Weather API Error: %s", e)
+        return STATIC['weather'].response()
 
 @router.get("/source-attribution")
 async def get_source_attribution(city: str = 'Delhi'):
@@ -392,8 +374,39 @@ async def get_source_attribution(city: str = 'Delhi'):
 
 @router.get("/vulnerable")
 async def get_vulnerable():
-    return mockVulnerablePopulations
+    return STATIC['vulnerable'].response()
 
 @router.get("/policy-simulation")
 async def get_policy_simulation():
-    return mockPolicySimulation
+    return STATIC['policy_simulation'].response()
+
+@router.get("/data")
+async def get_data_status():
+    """Scheduler state and the artifacts currently published."""
+    return scheduler.status()
+
+@router.post("/data/refresh")
+async def refresh_data(x_admin_token: str = Header(None)):
+    """Run the data job now (joins the run already in progress, if any)."""
+    if not DATA_ADMIN_TOKEN or x_admin_token != DATA_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Data refresh requires a valid X-Admin-Token")
+    ok = await scheduler.run_once()
+    return {"ok": ok, **scheduler.status()}
+
+@router.get("/data/{name}")
+async def get_data_artifact(name: str, request: Request):
+    """Latest published job output, e.g. /data/dashboard_stats."""
+    if not name.endswith('.json'):
+        name += '.json'
+    doc = snapshot.get(name)
+    if doc is None:
+        raise HTTPException(status_code=404, detail=f"No published artifact '{name}'")
+    # The content hash is the version; fresh until the next scheduled run
+    etag = f'"{doc["version"]}"'
+    max_age = scheduler.seconds_until_next_run()
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age)
+    response = Response(content=doc['body'], media_type="application/json",
+                        headers={"X-Data-Version": doc['version']})
+    set_cache_headers(response, etag, max_age)
+    return response
@@ -0,0 +1,235 @@
+"""
+Policymaker Job Scheduler
+Runs generate_policymaker_data inside the API process and publishes its
+outputs to an in-memory snapshot served by /api/policymaker/data/{name}.
+
+Runs happen on a fixed cadence with random jitter (so several replicas do not
+hit CPCB/OWM in lockstep). A run requested while another is in progress
+(timer or manual refresh) waits for that run instead of starting a second
+one. The job itself is blocking and runs in a worker thread; the forecaster,
+station registry and CPCB snapshot it uses stay loaded between runs.
+
+On startup the snapshot is seeded from the files of the previous run (via
+their manifest, or by hashing the *.json files when there is none, as in a
+fresh checkout), so the routes have data before the first run finishes.
+
+Config (env):
+    POLICYMAKER_JOB_ENABLED          Run the job in-process (default 1)
+    POLICYMAKER_JOB_INTERVAL_SECONDS Cadence (default 1800)
+    POLICYMAKER_JOB_JITTER_SECONDS   Random +/- offset per run (default 120)
+    POLICYMAKER_JOB_INITIAL_DELAY_SECONDS  Delay before the first run (default 5)
+    POLICYMAKER_ADMIN_TOKEN          X-Admin-Token for POST /data/refresh (unset: disabled)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime
+
+from policymaker_backend import jobs
+from policymaker_backend.artifacts import MANIFEST_NAME, ArtifactWriter
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("POLICYMAKER_JOB_ENABLED", "1") not in ("0", "false", "False")
+INTERVAL_SECONDS = float(os.getenv("POLICYMAKER_JOB_INTERVAL_SECONDS", 1800))
+JITTER_SECONDS = float(os.getenv("POLICYMAKER_JOB_JITTER_SECONDS", 120))
+INITIAL_DELAY_SECONDS = float(os.getenv("POLICYMAKER_JOB_INITIAL_DELAY_SECONDS", 5))
+
+
+def _describe(body, mtime):
+    """Manifest-style entry for a file published without a manifest."""
+    digest = hashlib.sha256(body).hexdigest()
+    return {
+        'sha256': digest,
+        'version': digest[:12],
+        'bytes': len(body),
+        'updated_at': datetime.fromtimestamp(mtime).isoformat(),
+    }
+
+
+class DataSnapshot:
+    """
+    Latest published artifact per name: the manifest entry plus 'body'
+    (the serialised JSON bytes). Publishing swaps in a new dict, so readers
+    always see one consistent generation.
+    """
+
+    def __init__(self):
+        self._documents = {}
+        self.published_at = None
+
+    def publish(self, documents):
+        # Artifacts a partial run did not produce keep their previous version
+        merged = dict(self._documents)
+        merged.update(documents)
+        self._documents = merged
+        self.published_at = time.time()
+
+    def get(self, name):
+        return self._documents.get(name)
+
+    def names(self):
+        return sorted(self._documents)
+
+    def load_from_disk(self, output_dir):
+        """
+        Seed from the files listed in output_dir/manifest.json, or from every
+        *.json file in output_dir when there is no manifest. Returns the count loaded.
+        """
+        try:
+            with open(os.path.join(output_dir, MANIFEST_NAME), 'r') as f:
+                files = json.load(f).get('files', {})
+        except (OSError, ValueError, AttributeError):
+            try:
+                files = {name: None for name in sorted(os.listdir(output_dir))
+                         if name.endswith('.json') and not name.startswith('.')}
+            except OSError:
+                return 0
+
+        documents = {}
+        for name, entry in files.items():
+            path = os.path.join(output_dir, name)
+            try:
+                with open(path, 'rb') as f:
+                    body = f.read()
+                if entry is None:
+                    entry = _describe(body, os.path.getmtime(path))
+            except OSError:
+                continue
+            documents[name] = dict(entry, body=body)
+        if documents:
+            self.publish(documents)
+        return len(documents)
+
+
+class JobScheduler:
+    """
+    Periodic, coalescing runner for a blocking job.
+
+    Parameters
+    ----------
+    job : callable
+        job() -> documents dict to publish; called in a worker thread.
+    snapshot : DataSnapshot
+        Where results are published.
+    interval_seconds, jitter_seconds, initial_delay_seconds : float
+        Cadence, random +/- offset per run, and delay before the first run.
+    """
+
+    def __init__(self, job, snapshot, interval_seconds=INTERVAL_SECONDS,
+                 jitter_seconds=JITTER_SECONDS, initial_delay_seconds=INITIAL_DELAY_SECONDS):
+        self._job = job
+        self.snapshot = snapshot
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.initial_delay_seconds = initial_delay_seconds
+        self._loop_task = None
+        self._running = None
+        self.last_started_at = None
+        self.last_finished_at = None
+        self.last_duration_seconds = None
+        self.last_error = None
+        self.next_run_at = None
+        self._counters = {'runs': 0, 'failures': 0, 'coalesced': 0}
+
+    def start(self):
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._loop())
+            logger.info("Policymaker job scheduled every %.0fs (+/- %.0fs)",
+                        self.interval_seconds, self.jitter_seconds)
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+    async def run_once(self):
+        """Run the job now, or wait for the run already in progress. Returns True on success."""
+        if self._running is None or self._running.done():
+            self._running = asyncio.ensure_future(self._run())
+        else:
+            self._counters['coalesced'] += 1
+        return await asyncio.shield(self._running)
+
+    async def _run(self):
+        self.last_started_at = time.time()
+        try:
+            documents = await asyncio.to_thread(self._job)
+        except Exception as e:
+            self._counters['failures'] += 1
+            self.last_error = str(e)
+            logger.exception("Policymaker job failed")
+            return False
+        finally:
+            self.last_finished_at = time.time()
+            self.last_duration_seconds = round(self.last_finished_at - self.last_started_at, 3)
+            self._counters['runs'] += 1
+
+        self.last_error = None
+        self.snapshot.publish(documents)
+        logger.info("Policymaker job published %s artifacts in %.1fs",
+                    len(documents), self.last_duration_seconds)
+        return True
+
+    def _next_delay(self):
+        return max(0.0, self.interval_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds))
+
+    async def _loop(self):
+        delay = self.initial_delay_seconds
+        while True:
+            self.next_run_at = time.time() + delay
+            await asyncio.sleep(delay)
+            await self.run_once()
+            delay = self._next_delay()
+
+    def seconds_until_next_run(self):
+        """0 when no run is scheduled (outputs then change only on a manual refresh)."""
+        if self._loop_task is None or self.next_run_at is None:
+            return 0
+        return max(0.0, self.next_run_at - time.time())
+
+    def status(self):
+        out = dict(self._counters)
+        out.update({
+            'running': self._running is not None and not self._running.done(),
+            'last_started_at': self.last_started_at,
+            'last_finished_at': self.last_finished_at,
+            'last_duration_seconds': self.last_duration_seconds,
+            'last_error': self.last_error,
+            'next_run_at': self.next_run_at if self._loop_task is not None else None,
+            'published_at': self.snapshot.published_at,
+            'artifacts': self.snapshot.names(),
+        })
+        return out
+
+
+def _run_policymaker_job():
+    writer = ArtifactWriter(jobs.OUTPUT_DIR)
+    jobs.generate_policymaker_data(artifacts=writer)
+    return dict(writer.documents)
+
+
+snapshot = DataSnapshot()
+scheduler = JobScheduler(_run_policymaker_job, snapshot)
+
+
+async def start():
+    """Seed the snapshot from the last run's files and start the timer (if enabled)."""
+    loaded = snapshot.load_from_disk(jobs.OUTPUT_DIR)
+    if loaded:
+        logger.info("Seeded policymaker snapshot with %s artifacts from disk", loaded)
+    if ENABLED:
+        scheduler.start()
+
+
+async def stop():
+    await scheduler.stop()
@@ -0,0 +1,107 @@
+"""
+Startup warm-up and readiness.
+
+The app starts serving as soon as its modules are imported; model artifacts
+are loaded afterwards by one background warm-up, each in a worker thread
+and concurrently with the others:
+
+    ml_models           the 3-day forecast models of the CITY_PRELOAD cities (init_ml);
+                        other cities load on their first request
+    heatmap_model       the heatmap predictor's model and station encoder
+    station_forecaster  the policymaker job's forecaster and station data
+                        (only when the job runs in-process)
+    cpu_executor        starts the process pool's workers (not with CPU_EXECUTOR=thread)
+
+Requests that need a model before it is loaded wait for it (init_ml,
+HeatmapPredictor.ensure_loaded, jobs.get_forecaster), so nothing is loaded
+twice. GET /ready reports the warm-up and which models and caches are
+warm; it answers 503 until every warm-up step has finished.
+"""
+
+import asyncio
+import logging
+import time
+
+from ml_engine import cpu_executor
+from ml_engine import router as ml_module
+from ml_engine.api_client import cpcb_snapshots
+from ml_engine.heatmap_prediction import predictor
+from citizen_backend.routes import citizen
+from policymaker_backend import jobs
+from policymaker_backend import scheduler as policymaker_scheduler
+from policymaker_backend.scheduler import snapshot
+
+logger = logging.getLogger(__name__)
+
+STEPS = {
+    'ml_models': ml_module.init_ml,
+    'heatmap_model': lambda: asyncio.to_thread(predictor.load),
+}
+if cpu_executor.uses_processes():
+    STEPS['cpu_executor'] = cpu_executor.warm_up
+if policymaker_scheduler.ENABLED:
+    STEPS['station_forecaster'] = lambda: asyncio.to_thread(jobs.get_forecaster)
+
+_status = {name: {'state': 'pending'} for name in STEPS}
+_task = None
+
+
+async def _run_step(name, step):
+    status = _status[name]
+    status['state'] = 'loading'
+    started = time.perf_counter()
+    try:
+        await step()
+        status['state'] = 'ready'
+    except Exception as e:
+        status['state'] = 'failed'
+        status['error'] = str(e)
+        logger.exception("Warm-up step %s failed", name)
+    finally:
+        status['seconds'] = round(time.perf_counter() - started, 3)
+
+
+async def warm_up():
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_step(name, step) for name, step in STEPS.items()))
+    logger.info("Warm-up finished in %.2fs: %s", time.perf_counter() - started,
+                ", ".join(f"{name} {s['state']} ({s['seconds']}s)" for name, s in _status.items()))
+
+
+def start():
+    """Begin the warm-up in the background (once)."""
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(warm_up())
+    return _task
+
+
+def is_ready():
+    return all(s['state'] == 'ready' for s in _status.values())
+
+
+def report():
+    forecaster_model, station_data = jobs.forecaster_status()
+    forecast_cache = ml_module.forecast_cache
+    heatmap = predictor.stats()
+    return {
+        'ready': is_ready(),
+        'warm_up': {name: dict(s) for name, s in _status.items()},
+        'models': {
+            'forecast_3day': ml_module.ml_ready(),
+            'heatmap': heatmap['loaded'],
+            'station_forecast': forecaster_model,
+        },
+        'versions': ml_module.active_versions(),
+        'cpu_executor': cpu_executor.stats(),
+        'caches': {
+            'forecast': {city: forecast_cache is not None and forecast_cache.version(city) is not None
+                         for city in ml_module.ml_ready()},
+            'city_models': ml_module.city_models.stats() if ml_module.city_models is not None else {},
+            'cpcb_snapshot': sorted(cpcb_snapshots.stats()['cities']),
+            'citizen_aqi': sorted(citizen.cached_aqi_data),
+            'heatmap_tables': heatmap['tables'],
+            'station_data': station_data,
+            'policymaker_artifacts': len(snapshot.names()),
+        },
+    }